@@ -34,13 +34,18 @@
     @license: GNU GPL, see COPYING for details.
 """
 
-import os, re, codecs
+import os, re, codecs, threading, time
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
 
-from MoinMoin import config, caching, user, util, wikiutil
+from MoinMoin import config, caching, subscriptionindex, user, util, wikiutil
 from MoinMoin.logfile import eventlog
+from MoinMoin.util import pickle, PICKLE_PROTOCOL
 
 def is_cache_exception(e):
     args = e.args
@@ -126,6 +131,276 @@ class ItemCache:
         self.log_pos = new_pos # important to do this at the end -
                                # avoids threading race conditions
 
+    def stats(self):
+        """ Return the hit/miss statistics of this cache in this process.
+            @return: dict with name, pid, requests, hits and misses
+        """
+        return {
+            'name': self.name,
+            'pid': os.getpid(),
+            'requests': self.requests,
+            'hits': self.hits,
+            'misses': self.requests - self.hits,
+        }
+
+
+class SharedItemCache(ItemCache):
+    """ ItemCache that shares its data between all processes of a wiki
+
+        The cached items are stored in a SQLite database in the wiki's cache
+        directory. Every process keeps a local copy of what it has read from
+        there, tagged with the generation it has seen.
+
+        When the edit-log has grown, the first process noticing it processes
+        the news under the database's write lock, removes the changed items,
+        bumps the generation and records the changed item names for it.
+        All other processes just compare generations and drop their local
+        copies of the changed items, without reading the edit-log again.
+
+        Additionally, every process stores its hit/miss statistics into the
+        database (at most every stats_interval seconds). Statistics not
+        updated for stats_keep intervals belong to processes that are gone,
+        they are not shown and get removed when processing edit-log news.
+
+        If sqlite3 is not available or the database can't be used, this
+        behaves like a process local ItemCache.
+    """
+    stats_interval = 60 # seconds between writing worker stats
+    stats_keep = 10 # stats_intervals after which stats of a silent worker are dropped
+    max_changes = 1000 # how many generations of changed item names we keep
+
+    def __init__(self, name):
+        ItemCache.__init__(self, name)
+        self.generation = None
+        self.shared_hits = 0
+        self.stats_written = 0
+        self._local = threading.local()
+
+    def _connection(self, request):
+        """ Return a database connection for the current thread and process,
+            None if the shared database can't be used.
+        """
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, 'pid', None) == pid:
+            return local.conn
+        # never reuse a connection inherited from a forked parent
+        local.pid, local.conn = pid, None
+        if sqlite3 is None:
+            logging.warning("sqlite3 not available, %s cache is not shared" % self.name)
+            return None
+        arena_dir = caching.get_arena_dir(request, 'itemcache', 'wiki')
+        try:
+            if not os.path.exists(arena_dir):
+                os.makedirs(arena_dir)
+            conn = sqlite3.connect(os.path.join(arena_dir, 'shared.db'),
+                                   timeout=30, isolation_level=None)
+            conn.text_factory = str
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.Error:
+                pass # older sqlite, just use the default journal
+            conn.execute("CREATE TABLE IF NOT EXISTS state "
+                         "(cache TEXT PRIMARY KEY, generation INTEGER, log_pos INTEGER)")
+            conn.execute("CREATE TABLE IF NOT EXISTS items "
+                         "(cache TEXT, name TEXT, key TEXT, data BLOB, PRIMARY KEY (cache, name, key))")
+            conn.execute("CREATE TABLE IF NOT EXISTS changes "
+                         "(cache TEXT, generation INTEGER, name TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS changes_generation ON changes (cache, generation)")
+            conn.execute("CREATE TABLE IF NOT EXISTS workers "
+                         "(cache TEXT, pid INTEGER, requests INTEGER, hits INTEGER, "
+                         "shared_hits INTEGER, updated REAL, PRIMARY KEY (cache, pid))")
+            conn.execute("INSERT OR IGNORE INTO state VALUES (?, 0, NULL)", (self.name, ))
+        except (OSError, sqlite3.Error), err:
+            logging.warning("can't use shared %s cache in %r: %s" % (self.name, arena_dir, str(err)))
+            return None
+        local.conn = conn
+        return conn
+
+    def _clear_local(self):
+        self.cache = {}
+
+    def _db_key(self, name, key):
+        """ Return item name and key as stored in the database. """
+        if isinstance(name, unicode):
+            name = name.encode(config.charset)
+        return name, repr(key)
+
+    def putItem(self, request, name, key, data):
+        """ Remembers some data for item name under a key.
+            @param request: the request object
+            @param name: name of the item (page), unicode
+            @param key: used as secondary access key after name
+            @param data: the data item that should be remembered
+        """
+        ItemCache.putItem(self, request, name, key, data)
+        conn = self._connection(request)
+        if conn is None or self.generation is None:
+            return
+        try:
+            blob = sqlite3.Binary(pickle.dumps(data, PICKLE_PROTOCOL))
+            # only store it if nobody has invalidated items since we last
+            # looked, otherwise we might store outdated data
+            conn.execute("INSERT OR REPLACE INTO items "
+                         "SELECT ?, ?, ?, ? FROM state WHERE cache = ? AND generation = ?",
+                         (self.name, ) + self._db_key(name, key) + (blob, self.name, self.generation))
+        except (sqlite3.Error, pickle.PicklingError, TypeError), err:
+            logging.warning("can't store %r %r in shared %s cache: %s" % (name, key, self.name, str(err)))
+
+    def getItem(self, request, name, key):
+        """ Returns some item stored for item name under key.
+            @param request: the request object
+            @param name: name of the item (page), unicode
+            @param key: used as secondary access key after name
+            @return: the data or None, if there is no such name or key.
+        """
+        self.refresh(request)
+        self.requests += 1
+        try:
+            data = self.cache[name][key]
+            self.hits += 1
+            hit_str = 'hit'
+        except KeyError:
+            data = None
+            hit_str = 'miss'
+            conn = self._connection(request)
+            if conn is not None:
+                try:
+                    row = conn.execute("SELECT data FROM items WHERE cache = ? AND name = ? AND key = ?",
+                                       (self.name, ) + self._db_key(name, key)).fetchone()
+                    if row is not None:
+                        data = pickle.loads(str(row[0]))
+                        self.cache.setdefault(name, {})[key] = data
+                        self.hits += 1
+                        self.shared_hits += 1
+                        hit_str = 'shared hit'
+                except (sqlite3.Error, pickle.UnpicklingError), err:
+                    logging.warning("can't load %r %r from shared %s cache: %s" % (name, key, self.name, str(err)))
+        logging.log(self.loglevel, "%s cache %s (h/r %2.1f%%) for %r %r" % (
+            self.name,
+            hit_str,
+            float(self.hits * 100) / self.requests,
+            name,
+            key,
+        ))
+        return data
+
+    def refresh(self, request):
+        """ Refresh the cache - only the first process noticing changes in the
+            edit-log processes them, all others just pick up the changed item
+            names via the shared generation counter.
+            @param request: the request object
+        """
+        conn = self._connection(request)
+        if conn is None:
+            return ItemCache.refresh(self, request)
+        from MoinMoin.logfile import editlog
+        elog = editlog.EditLog(request)
+        try:
+            generation, log_pos = conn.execute("SELECT generation, log_pos FROM state WHERE cache = ?",
+                                               (self.name, )).fetchone()
+            if log_pos != elog.size():
+                generation = self._process_news(conn, elog)
+            if generation != self.generation:
+                self._sync(conn, generation)
+            now = time.time()
+            if now - self.stats_written > self.stats_interval:
+                self.stats_written = now
+                conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?, ?, ?)",
+                             (self.name, os.getpid(), self.requests, self.hits, self.shared_hits, now))
+        except sqlite3.Error, err:
+            logging.warning("can't refresh shared %s cache: %s" % (self.name, str(err)))
+            self._clear_local()
+            self.generation = None
+
+    def _process_news(self, conn, elog):
+        """ Process the edit-log news under the database write lock (if no
+            other process has done it meanwhile) and return the new generation.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            generation, log_pos = conn.execute("SELECT generation, log_pos FROM state WHERE cache = ?",
+                                               (self.name, )).fetchone()
+            log_size = elog.size()
+            if log_pos != log_size:
+                if log_pos is None or log_pos > log_size:
+                    # new database or edit-log was truncated, we can't know what changed
+                    items = None
+                else:
+                    log_pos, items = elog.news(log_pos)
+                generation += 1
+                if items is None or self.name == 'pagelists':
+                    logging.log(self.loglevel, "shared cache: clearing %s cache" % self.name)
+                    conn.execute("DELETE FROM items WHERE cache = ?", (self.name, ))
+                    # a NULL name means "everything changed"
+                    conn.execute("INSERT INTO changes VALUES (?, ?, NULL)", (self.name, generation))
+                    if items is None:
+                        log_pos = log_size
+                else:
+                    for item in set(items):
+                        logging.log(self.loglevel, "shared cache: removing %r" % item)
+                        item = self._db_key(item, None)[0]
+                        conn.execute("DELETE FROM items WHERE cache = ? AND name = ?", (self.name, item))
+                        conn.execute("INSERT INTO changes VALUES (?, ?, ?)", (self.name, generation, item))
+                conn.execute("DELETE FROM changes WHERE cache = ? AND generation <= ?",
+                             (self.name, generation - self.max_changes))
+                conn.execute("DELETE FROM workers WHERE cache = ? AND updated < ?",
+                             (self.name, time.time() - self.stats_keep * self.stats_interval))
+                conn.execute("UPDATE state SET generation = ?, log_pos = ? WHERE cache = ?",
+                             (generation, log_pos, self.name))
+            conn.execute("COMMIT")
+        except:
+            conn.execute("ROLLBACK")
+            raise
+        return generation
+
+    def _sync(self, conn, generation):
+        """ Bring our local copies up to date with the shared generation. """
+        if self.generation is None or self.generation > generation:
+            # first refresh or database was recreated
+            self._clear_local()
+        else:
+            names = conn.execute("SELECT name FROM changes WHERE cache = ? AND generation > ?",
+                                 (self.name, self.generation)).fetchall()
+            oldest = conn.execute("SELECT MIN(generation) FROM changes WHERE cache = ?",
+                                  (self.name, )).fetchone()[0]
+            names = [name for (name, ) in names]
+            if (self.name == 'pagelists' or None in names or
+                oldest is None or oldest > self.generation + 1):
+                self._clear_local()
+            else:
+                for name in names:
+                    self.cache.pop(name.decode(config.charset), None)
+        self.generation = generation
+
+    def stats(self):
+        """ Return the hit/miss statistics of this cache in this process.
+            @return: dict with name, pid, requests, hits, misses and shared_hits
+        """
+        stats = ItemCache.stats(self)
+        stats['shared_hits'] = self.shared_hits
+        return stats
+
+    def worker_stats(self, request):
+        """ Return the hit/miss statistics all live processes have stored.
+            @param request: the request object
+            @return: list of dicts (see stats())
+        """
+        conn = self._connection(request)
+        if conn is None:
+            return [self.stats()]
+        try:
+            rows = conn.execute("SELECT pid, requests, hits, shared_hits FROM workers "
+                                "WHERE cache = ? AND updated > ? ORDER BY pid",
+                                (self.name, time.time() - self.stats_keep * self.stats_interval)).fetchall()
+        except sqlite3.Error, err:
+            logging.warning("can't read worker stats of shared %s cache: %s" % (self.name, str(err)))
+            return [self.stats()]
+        return [{'name': self.name, 'pid': pid, 'requests': requests, 'hits': hits,
+                 'misses': requests - hits, 'shared_hits': shared_hits, }
+                for pid, requests, hits, shared_hits in rows]
+
+
 
 class Page(object):
     """ Page - Manage an (immutable) page associated with a WikiName.
@@ -905,7 +1180,7 @@ class Page(object):
         # get or create cache file
         cache = caching.CacheEntry(request, arena, key, scope=scope, use_pickle=True)
         if cache.exists():
-            page_sub = cache.content()
+            page_sub, index = subscriptionindex.get_index(request, cache)
         else:
             # build a cache if it doesn't exist
             cache = caching.CacheEntry(request, arena, key, scope=scope, use_pickle=True, do_locking=False)
@@ -923,6 +1198,7 @@ class Page(object):
                         'subscribed_pages': subscriber.subscribed_pages,
                     }
             cache.update(page_sub)
+            page_sub, index = subscriptionindex.set_index(request, cache.uid(), page_sub)
             cache.unlock()
 
         if self.cfg.SecurityPolicy:
@@ -939,10 +1215,13 @@ class Page(object):
         pages = pageList[:]
         if request.cfg.interwikiname:
             pages += ["%s:%s" % (request.cfg.interwikiname, pagename) for pagename in pageList]
-        # Create text for regular expression search
-        text = '\n'.join(pages)
+        # the index matches the patterns of all users at once
+        subscribed = index.match(pages)
 
         for uid in userlist:
+            if uid not in subscribed:
+                continue
+
             if uid == request.user.id and not include_self:
                 continue # no self notification
 
@@ -952,37 +1231,22 @@ class Page(object):
             if not userlist[uid]['email']:
                 continue # skip empty email addresses
 
-            # now check patterns for actual match
-            isSubscribed = False
-            for pattern in userlist[uid]['subscribed_pages']:
-                if pattern in pages:
-                    isSubscribed = True
-                    break
-                try:
-                    pattern = re.compile(r'^%s$' % pattern, re.M)
-                except re.error:
-                    continue
-                if pattern.search(text):
-                    isSubscribed = True
-                    break
-
             # only if subscribed, create a User object from the profile
-            if isSubscribed:
-                subscriber = user.User(request, uid)
+            subscriber = user.User(request, uid)
 
-                if not subscriber.valid:
-                    continue
+            if not subscriber.valid:
+                continue
 
-                if not UserPerms(subscriber).read(self.page_name):
-                    continue
+            if not UserPerms(subscriber).read(self.page_name):
+                continue
 
-                lang = subscriber.language or request.cfg.language_default
-                if not lang in subscriber_list:
-                    subscriber_list[lang] = []
-                if return_users:
-                    subscriber_list[lang].append(subscriber)
-                else:
-                    subscriber_list[lang].append(subscriber.email)
+            lang = subscriber.language or request.cfg.language_default
+            if not lang in subscriber_list:
+                subscriber_list[lang] = []
+            if return_users:
+                subscriber_list[lang].append(subscriber)
+            else:
+                subscriber_list[lang].append(subscriber.email)
 
         request.clock.stop('getSubscribers')
         return subscriber_list
@@ -1655,6 +1919,7 @@ class Page(object):
         finally:
             request.mode_getpagelinks -= 1
             #logging.debug("mode_getpagelinks == %r" % request.mode_getpagelinks)
+            del request.parsePageLinks_running[pagename]
             request.redirect()
             if hasattr(request, '_fmt_hd_counters'):
                 del request._fmt_hd_counters
@@ -1898,14 +2163,18 @@ class RootPage(Page):
                 if exists and not page.exists():
                     continue
 
-                # Filter out page user may not read.
-                if user and not user.may.read(name):
-                    continue
-
                 if return_objects:
                     pages.append(page)
                 else:
                     pages.append(name)
+
+            # Filter out pages user may not read (all at once, that's faster).
+            if user:
+                if return_objects:
+                    readable = set(user.may.filter('read', [page.page_name for page in pages]))
+                    pages = [page for page in pages if page.page_name in readable]
+                else:
+                    pages = user.may.filter('read', pages)
         else:
             pages = cachedlist.keys()
 
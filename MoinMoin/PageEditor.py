@@ -18,9 +18,12 @@
 
 import os, time, codecs, errno
 
+from MoinMoin import log
+logging = log.getLogger(__name__)
 
 from MoinMoin import caching, config, wikiutil, error
 from MoinMoin.Page import Page
+from MoinMoin.linkindex import LinkIndex
 from MoinMoin.widget import html
 from MoinMoin.widget.dialog import Status
 from MoinMoin.logfile import editlog, eventlog
@@ -1046,6 +1049,15 @@ Try a different name.""", wiki=True) % (wikiutil.escape(newpagename), )
         elog = eventlog.EventLog(request)
         elog.add(request, 'SAVEPAGE', {'pagename': self.page_name}, 1, mtime_usecs)
 
+        # record the new links in the link index (if we have one)
+        pagenames = [self.page_name]
+        if action == 'SAVE/RENAME':
+            pagenames.append(extra) # == old page name
+        try:
+            LinkIndex(request).update_pages(pagenames)
+        except caching.CacheError, err:
+            logging.warning("updating the link index failed: %s" % str(err))
+
         return mtime_usecs, rev
 
     def saveText(self, newtext, rev, **kw):
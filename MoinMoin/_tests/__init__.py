@@ -16,6 +16,7 @@ from MoinMoin.PageEditor import PageEditor
 from MoinMoin.util import random_string
 from MoinMoin import caching, user
 from MoinMoin.action import AttachFile
+from MoinMoin.logfile import eventlog
 
 # Promoting the test user -------------------------------------------
 # Usually the tests run as anonymous user, but for some stuff, you
@@ -85,6 +86,7 @@ def append_page(request, pagename, content, do_editor_backup=False):
 
 def nuke_eventlog(request):
     """ removes event-log file """
+    eventlog.EventLog(request).flush() # buffered events shall not show up in the new one
     fpath = request.rootpage.getPagePath('event-log', isfile=1)
     if os.path.exists(fpath):
         os.remove(fpath)
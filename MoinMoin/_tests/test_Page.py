@@ -6,9 +6,12 @@
     @license: GNU GPL, see COPYING for details.
 """
 
+import time
+
 import py
 
-from MoinMoin.Page import Page
+from MoinMoin.Page import Page, SharedItemCache
+from MoinMoin._tests import become_trusted, create_page, nuke_page
 
 class TestPage:
     def testMeta(self):
@@ -72,6 +75,68 @@ class TestRootPage:
         assert u'FrontPage' in pagelist
         assert u'' not in pagelist
 
+class TestSharedItemCache:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageForSharedItemCache'
+
+    def setup_method(self, method):
+        py.test.importorskip('sqlite3')
+        # two caches with the same name behave like the caches of two workers
+        self.worker1 = SharedItemCache('meta')
+        self.worker2 = SharedItemCache('meta')
+
+    def testSharedHit(self):
+        request = self.request
+        assert self.worker1.getItem(request, self.pagename, 'test') is None
+        self.worker1.putItem(request, self.pagename, 'test', (u'data', 1))
+        assert self.worker2.getItem(request, self.pagename, 'test') == (u'data', 1)
+        stats = self.worker2.stats()
+        assert stats['hits'] == stats['shared_hits'] == 1
+        assert stats['misses'] == 0
+        assert self.worker1.stats()['misses'] == 1
+
+    def testInvalidation(self):
+        request = self.request
+        self.worker1.getItem(request, self.pagename, 'test')
+        self.worker1.putItem(request, self.pagename, 'test', 'old')
+        self.worker1.putItem(request, u'FrontPage', 'test', 'front')
+        assert self.worker2.getItem(request, self.pagename, 'test') == 'old'
+        generation = self.worker2.generation
+
+        become_trusted(request)
+        create_page(request, self.pagename, u"Foo!")
+        assert self.worker1.getItem(request, self.pagename, 'test') is None
+        assert self.worker1.generation > generation
+        # worker2 picks up the changes via the generation counter
+        assert self.worker2.getItem(request, self.pagename, 'test') is None
+        assert self.worker2.generation == self.worker1.generation
+        assert self.worker2.getItem(request, u'FrontPage', 'test') == 'front'
+        nuke_page(request, self.pagename)
+
+    def testWorkerStats(self):
+        request = self.request
+        self.worker1.getItem(request, self.pagename, 'test')
+        pids = [stats['pid'] for stats in self.worker1.worker_stats(request)]
+        assert self.worker1.stats()['pid'] in pids
+
+    def testStaleWorkerStats(self):
+        request = self.request
+        self.worker1.getItem(request, self.pagename, 'test')
+        conn = self.worker1._connection(request)
+        stale = time.time() - (self.worker1.stats_keep + 1) * self.worker1.stats_interval
+        conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, ?, ?, ?)",
+                     (self.worker1.name, -1, 1, 1, 0, stale))
+        pids = [stats['pid'] for stats in self.worker1.worker_stats(request)]
+        assert -1 not in pids
+        assert self.worker1.stats()['pid'] in pids
+        # processing edit-log news removes the stale row
+        become_trusted(request)
+        create_page(request, self.pagename, u"Foo!")
+        nuke_page(request, self.pagename)
+        self.worker1.getItem(request, self.pagename, 'test')
+        rows = conn.execute("SELECT pid FROM workers WHERE cache = ? AND pid = -1",
+                            (self.worker1.name, )).fetchall()
+        assert not rows
+
 
 coverage_modules = ['MoinMoin.Page']
 
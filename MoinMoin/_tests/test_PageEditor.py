@@ -298,6 +298,10 @@ class TestCopyPage(object):
             import shutil
             shutil.rmtree(Page(self.request, self.pagename).getPagePath(), True)
             shutil.rmtree(Page(self.request, self.copy_pagename).getPagePath(), True)
+            # the edit-log does not tell the meta cache about it, so forget the
+            # cached metadata (e.g. acl) of the pages ourselves:
+            for pagename in (self.pagename, self.copy_pagename):
+                self.request.cfg.cache.meta.cache.pop(pagename, None)
 
     def test_copy_page(self):
         """
@@ -8,6 +8,7 @@
 
 import py
 
+import os
 import time
 
 from MoinMoin import caching
@@ -95,5 +96,22 @@ class TestCaching(object):
 
         assert data == rdata
 
+    def test_evict_arena(self):
+        """ test if the least recently used entries get evicted """
+        request = self.request
+        arena = 'test_evict_arena'
+        for key in caching.get_cache_list(request, arena, 'wiki'):
+            caching.CacheEntry(request, arena, key, 'wiki').remove()
+        now = time.time()
+        for i in range(4):
+            cache = caching.CacheEntry(request, arena, 'key%d' % i, 'wiki')
+            cache.update('x' * 100)
+            os.utime(cache._filename(), (now - 100 + i, now - 100 + i))
+        caching.CacheEntry(request, arena, 'key0', 'wiki').touch() # used recently
+        total, entries = caching.get_arena_entries(request, arena, 'wiki')
+        assert total == 400
+        assert caching.evict_arena(request, arena, 'wiki', 350) == 200
+        assert sorted(caching.get_cache_list(request, arena, 'wiki')) == ['key0', 'key3']
+
 coverage_modules = ['MoinMoin.caching']
 
@@ -0,0 +1,119 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.fragmentcache Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin import caching
+from MoinMoin.Page import Page
+from MoinMoin.web.utils import UniqueIDGenerator
+from MoinMoin._tests import become_trusted, create_page, make_macro, nuke_page
+
+
+class TestFragmentCache:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageFragments'
+    included = u'AutoCreatedMoinMoinTemporaryTestPageFragments/Included'
+
+    def setup_method(self, method):
+        self._clean()
+        become_trusted(self.request)
+        create_page(self.request, self.pagename, u'<<Include(/Included)>>')
+        create_page(self.request, self.included, u'= Heading =\nfirst version\n')
+
+    def teardown_method(self, method):
+        become_trusted(self.request)
+        nuke_page(self.request, self.pagename)
+        nuke_page(self.request, self.included)
+        self._clean()
+
+    def _clean(self):
+        for key in caching.get_cache_list(self.request, 'fragments', 'wiki'):
+            caching.CacheEntry(self.request, 'fragments', key, scope='wiki').remove()
+
+    def _render(self, name=u'Include', args=u'/Included'):
+        request = self.request
+        # a fresh request state, like for every page view
+        request.uid_generator = UniqueIDGenerator(pagename=self.pagename)
+        if hasattr(request, '_Include_backto'):
+            del request._Include_backto
+        m = make_macro(request, Page(request, self.pagename))
+        return m.execute(name, args)
+
+    def _entries(self):
+        return caching.get_cache_list(self.request, 'fragments', 'wiki')
+
+    def testCached(self):
+        """ fragmentcache: output is cached and used again """
+        output = self._render()
+        assert u'first version' in output
+        keys = self._entries()
+        assert len(keys) == 1
+        entry = caching.CacheEntry(self.request, 'fragments', keys[0], scope='wiki', use_pickle=True)
+        content = entry.content()
+        assert content['pages'][self.included][1] # exists
+        content['output'] = u'from the cache'
+        entry.update(content)
+        assert self._render() == u'from the cache'
+
+    def testSizeLimit(self):
+        """ fragmentcache: the least recently used fragments are removed """
+        cfg = self.request.cfg
+        saved_size = cfg.fragment_cache_size
+        try:
+            self._render()
+            cfg.fragment_cache_size = caching.get_arena_entries(self.request, 'fragments', 'wiki')[0] * 4
+            cfg.cache.fragments_size = None
+            for i in range(10):
+                self._render(args=u'/Included, "Title %d"' % i)
+            total, entries = caching.get_arena_entries(self.request, 'fragments', 'wiki')
+            assert total <= cfg.fragment_cache_size
+            assert 1 < len(entries) <= 4
+        finally:
+            cfg.fragment_cache_size = saved_size
+            cfg.cache.fragments_size = None
+
+    def testInvalidatedByEdit(self):
+        """ fragmentcache: changing the included page invalidates the output """
+        assert u'first version' in self._render()
+        create_page(self.request, self.included, u'= Heading =\nsecond version\n')
+        output = self._render()
+        assert u'second version' in output
+        assert u'first version' not in output
+
+    def testInvalidatedByNewPage(self):
+        """ fragmentcache: a new page invalidates the output (links to it change) """
+        assert self._render() == self._render()
+        other = self.pagename + u'/Other'
+        create_page(self.request, other, u'other')
+        try:
+            entry = caching.CacheEntry(self.request, 'fragments', self._entries()[0], scope='wiki', use_pickle=True)
+            content = entry.content()
+            content['output'] = u'stale'
+            entry.update(content)
+            assert self._render() != u'stale'
+        finally:
+            nuke_page(self.request, other)
+
+    def testDynamicNotCached(self):
+        """ fragmentcache: fragments using untracked dynamic macros are not cached """
+        create_page(self.request, self.included, u'<<Date(0)>>\n')
+        self._render()
+        assert self._entries() == []
+
+    def testTableOfContents(self):
+        """ fragmentcache: TableOfContents records the pages it includes """
+        page = Page(self.request, self.pagename)
+        m = make_macro(self.request, page)
+        m.parser.raw = page.get_raw_body()
+        self.request.uid_generator = UniqueIDGenerator(pagename=self.pagename)
+        self.request.uid_generator.begin(self.pagename) # the formatter does that in startDocument
+        assert u'Heading' in m.execute('TableOfContents', u'')
+        keys = self._entries()
+        assert keys
+        content = caching.CacheEntry(self.request, 'fragments', keys[0], scope='wiki', use_pickle=True).content()
+        assert self.included in content['pages']
+
+
+coverage_modules = ['MoinMoin.fragmentcache']
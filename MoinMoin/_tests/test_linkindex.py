@@ -0,0 +1,106 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.linkindex Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import re
+
+from MoinMoin import caching, linkindex
+from MoinMoin.linkindex import LinkIndex
+from MoinMoin.PageEditor import PageEditor
+from MoinMoin._tests import become_trusted, create_page, nuke_page
+
+
+class TestLinkIndex:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageLinkIndex'
+    target = u'AutoCreatedMoinMoinTemporaryTestPageLinkTarget'
+    wanted = u'AutoCreatedMoinMoinTemporaryTestPageWanted'
+
+    def setup_method(self, method):
+        become_trusted(self.request)
+        self.index = LinkIndex(self.request)
+        self.index.build()
+
+    def teardown_method(self, method):
+        become_trusted(self.request)
+        for pagename in (self.pagename, self.target, self.target + u'2', ):
+            nuke_page(self.request, pagename)
+        self._remove_index()
+
+    def _remove_index(self):
+        for key in caching.get_cache_list(self.request, 'linkindex', 'wiki'):
+            caching.CacheEntry(self.request, 'linkindex', key, scope='wiki').remove()
+        self.request.cfg.cache.linkindex = None
+
+    def _delta_size(self):
+        return os.path.getsize(self.index._delta_filename())
+
+    def testLinks(self):
+        create_page(self.request, self.target, u"no links here\n")
+        assert self.target in self.index.orphaned()
+        create_page(self.request, self.pagename, u"[[%s]] [[%s]]\n" % (self.target, self.wanted))
+        index = self.index
+        assert index.links(self.pagename) == set([self.target, self.wanted])
+        assert index.backlinks(self.target) == set([self.pagename])
+        assert index.wanted()[self.wanted] == set([self.pagename])
+        assert self.target not in index.orphaned()
+        assert self.pagename in index.orphaned()
+
+    def testSaveAndDelete(self):
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.wanted)
+        assert self.wanted in self.index.wanted()
+        create_page(self.request, self.pagename, u"no links anymore\n")
+        assert self.wanted not in self.index.wanted()
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.target)
+        PageEditor(self.request, self.pagename, do_editor_backup=0).deletePage()
+        assert self.pagename not in self.index.orphaned()
+        assert not self.index.backlinks(self.target)
+
+    def testRename(self):
+        create_page(self.request, self.target, u"no links here\n")
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.target)
+        PageEditor(self.request, self.target, do_editor_backup=0).renamePage(self.target + u'2')
+        assert self.index.wanted()[self.target] == set([self.pagename])
+        assert self.target + u'2' in self.index.orphaned()
+
+    def testLinkingTo(self):
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.target)
+        assert self.pagename in self.index.linking_to(prefix=self.target[:-3])
+        assert self.pagename not in self.index.linking_to(prefix=self.target + u'X')
+        search_re = re.compile(u'.*PageLink', re.I)
+        assert self.pagename in self.index.linking_to(search_re=search_re)
+
+    def testDelta(self):
+        uid = self.index._cache().uid()
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.wanted)
+        # a save only appends to the delta
+        assert self.index._cache().uid() == uid
+        assert self._delta_size() > 0
+        # like another process: load the index and apply the delta
+        self.request.cfg.cache.linkindex = None
+        assert self.index.wanted()[self.wanted] == set([self.pagename])
+        assert self.pagename in self.request.cfg.cache.linkindex[1]['covered']
+
+    def testCompact(self):
+        saved_size = linkindex.MAX_DELTA_SIZE
+        linkindex.MAX_DELTA_SIZE = 0
+        try:
+            create_page(self.request, self.pagename, u"[[%s]]\n" % self.wanted)
+        finally:
+            linkindex.MAX_DELTA_SIZE = saved_size
+        assert self._delta_size() == 0
+        self.request.cfg.cache.linkindex = None
+        assert self.index.wanted()[self.wanted] == set([self.pagename])
+
+    def testWithoutIndex(self):
+        self._remove_index()
+        create_page(self.request, self.pagename, u"[[%s]]\n" % self.wanted)
+        assert self.index.wanted()[self.wanted] == set([self.pagename])
+        assert not self.index.exists() # not built by a query
+
+
+coverage_modules = ['MoinMoin.linkindex']
@@ -0,0 +1,75 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.pagenameindex Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import random
+
+from MoinMoin import pagenameindex
+from MoinMoin.action import LikePages
+from MoinMoin._tests import become_trusted, create_page, nuke_page
+
+PAGES = [u'FrontPage', u'FrontPages', u'frontpage', u'FrontDoor', u'BackPage', u'FrontPage/Sub',
+         u'HelpContents', u'HelpOnEditing', u'RecentChanges', u'WikiSandBox', u'Front Page',
+         u'\xc4rgerPage', u'A', u'AB', ]
+
+
+class TestPageNameIndex:
+
+    def setup_class(self):
+        self.index = pagenameindex.PageNameIndex(PAGES)
+
+    def testStartsEndsWith(self):
+        assert self.index.startswith(u'Front') == sorted([name for name in PAGES if name.startswith(u'Front')])
+        assert self.index.startswith(u'Nothing') == []
+        assert sorted(self.index.endswith(u'Page')) == sorted([name for name in PAGES if name.endswith(u'Page')])
+
+    def testSameAsWikiMatches(self):
+        for pagename in (u'FrontPage', u'HelpOnMacros', u'MissingPage', ):
+            start, end, expected = LikePages.wikiMatches(pagename, [name for name in PAGES if name != pagename])
+            assert LikePages.indexMatches(pagename, self.index, start, end) == expected
+
+    def testSameAsCloseMatches(self):
+        for pagename in (u'FrontPage', u'FrotnPage', u'HelpContent', u'RecentChangs', u'\xe4rgerpage', u'AB', ):
+            assert self.index.close_matches(pagename) == LikePages.closeMatches(pagename, PAGES)
+
+    def testNoSharedTrigrams(self):
+        pages = [u'XabYcdZefW', u'Other']
+        index = pagenameindex.PageNameIndex(pages)
+        assert index.close_matches(u'UabVcdTefS') == LikePages.closeMatches(u'UabVcdTefS', pages) == [u'XabYcdZefW']
+
+    def testRandomNames(self):
+        rand = random.Random(42)
+        def name():
+            return u''.join([rand.choice(u'abcdeAB') for i in range(rand.randint(1, 12))])
+        pages = sorted(set([name() for i in range(300)]))
+        index = pagenameindex.PageNameIndex(pages)
+        for i in range(100):
+            pagename = name()
+            assert index.close_matches(pagename) == LikePages.closeMatches(pagename, pages)
+
+    def testBounded(self):
+        assert len(self.index.close_matches(u'FrontPage', n=1)) == 2 # differ only in case
+
+
+class TestGetIndex:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageNameIndex'
+
+    def teardown_method(self, method):
+        become_trusted(self.request)
+        nuke_page(self.request, self.pagename)
+
+    def testUpdated(self):
+        index = pagenameindex.get_index(self.request)
+        assert self.pagename not in index.names
+        become_trusted(self.request)
+        create_page(self.request, self.pagename, u"Foo!\n")
+        index = pagenameindex.get_index(self.request)
+        assert self.pagename in index.names
+        assert self.pagename in index.close_matches(self.pagename[:-1])
+
+
+coverage_modules = ['MoinMoin.pagenameindex']
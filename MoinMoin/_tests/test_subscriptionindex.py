@@ -0,0 +1,134 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.subscriptionindex Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import re
+
+from MoinMoin import caching, subscriptionindex, user
+from MoinMoin.Page import Page
+
+SUBSCRIPTIONS = {
+    'u1': [u'FrontPage'],
+    'u2': [u'Help.*', u'FrontPage'],
+    'u3': [u'CategoryHomepage', u'(?i)frontpage'],
+    'u4': [u'Foo|Bar'], # ^Foo|Bar$: starts with Foo or ends with Bar
+    'u5': [u'(a+)\\1Page', u'[invalid'],
+    'u6': [u'Wiki:.*/Sub', u'Front.age'],
+}
+
+PAGE_LISTS = [
+    [u'FrontPage'],
+    [u'frontPage'],
+    [u'HelpOnEditing', u'CategoryHomepage'],
+    [u'FooBaz'],
+    [u'BazBar'],
+    [u'aaPage'],
+    [u'Page/Sub', u'Wiki:Page/Sub'],
+    [u'FrontXage'],
+    [u'[invalid'],
+    [u'Nothing'],
+]
+
+
+def subscribed(patterns, pages):
+    """ the matching of User.isSubscribedTo """
+    text = '\n'.join(pages)
+    for pattern in patterns:
+        if pattern in pages:
+            return True
+        try:
+            pattern = re.compile(r'^%s$' % pattern, re.M)
+        except re.error:
+            continue
+        if pattern.search(text):
+            return True
+    return False
+
+
+def page_sub(subscriptions):
+    return dict([(uid, {'name': uid, 'email': '', 'subscribed_pages': patterns})
+                 for uid, patterns in subscriptions.items()])
+
+
+class TestSubscriptionIndex:
+
+    def check(self, index, subscriptions):
+        for pages in PAGE_LISTS:
+            expected = set([uid for uid, patterns in subscriptions.items() if subscribed(patterns, pages)])
+            assert index.match(pages) == expected, pages
+
+    def testSameAsIsSubscribedTo(self):
+        """ subscriptionindex: matches like User.isSubscribedTo """
+        self.check(subscriptionindex.SubscriptionIndex(page_sub(SUBSCRIPTIONS)), SUBSCRIPTIONS)
+
+    def testCombined(self):
+        """ subscriptionindex: patterns are combined in chunks """
+        subscriptions = dict(SUBSCRIPTIONS)
+        for i in range(subscriptionindex.MAX_COMBINED + 10):
+            subscriptions['x%d' % i] = [u'Help.*%d' % i]
+        index = subscriptionindex.SubscriptionIndex(page_sub(subscriptions))
+        self.check(index, subscriptions)
+        assert index.match([u'HelpOnEditing%d' % 55]) == set(['u2', 'x55', 'x5'])
+        assert len(index.chunks) < len(index.regexes)
+
+    def testSetUser(self):
+        """ subscriptionindex: incremental updates """
+        subscriptions = dict(SUBSCRIPTIONS)
+        index = subscriptionindex.SubscriptionIndex(page_sub(subscriptions))
+        index.match([u'FrontPage'])
+        subscriptions['u2'] = [u'Nothing']
+        index.set_user('u2', subscriptions['u2'])
+        del subscriptions['u4']
+        index.set_user('u4', None)
+        subscriptions['u7'] = [u'.*Xage']
+        index.set_user('u7', subscriptions['u7'])
+        self.check(index, subscriptions)
+        assert u'Help.*' not in index.regexes
+        assert u'Help.*' not in index.compiled
+
+
+class TestGetSubscribers:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageSubscriptionIndex'
+    name = u'__Subscription Index Tester__'
+
+    def setup_method(self, method):
+        self.user = None
+
+    def teardown_method(self, method):
+        if self.user is not None:
+            try:
+                os.remove(self.user._User__filename())
+            except OSError:
+                pass
+            self.user.subscribed_pages = []
+            self.user.updatePageSubCache()
+        user.clearLookupCaches(self.request)
+
+    def testIncrementalUpdate(self):
+        """ subscriptionindex: subscribing updates the index of the process """
+        request = self.request
+        page = Page(request, self.pagename)
+        assert not page.getSubscribers(request, include_self=1)
+        cache_uid = request.cfg.cache.subscriptions[0]
+
+        self.user = user.User(request)
+        self.user.name = self.name
+        self.user.email = 'subscription.tester@example.org'
+        self.user.enc_password = user.encodePassword(request.cfg, self.name)
+        self.user.save()
+        self.user.subscribe(u'AutoCreatedMoinMoinTemporaryTestPageSubscription.*')
+
+        current = request.cfg.cache.subscriptions
+        assert current[0] != cache_uid
+        assert current[0] == caching.CacheEntry(request, 'users', 'pagesubscriptions', scope='userdir').uid()
+        assert self.user.id in current[2].subscriptions
+        subscribers = page.getSubscribers(request, include_self=1)
+        assert subscribers.values() == [['subscription.tester@example.org']]
+
+
+coverage_modules = ['MoinMoin.subscriptionindex']
@@ -280,6 +280,50 @@ class TestLoginWithPassword(object):
         theuser = user.User(self.request, uid)
         assert theuser.email == email
 
+    def testLookupCacheMiss(self):
+        """ failed lookups must not rebuild the lookup cache each time """
+        name = u'__LookupCacheUser__'
+        self.createUser(name, name)
+        assert user.getUserId(self.request, name) == self.user.id
+        rebuilds = []
+        rebuildLookupCaches = user.rebuildLookupCaches
+        user.rebuildLookupCaches = lambda request: rebuilds.append(1)
+        try:
+            for i in range(3):
+                assert user.getUserId(self.request, u'__NoSuchLookupCacheUser__') is None
+        finally:
+            user.rebuildLookupCaches = rebuildLookupCaches
+        assert not rebuilds
+
+    def testLookupCacheNegativeInvalidation(self):
+        """ a remembered miss must be forgotten when the user gets created """
+        name = u'__LookupCacheNewUser__'
+        self.createUser(u'__LookupCacheUser__', u'password')
+        self.user.remove()
+        assert user.getUserId(self.request, name) is None
+        self.createUser(name, name)
+        assert user.getUserId(self.request, name) == self.user.id
+
+    def testLookupCacheRemove(self):
+        name = u'__LookupCacheRemovedUser__'
+        self.createUser(name, name)
+        assert user.getUserId(self.request, name) == self.user.id
+        self.user.remove()
+        assert user.getUserId(self.request, name) is None
+
+    def testLookupCacheDrift(self):
+        """ profiles changed behind moin's back trigger a rebuild """
+        name = u'__LookupCacheDriftUser__'
+        self.createUser(name, name)
+        assert user.getUserId(self.request, u'__SomeNonExistingUser__') is None
+        # remove the profile without telling the lookup cache
+        os.remove(self.user._User__filename())
+        self.user = None
+        assert user.checkLookupCaches(self.request) is False
+        assert user.getUserId(self.request, u'__OtherNonExistingUser__') is None
+        assert user.checkLookupCaches(self.request) is True
+        assert user.getUserId(self.request, name) is None
+
     # Helpers ---------------------------------------------------------
 
     def createUser(self, name, password, pwencoded=False, email=None):
@@ -9,7 +9,8 @@
 
 import py
 
-from MoinMoin import config, wikiutil
+from MoinMoin import caching, config, wikiutil
+from MoinMoin._tests import become_trusted, create_page, nuke_page
 
 from werkzeug import MultiDict
 
@@ -85,6 +86,49 @@ class TestInterWiki:
             assert wikiutil.join_wiki(baseurl, pagename) == url
 
 
+class TestInterWikiMap:
+    def teardown_method(self, method):
+        become_trusted(self.request)
+        nuke_page(self.request, wikiutil.INTERWIKI_PAGE)
+
+    def testResolve(self):
+        request = self.request
+        become_trusted(request)
+        create_page(request, wikiutil.INTERWIKI_PAGE, u'TestWiki http://test.example.org/\n')
+        iwmap = wikiutil.InterWikiMap()
+        assert iwmap.resolve(request, u'TestWiki') == u'http://test.example.org/'
+        assert iwmap.resolve(request, u'Self') == request.script_root + '/'
+        assert iwmap.resolve(request, u'MissingWiki') is None
+        assert iwmap.resolve(request, u'MissingWiki') is None
+        assert iwmap.unresolved == {u'MissingWiki': 2}
+        assert (iwmap.hits, iwmap.requests) == (2, 4)
+
+        create_page(request, wikiutil.INTERWIKI_PAGE, u'TestWiki http://other.example.org/\n')
+        # changes are noticed at most once per request
+        assert iwmap.resolve(request, u'TestWiki') == u'http://test.example.org/'
+        iwmap.checked = None
+        assert iwmap.resolve(request, u'TestWiki') == u'http://other.example.org/'
+
+    def testCompiledMap(self):
+        request = self.request
+        become_trusted(request)
+        create_page(request, wikiutil.INTERWIKI_PAGE, u'TestWiki http://test.example.org/\n')
+        wikiutil.InterWikiMap().get(request)
+        iwmap = wikiutil.InterWikiMap()
+        def compile(request):
+            raise AssertionError('the map should be loaded from the cache')
+        iwmap._compile = compile
+        assert iwmap.get(request)[u'TestWiki'] == u'http://test.example.org/'
+        # changes of other pages do not make the stored map invalid
+        create_page(request, u'AutoCreatedMoinMoinTemporaryTestPageInterWiki', u'foo\n')
+        try:
+            iwmap = wikiutil.InterWikiMap()
+            iwmap._compile = compile
+            assert iwmap.get(request)[u'TestWiki'] == u'http://test.example.org/'
+        finally:
+            nuke_page(request, u'AutoCreatedMoinMoinTemporaryTestPageInterWiki')
+
+
 class TestSystemPage:
     systemPages = (
         'RecentChanges',
@@ -1086,5 +1130,56 @@ class TestVersion(object):
         assert Version(1, 2, 4) > (1, 2, 3)
 
 
+class TestParserRegistry(object):
+    def setup_method(self, method):
+        self.cache = self.request.cfg.cache
+        self.saved = self.cache.__dict__.copy()
+        for name in ('EXT_TO_PARSER', 'EXT_TO_PARSER_DEFAULT'):
+            self.cache.__dict__.pop(name, None)
+        self.build = wikiutil._build_parser_registry
+        self.key = wikiutil._parser_registry_key
+
+    def teardown_method(self, method):
+        wikiutil._build_parser_registry = self.build
+        wikiutil._parser_registry_key = self.key
+        caching.CacheEntry(self.request, 'plugins', 'parsers', scope='wiki').remove()
+        self.cache.__dict__.clear()
+        self.cache.__dict__.update(self.saved)
+
+    def testSameParsers(self):
+        """ wikiutil: getParserForExtension returns the parsers the registry names """
+        cfg = self.request.cfg
+        expected, default = {}, None
+        for pname, exts in wikiutil._build_parser_registry(cfg):
+            Parser = wikiutil.importPlugin(cfg, 'parser', pname, 'Parser')
+            if exts == '*':
+                default = Parser
+            else:
+                for ext in exts:
+                    expected[ext] = Parser
+        for ext in ('.py', '.csv', '.txt', '.html', '.irc', '.no-such-extension'):
+            assert wikiutil.getParserForExtension(cfg, ext) is expected.get(ext, default)
+        assert expected['.csv'].__module__ == 'MoinMoin.parser.text_csv'
+
+    def testRegistryCached(self):
+        """ wikiutil: the parser registry is only rebuilt if the parsers changed """
+        cfg = self.request.cfg
+        registry = wikiutil.getParserRegistry(cfg)
+        built = []
+        def build(cfg):
+            built.append(True)
+            return [('text', '*')]
+        wikiutil._build_parser_registry = build
+        assert wikiutil.getParserRegistry(cfg) == registry
+        assert not built
+        key = self.key(cfg)
+        wikiutil._parser_registry_key = lambda cfg: key[:2] + (key[2] + [('plugin', 'text_new', 0)], )
+        assert wikiutil.getParserRegistry(cfg) == [('text', '*')]
+        assert built
+        wikiutil._parser_registry_key = self.key
+        assert wikiutil.getParserRegistry(cfg) == [('text', '*')] # rebuilt next time
+        assert len(built) == 2
+
+
 coverage_modules = ['MoinMoin.wikiutil']
 
@@ -45,6 +45,7 @@ from MoinMoin.Page import Page
 from MoinMoin.util import filesys, timefuncs
 from MoinMoin.security.textcha import TextCha
 from MoinMoin.events import FileAttachedEvent, FileRemovedEvent, send_event
+from MoinMoin.web.download import send_file_response
 
 action_name = __name__.split('.')[-1]
 
@@ -1029,36 +1030,28 @@ def _do_get(pagename, request):
         request.status_code = 404
         return # error msg already sent in _access_file
 
-    timestamp = datetime.datetime.fromtimestamp(os.path.getmtime(fpath))
-    if_modified = request.if_modified_since
-    if if_modified and if_modified >= timestamp:
-        request.status_code = 304
-    else:
-        mt = wikiutil.MimeType(filename=filename)
-        content_type = mt.content_type()
-        mime_type = mt.mime_type()
-
-        # TODO: fix the encoding here, plain 8 bit is not allowed according to the RFCs
-        # There is no solution that is compatible to IE except stripping non-ascii chars
-        filename_enc = filename.encode(config.charset)
-
-        # for dangerous files (like .html), when we are in danger of cross-site-scripting attacks,
-        # we just let the user store them to disk ('attachment').
-        # For safe files, we directly show them inline (this also works better for IE).
-        dangerous = mime_type in request.cfg.mimetypes_xss_protect
-        content_dispo = dangerous and 'attachment' or 'inline'
-
-        now = time.time()
-        request.headers['Date'] = http_date(now)
-        request.headers['Content-Type'] = content_type
-        request.headers['Last-Modified'] = http_date(timestamp)
-        request.headers['Expires'] = http_date(now - 365 * 24 * 3600)
-        request.headers['Content-Length'] = os.path.getsize(fpath)
-        content_dispo_string = '%s; filename="%s"' % (content_dispo, filename_enc)
-        request.headers['Content-Disposition'] = content_dispo_string
-
-        # send data
-        request.send_file(open(fpath, 'rb'))
+    mt = wikiutil.MimeType(filename=filename)
+    content_type = mt.content_type()
+    mime_type = mt.mime_type()
+
+    # TODO: fix the encoding here, plain 8 bit is not allowed according to the RFCs
+    # There is no solution that is compatible to IE except stripping non-ascii chars
+    filename_enc = filename.encode(config.charset)
+
+    # for dangerous files (like .html), when we are in danger of cross-site-scripting attacks,
+    # we just let the user store them to disk ('attachment').
+    # For safe files, we directly show them inline (this also works better for IE).
+    dangerous = mime_type in request.cfg.mimetypes_xss_protect
+    content_dispo = dangerous and 'attachment' or 'inline'
+
+    now = time.time()
+    request.headers['Date'] = http_date(now)
+    request.headers['Expires'] = http_date(now - 365 * 24 * 3600)
+    content_dispo_string = '%s; filename="%s"' % (content_dispo, filename_enc)
+    request.headers['Content-Disposition'] = content_dispo_string
+
+    # send data (or 304 / 206 / 416, see MoinMoin.web.download)
+    send_file_response(request, fpath, content_type)
 
 
 def _do_install(pagename, request):
@@ -14,7 +14,7 @@
 import re
 import difflib
 
-from MoinMoin import config, wikiutil
+from MoinMoin import config, wikiutil, pagenameindex
 from MoinMoin.Page import Page
 
 
@@ -67,24 +67,22 @@ def findMatches(pagename, request, s_re=None, e_re=None):
     @rtype: tuple
     @return: start word, end word, matches dict
     """
-    # Get full list of pages, with no filtering - very fast. We will
-    # first search for like pages, then filter the results.
-    pages = request.rootpage.getPageList(user='', exists='')
-
-    # Remove current page
-    try:
-        pages.remove(pagename)
-    except ValueError:
-        pass
+    # Use the index of all page names, with no filtering - very fast. We
+    # will first search for like pages, then filter the results.
+    index = pagenameindex.get_index(request)
 
     # Get matches using wiki way, start and end of word
-    start, end, matches = wikiMatches(pagename, pages, start_re=s_re,
-                                      end_re=e_re)
+    start, end = matchWords(pagename, start_re=s_re, end_re=e_re)
+    matches = indexMatches(pagename, index, start, end)
 
     # Get the best 10 close matches
     close_matches = {}
     found = 0
-    for name in closeMatches(pagename, pages):
+    for name in index.close_matches(pagename):
+        # Skip the current page
+        if name == pagename:
+            continue
+
         # Skip names already in matches
         if name in matches:
             continue
@@ -128,6 +126,34 @@ def wikiMatches(pagename, pages, start_re=None, end_re=None):
     @rtype: tuple
     @return: start, end, matches dict
     """
+    start, end = matchWords(pagename, start_re, end_re)
+
+    matches = {}
+    subpage = pagename + '/'
+
+    # Find any matching pages and rank by type of match
+    for name in pages:
+        if name.startswith(subpage):
+            matches[name] = 4
+        else:
+            if name.startswith(start):
+                matches[name] = 1
+            if name.endswith(end):
+                matches[name] = matches.get(name, 0) + 2
+
+    return start, end, matches
+
+
+def matchWords(pagename, start_re=None, end_re=None):
+    """
+    Get the first and the last word of pagename (wiki words if possible)
+
+    @param pagename: page name to match
+    @param start_re: start word re (compile regex)
+    @param end_re: end word re (compile regex)
+    @rtype: tuple
+    @return: start, end
+    """
     if start_re is None:
         start_re = re.compile('([%s][%s]+)' % (config.chars_upper,
                                                config.chars_lower))
@@ -150,20 +176,30 @@ def wikiMatches(pagename, pages, start_re=None, end_re=None):
     else:
         end = words[-1]
 
-    matches = {}
-    subpage = pagename + '/'
+    return start, end
 
-    # Find any matching pages and rank by type of match
-    for name in pages:
-        if name.startswith(subpage):
-            matches[name] = 4
-        else:
-            if name.startswith(start):
-                matches[name] = 1
-            if name.endswith(end):
-                matches[name] = matches.get(name, 0) + 2
 
-    return start, end, matches
+def indexMatches(pagename, index, start, end):
+    """
+    Get pages that start or end with the same word as this page, ranked
+    like wikiMatches does, using a PageNameIndex
+
+    @param pagename: page name to match
+    @param index: PageNameIndex of the pages
+    @param start: start word
+    @param end: end word
+    @rtype: dict
+    @return: matches dict (without pagename)
+    """
+    matches = {}
+    for name in index.startswith(start):
+        matches[name] = 1
+    for name in index.endswith(end):
+        matches[name] = matches.get(name, 0) + 2
+    for name in index.startswith(pagename + '/'):
+        matches[name] = 4
+    matches.pop(pagename, None)
+    return matches
 
 
 def closeMatches(pagename, pages):
@@ -0,0 +1,92 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - tests of the backup action functions
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os, shutil, tarfile, tempfile
+from StringIO import StringIO
+
+from MoinMoin.action import backup
+
+
+class TestBackup:
+    """ testing full and incremental backups """
+
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.write('a.txt', 'a content')
+        self.write('b.txt', 'b content')
+        self.write('skipme.tmp', 'excluded')
+        cfg = self.request.cfg
+        self.saved = cfg.backup_include, cfg.backup_exclude
+        cfg.backup_include = [self.dir]
+        cfg.backup_exclude = lambda filename: filename.endswith('.tmp')
+
+    def teardown_method(self, method):
+        self.request.cfg.backup_include, self.request.cfg.backup_exclude = self.saved
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content, mtime=1000000000):
+        path = os.path.join(self.dir, name)
+        f = open(path, 'wb')
+        f.write(content)
+        f.close()
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def backup(self, base=None):
+        f = StringIO()
+        count, added, manifest = backup.writeBackup(self.request, f, 'w|gz', base)
+        f.seek(0)
+        tar = tarfile.open(fileobj=f, mode='r|gz')
+        names = [os.path.basename(info.name) for info in tar]
+        tar.close()
+        return names, backup.readManifest(StringIO(manifest))
+
+    def test_full(self):
+        names, manifest = self.backup()
+        assert names == ['a.txt', 'b.txt', backup.MANIFEST_NAME]
+        path = os.path.join(self.dir, 'a.txt')
+        assert manifest[path] == (9, 1000000000, backup.file_hash(path))
+        assert len(manifest) == 2
+
+    def test_incremental(self):
+        names, manifest = self.backup()
+        self.write('a.txt', 'a changed', mtime=1100000000)
+        self.write('c.txt', 'c content')
+        os.remove(os.path.join(self.dir, 'b.txt'))
+        names, new_manifest = self.backup(manifest)
+        assert names == ['a.txt', 'c.txt', backup.MANIFEST_NAME]
+        assert sorted([os.path.basename(path) for path in new_manifest]) == ['a.txt', 'c.txt']
+        names, manifest = self.backup(new_manifest)
+        assert names == [backup.MANIFEST_NAME]
+
+    def test_unchanged_content(self):
+        """ a new mtime alone does not put the file into the backup """
+        names, manifest = self.backup()
+        path = self.write('a.txt', 'a content', mtime=1100000000)
+        names, new_manifest = self.backup(manifest)
+        assert names == [backup.MANIFEST_NAME]
+        assert new_manifest[path][1] == 1100000000
+
+    def test_rewrite_within_a_second(self):
+        """ a same size rewrite within the same second is noticed """
+        self.write('a.txt', 'a content', mtime=1000000000.25)
+        names, manifest = self.backup()
+        self.write('a.txt', 'A content', mtime=1000000000.75)
+        names, manifest = self.backup(manifest)
+        assert names == ['a.txt', backup.MANIFEST_NAME]
+
+    def test_bad_manifest(self):
+        try:
+            backup.readManifest(StringIO('no manifest\n'))
+        except ValueError:
+            pass
+        else:
+            assert False, 'ValueError not raised'
+
+
+coverage_modules = ['MoinMoin.action.backup']
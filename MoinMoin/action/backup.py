@@ -8,43 +8,143 @@
     configuration - please make sure you have everything you need BEFORE you
     really need it.
 
+    Every backup contains a manifest (MANIFEST_NAME) listing size, mtime and
+    SHA1 hash of all backed up files. If you upload the manifest of your last
+    backup, you get an incremental backup: it only contains the files that
+    are new or changed since then (and the complete new manifest, so files
+    not listed there got deleted). See also "moin export backup".
+
     Note: there is no restore support, you need somebody having access to your
           wiki installation via the server's file system, knowing about tar
           and restoring your data CAREFULLY (AKA "the server admin").
 
-    @copyright: 2005-2008 by MoinMoin:ThomasWaldmann
+    @copyright: 2005-2008 by MoinMoin:ThomasWaldmann,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
 import os, re, time
+import hashlib
 import tarfile
+from StringIO import StringIO
 
 from MoinMoin import wikiutil
 
+MANIFEST_NAME = 'MoinMoin-backup-manifest.txt'
+MANIFEST_HEADER = '# MoinMoin backup manifest: sha1 size mtime path\n'
 
-def addFiles(path, tar, exclude_func):
-    """ Add files in path to tar """
-    for root, dirs, files in os.walk(path):
-        files.sort() # sorted page revs may compress better
-        for name in files:
-            path = os.path.join(root, name)
-            if exclude_func(path):
-                continue
-            tar.add(path)
 
+def file_hash(path):
+    """ Return the SHA1 (hex) of the content of file path """
+    sha = hashlib.sha1()
+    f = open(path, 'rb')
+    try:
+        while True:
+            data = f.read(65536)
+            if not data:
+                break
+            sha.update(data)
+    finally:
+        f.close()
+    return sha.hexdigest()
 
-def sendBackup(request):
-    """ Send compressed tar file """
-    dateStamp = time.strftime("%Y-%m-%d--%H-%M-%S-UTC", time.gmtime())
-    filename = "%s-%s.tar.%s" % (request.cfg.siteid, dateStamp, request.cfg.backup_compression)
-    request.headers['Content-Type'] = 'application/octet-stream'
-    request.headers['Content-Disposition'] = 'inline; filename="%s"' % filename
-    tar = tarfile.open(fileobj=request, mode="w|%s" % request.cfg.backup_compression)
+
+def readManifest(f):
+    """ Return dict path -> (size, mtime, sha1) of a backup manifest
+
+    @param f: file-like object with the manifest
+    """
+    manifest = {}
+    for line in f:
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('#'):
+            continue
+        try:
+            sha, size, mtime, path = line.split('\t', 3)
+            manifest[path] = int(size), float(mtime), sha
+        except ValueError:
+            raise ValueError("bad manifest line: %r" % line)
+    return manifest
+
+
+def backupFiles(request, base=None):
+    """ Yield the files to back up
+
+    Files with the same size and mtime as in the base manifest are not read
+    again, we trust the hash stored in the manifest.
+
+    @param base: manifest (see readManifest) of an older backup or None
+    @return: iterator over (path, size, mtime, sha1, changed) - changed is
+             True if the file is not in base or has other content
+    """
+    exclude = request.cfg.backup_exclude
+    if base is None:
+        base = {}
+    for path in request.cfg.backup_include:
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            files.sort() # sorted page revs may compress better
+            for name in files:
+                path = os.path.join(root, name)
+                if exclude(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue # vanished
+                size, mtime = st.st_size, st.st_mtime # float, to notice rewrites within a second
+                old = base.get(path)
+                if old is not None and old[:2] == (size, mtime):
+                    sha = old[2]
+                else:
+                    try:
+                        sha = file_hash(path)
+                    except IOError:
+                        continue # vanished or not readable
+                yield path, size, mtime, sha, old is None or old[2] != sha
+
+
+def writeBackup(request, fileobj, mode, base=None):
+    """ Write a (streamed) tar file with the files to back up and the manifest
+
+    @param fileobj: file object to write to
+    @param mode: tarfile mode, e.g. "w|gz"
+    @param base: manifest (see readManifest) of an older backup for an
+                 incremental backup, None for a full backup
+    @return: (number of files, number of files in the tar file, manifest)
+    """
+    tar = tarfile.open(fileobj=fileobj, mode=mode)
     # allow GNU tar's longer file/pathnames
     tar.posix = False
-    for path in request.cfg.backup_include:
-        addFiles(path, tar, request.cfg.backup_exclude)
+    manifest = [MANIFEST_HEADER]
+    count = added = 0
+    for path, size, mtime, sha, changed in backupFiles(request, base):
+        count += 1
+        if changed:
+            try:
+                tar.add(path)
+            except (IOError, OSError):
+                continue # vanished, don't list it
+            added += 1
+        manifest.append('%s\t%d\t%r\t%s\n' % (sha, size, mtime, path))
+    manifest = ''.join(manifest)
+    info = tarfile.TarInfo(MANIFEST_NAME)
+    info.size = len(manifest)
+    info.mtime = time.time()
+    info.mode = 0600
+    tar.addfile(info, StringIO(manifest))
     tar.close()
+    return count, added, manifest
+
+
+def sendBackup(request, base=None):
+    """ Send compressed tar file (incremental if base manifest is given) """
+    dateStamp = time.strftime("%Y-%m-%d--%H-%M-%S-UTC", time.gmtime())
+    kind = base is not None and '-incremental' or ''
+    filename = "%s-%s%s.tar.%s" % (request.cfg.siteid, dateStamp, kind, request.cfg.backup_compression)
+    request.headers['Content-Type'] = 'application/octet-stream'
+    request.headers['Content-Disposition'] = 'inline; filename="%s"' % filename
+    writeBackup(request, request, "w|%s" % request.cfg.backup_compression, base)
 
 
 def sendBackupForm(request, pagename):
@@ -70,6 +170,22 @@ To get a backup, just click here:""", wiki=True))
 <input type="hidden" name="do" value="backup">
 <input type="submit" value="%(backup_button)s">
 </form>
+""" % {
+    'baseurl': request.script_root,
+    'pagename': wikiutil.quoteWikinameURL(pagename),
+    'backup_button': _('Backup'),
+})
+
+    request.write(_("""To get an incremental backup (only the files changed since your last backup), upload the %(manifest)s file of your last backup:""") % {
+        'manifest': MANIFEST_NAME})
+
+    request.write("""
+<form action="%(baseurl)s/%(pagename)s" method="POST" enctype="multipart/form-data">
+<input type="hidden" name="action" value="backup">
+<input type="hidden" name="do" value="backup">
+<input type="file" name="manifest">
+<input type="submit" value="%(backup_button)s">
+</form>
 """ % {
     'baseurl': request.script_root,
     'pagename': wikiutil.quoteWikinameURL(pagename),
@@ -105,7 +221,15 @@ def execute(pagename, request):
 
     dowhat = request.form.get('do')
     if dowhat == 'backup':
-        sendBackup(request)
+        base = None
+        manifest = request.files.get('manifest')
+        if manifest is not None and manifest.filename:
+            try:
+                base = readManifest(manifest.stream)
+            except ValueError:
+                return sendMsg(request, pagename,
+                               msg=_('This is not a backup manifest.'), msgtype="error")
+        sendBackup(request, base)
     elif dowhat is None:
         sendBackupForm(request, pagename)
     else:
@@ -249,7 +249,13 @@ def execute(pagename, request):
 
         count = 0
         pgactioncount = 0
-        for line in log.reverse():
+        if paging and offset:
+            # skip the newest <offset> entries without reading them
+            entries = log.reverse(log_size - offset)
+            count = offset
+        else:
+            entries = log.reverse()
+        for line in entries:
             count += 1
 
             if paging and count <= offset:
@@ -0,0 +1,23 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - "metrics" action
+
+    Shows the request timing histograms and item cache hit ratios of all
+    processes in the Prometheus text format, see MoinMoin.util.metrics.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin import Page
+from MoinMoin.util import metrics
+
+
+def execute(pagename, request):
+    _ = request.getText
+    if not (request.user.isSuperUser() or request.remote_addr in request.cfg.metrics_hosts):
+        request.theme.add_msg(_('You are not allowed to use this action.'), "error")
+        return Page.Page(request, pagename).send_page()
+
+    request.mimetype = 'text/plain'
+    request.write(metrics.report(request))
@@ -9,6 +9,8 @@
 """
 
 import os
+import errno
+import stat
 import shutil
 import tempfile
 
@@ -48,6 +50,50 @@ def get_cache_list(request, arena, scope):
         return []
 
 
+def get_arena_entries(request, arena, scope):
+    """ Return total size and list of (mtime, size, path) of the entries
+        (files) of a cache arena
+    """
+    arena_dir = get_arena_dir(request, arena, scope)
+    total = 0
+    entries = []
+    for name in get_cache_list(request, arena, scope):
+        path = os.path.join(arena_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            continue # e.g. the lock directory
+        total += st.st_size
+        entries.append((st.st_mtime, st.st_size, path))
+    return total, entries
+
+
+def evict_arena(request, arena, scope, max_size):
+    """ Remove the least recently used entries of a cache arena down to 3/4
+        of max_size. The mtime of an entry must be its last use (see
+        CacheEntry.touch).
+
+        @return: the remaining size of the arena
+    """
+    total, entries = get_arena_entries(request, arena, scope)
+    entries.sort()
+    removed = 0
+    for mtime, size, path in entries:
+        if total <= max_size * 3 // 4:
+            break
+        try:
+            os.remove(path)
+        except OSError, err:
+            if err.errno != errno.ENOENT:
+                continue
+        total -= size
+        removed += 1
+    logging.debug("cache arena %s: evicted %d entries, %d bytes left" % (arena, removed, total))
+    return total
+
+
 class CacheEntry:
     def __init__(self, request, arena, key, scope='wiki', do_locking=True,
                  use_pickle=False, use_encode=False):
@@ -103,6 +149,15 @@ class CacheEntry:
         except (IOError, OSError):
             return 0
 
+    def touch(self):
+        """ Set the mtime of the cache file to now, e.g. to remember its
+            last use for evict_arena.
+        """
+        try:
+            os.utime(self._fname, None)
+        except OSError:
+            pass
+
     def uid(self):
         """ Return a value that likely changes when the on-disk cache was updated.
 
@@ -222,6 +277,10 @@ class CacheEntry:
         """
         return self._fileobj.read(size)
 
+    def fileno(self):
+        """ return the file descriptor of the opened cache file (e.g. for mmap) """
+        return self._fileobj.fileno()
+
     def write(self, data):
         """ write data to cache file
 
@@ -26,8 +26,11 @@ from MoinMoin.events import PageChangedEvent, PageRenamedEvent
 from MoinMoin.events import PageDeletedEvent, PageCopiedEvent
 from MoinMoin.events import PageRevertedEvent, FileAttachedEvent
 import MoinMoin.web.session
+import MoinMoin.web.surge
 from MoinMoin.packages import packLine
-from MoinMoin.security import AccessControlList
+from MoinMoin.security import AccessControlList, ACLDecisionCache
+from MoinMoin.util.metrics import Metrics
+from MoinMoin.datastruct.backends.wiki_groups import WikiGroupIndex
 
 _url_re_cache = None
 _farmconfig_mtime = None
@@ -227,6 +230,7 @@ class ConfigFunctionality(object):
     _iwid = None
     _iwid_full = None
     xapian_searchers = None
+    search_index_trigrams = None
     moinmoin_dir = None
     # will be lazily loaded by interwiki code when needed (?)
     shared_intermap_files = None
@@ -236,7 +240,9 @@ class ConfigFunctionality(object):
         self.siteid = siteid
         self.cache = CacheClass()
 
-        from MoinMoin.Page import ItemCache
+        from MoinMoin.Page import ItemCache, SharedItemCache
+        if self.item_cache_shared:
+            ItemCache = SharedItemCache
         self.cache.meta = ItemCache('meta')
         self.cache.pagelists = ItemCache('pagelists')
 
@@ -252,7 +258,7 @@ class ConfigFunctionality(object):
             if not getattr(self, name, None):
                 setattr(self, name, os.path.abspath(os.path.join(data_dir, dirname)))
         # directories below cache_dir (using __dirname__ to avoid conflicts)
-        for dirname in ('session', ):
+        for dirname in ('session', 'outbox', ):
             name = dirname + '_dir'
             if not getattr(self, name, None):
                 setattr(self, name, os.path.abspath(os.path.join(self.cache_dir, '__%s__' % dirname)))
@@ -368,6 +374,9 @@ class ConfigFunctionality(object):
         # list to cache xapian searcher objects
         self.xapian_searchers = []
 
+        # dict to cache the vocabulary trigram indexes of moin's builtin search index
+        self.search_index_trigrams = {}
+
         # check if mail is possible and set flag:
         self.mail_enabled = (self.mail_smarthost is not None or self.mail_sendmail is not None) and self.mail_from
         self.mail_enabled = self.mail_enabled and True or False
@@ -386,6 +395,12 @@ class ConfigFunctionality(object):
         self.cache.acl_rights_before = AccessControlList(self, [self.acl_rights_before])
         self.cache.acl_rights_default = AccessControlList(self, [self.acl_rights_default])
         self.cache.acl_rights_after = AccessControlList(self, [self.acl_rights_after])
+        self.cache.acl_decisions = ACLDecisionCache()
+        self.cache.wiki_group_index = WikiGroupIndex()
+        self.cache.group_indexes = {}
+        self.cache.interwiki = wikiutil.InterWikiMap()
+        self.cache.subscriptions = None # (cache uid, page_sub, SubscriptionIndex), see MoinMoin.subscriptionindex
+        self.cache.metrics = Metrics()
 
         action_prefix = self.url_prefix_action
         if action_prefix is not None and action_prefix.endswith('/'): # make sure there is no trailing '/'
@@ -763,7 +778,7 @@ options_no_group_name = {
   # ==========================================================================
   'session': ('Session settings', "Session-related settings, see HelpOnSessions.", (
     ('session_service', DefaultExpression('web.session.FileSessionService()'),
-     "The session service."),
+     "The session service, e.g. `web.session.FileSessionService()` (one file per session) or `web.session.SQLiteSessionService()` (one database for all sessions, removes expired sessions automatically)."),
     ('cookie_name', None,
      'The variable part of the session cookie name. (None = determine from URL, siteidmagic = use siteid, any other string = use that)'),
     ('cookie_secure', None,
@@ -866,6 +881,8 @@ options_no_group_name = {
      },
      "Surge protection tries to deny clients causing too much load/traffic, see HelpOnConfiguration/SurgeProtection."),
     ('surge_lockout_time', 3600, "time [s] someone gets locked out when ignoring the warnings"),
+    ('surge_backend', DefaultExpression('web.surge.SharedSurgeBackend()'),
+     "The surge protection backend that counts the requests, e.g. `web.surge.SharedSurgeBackend()` (shared by all processes) or `web.surge.MemorySurgeBackend()` (single process)."),
 
     ('textchas', None,
      "Spam protection setup using site-specific questions/answers, see HelpOnSpam."),
@@ -1021,6 +1038,7 @@ options_no_group_name = {
     ('data_underlay_dir', './underlay/', "Path to the underlay directory containing distribution system and help pages."),
     ('cache_dir', None, "Directory for caching, by default computed from `data_dir`/cache."),
     ('session_dir', None, "Directory for session storage, by default computed to be `cache_dir`/__session__."),
+    ('outbox_dir', None, "Directory for queued notifications (see notification_outbox), by default computed to be `cache_dir`/__outbox__."),
     ('user_dir', None, "Directory for user storage, by default computed to be `data_dir`/user."),
     ('plugin_dir', None, "Plugin directory, by default computed to be `data_dir`/plugin."),
     ('plugin_dirs', [], "Additional plugin directories."),
@@ -1105,6 +1123,12 @@ options_no_group_name = {
 
     ('default_markup', 'wiki', 'Default page parser / format (name of module in `MoinMoin.parser`)'),
 
+    ('fragment_cache', True, "if True, cache the html output of the Include and TableOfContents macros (invalidated when the included pages change)"),
+    ('fragment_cache_size', 50 * 1024 * 1024,
+     "Size limit [bytes] of the cached Include and TableOfContents output (least recently used entries get removed), 0 = no limit"),
+    ('highlight_cache_size', 20 * 1024 * 1024,
+     "Size limit [bytes] of the disk cache of highlighted code blocks (least recently used entries get removed), 0 = only cache them in memory"),
+
     ('html_head', '', "Additional <HEAD> tags, see HelpOnThemes."),
     ('html_head_queries', '<meta name="robots" content="noindex,nofollow">\n',
      "Additional <HEAD> tags for requests with query strings, like actions."),
@@ -1115,6 +1139,9 @@ options_no_group_name = {
     ('html_head_normal', '<meta name="robots" content="index,nofollow">\n',
      "Additional <HEAD> tags for most normal pages."),
 
+    ('item_cache_shared', False,
+     "if True, share the cached page meta data and page lists between all processes of the wiki (using a SQLite database in `cache_dir`), otherwise every process caches them in its own memory."),
+
     ('language_default', 'en', "Default language for user interface and page content, see HelpOnLanguages."),
     ('language_ignore_browser', False, "if True, ignore user's browser language settings, see HelpOnLanguages."),
 
@@ -1124,8 +1151,14 @@ options_no_group_name = {
      "if True, do a reverse DNS lookup on page SAVE. If your DNS is broken, set this to False to speed up SAVE."),
     ('log_timing', False,
      "if True, add timing infos to the log output to analyse load conditions"),
+    ('metrics_interval', 60,
+     "aggregate the request timers into histograms per process and store them every that many seconds for action=metrics and 'moin cli metrics' (None = no metrics)"),
+    ('metrics_hosts', [],
+     "list of IP addresses that may fetch action=metrics without being superuser (e.g. your monitoring server)"),
     ('log_events_format', 1,
      "0 = no events logging, 1 = standard format (like <= 1.9.7) [default], 2 = extended format"),
+    ('log_events_buffer', None,
+     "(max_events, max_seconds), e.g. (100, 5.0): buffer events per process and append them to the event-log when max_events are buffered or the oldest is max_seconds old (checked when an event is logged and at the end of a request, and at process exit). None = append every event immediately [default]."),
 
     # some dangerous mimetypes (we don't use "content-disposition: inline" for them when a user
     # downloads such attachments, because the browser might execute e.g. Javascript contained
@@ -1161,12 +1194,26 @@ options_no_group_name = {
      ],
      'mimetypes that can be embedded by the [[HelpOnMacros/EmbedObject|EmbedObject macro]]'),
 
+    ('notification_outbox', False,
+     "if True, email and jabber notifications are only queued in `outbox_dir` when a page changes; run `moin maint deliver` (e.g. from cron or with --loop) to send them."),
+
     ('refresh', None,
      "refresh = (minimum_delay_s, targets_allowed) enables use of `#refresh 5 PageName` processing instruction, targets_allowed must be either `'internal'` or `'external'`"),
     ('rss_cache', 60, "suggested caching time for Recent''''''Changes RSS, in second"),
 
+    ('search_index', False,
+     "True to use moin's builtin full text search index when not using Xapian (build it with `moin index build --engine=builtin`)"),
+    ('filter_cache_size', 100 * 1024 * 1024,
+     "Size limit [bytes] of the cache of the text the filters extract from attachments for the search index (least recently used entries get removed), 0 = no cache"),
+    ('filter_max_concurrency', {'default': 2},
+     "Maximum number of concurrent runs of a filter (e.g. one calling pdftotext) over all processes of the wiki, by filter module name ('default' for the others), 0 = no limit"),
     ('search_results_per_page', 25, "Number of hits shown per page in the search results"),
 
+    ('send_file_header', None,
+     "Header to let the front-end web server send attachments, e.g. 'X-Sendfile' (Apache mod_xsendfile, lighttpd) or 'X-Accel-Redirect' (nginx). None = send them from moin."),
+    ('send_file_path_map', [],
+     "List of (path prefix, replacement) tuples applied to the file path put into the send_file_header, e.g. [('/srv/wiki/data/', '/protected/')] for an nginx internal location."),
+
     ('siteid', 'default', None),
     ('xmlrpc_overwrite_user', True, "Overwrite authenticated user at start of xmlrpc code"),
   )),
@@ -1200,6 +1247,8 @@ options = {
     'ACLs control who may do what, see HelpOnAccessControlLists.',
     (
       ('hierarchic', False, 'True to use hierarchical ACLs'),
+      ('decision_cache', True,
+       "True to remember ACL decisions (until the ACLs or group pages change), False if groups change outside of the wiki (e.g. LDAP groups)"),
       ('rights_default', u"Trusted:read,write,delete,revert Known:read,write,delete,revert All:read,write",
        "ACL used if no ACL is specified on the page"),
       ('rights_before', u"",
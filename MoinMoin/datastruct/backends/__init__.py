@@ -85,6 +85,14 @@ class BaseGroupsBackend(object):
     def _retrieve_members(self, group_name):
         raise NotImplementedError()
 
+    def membership_index(self):
+        """
+        Return the GroupIndex (see MoinMoin.datastruct.backends.group_index)
+        of the groups defined in this backend or None if this backend has
+        no index.
+        """
+        return None
+
     def groups_with_member(self, member):
         """
         List all group names of groups containing <member>.
@@ -92,6 +100,11 @@ class BaseGroupsBackend(object):
         @param member: member name [unicode]
         @return: list of group names [unicode]
         """
+        index = self.membership_index()
+        if index is not None:
+            for group_name in index.groups_with_member(self.request, member):
+                yield group_name
+            return
         for group_name in self:
             try:
                 if member in self[group_name]:
@@ -200,6 +213,9 @@ class GreedyGroup(BaseGroup):
         """
 
         if processed_groups is None:
+            index = self._backend.membership_index()
+            if index is not None and self.name in index.definitions:
+                return index.has_member(self.request, self.name, member)
             processed_groups = set()
 
         processed_groups.add(self.name)
@@ -0,0 +1,80 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.datastruct.backends.group_index tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin.datastruct.backends.group_index import GroupIndex
+from MoinMoin._tests import become_trusted, create_page, nuke_page
+
+
+class TestGroupIndex(object):
+
+    definitions = {
+        u'EditorGroup': (set([u'Editor1']), set([u'AdminGroup'])),
+        u'AdminGroup': (set([u'Admin1']), set([u'RecursiveGroup'])),
+        u'RecursiveGroup': (set([u'Something']), set([u'AdminGroup', u'NotExistingGroup'])),
+    }
+
+    def test_closure(self):
+        index = GroupIndex('test', self.definitions)
+        request = self.request
+        assert index.groups_with_member(request, u'Editor1') == [u'EditorGroup']
+        assert index.groups_with_member(request, u'Something') == [u'AdminGroup', u'EditorGroup', u'RecursiveGroup']
+        assert index.groups_with_member(request, u'AdminGroup') == [u'AdminGroup', u'EditorGroup', u'RecursiveGroup']
+        assert index.has_member(request, u'EditorGroup', u'Admin1')
+        assert not index.has_member(request, u'AdminGroup', u'Editor1')
+        assert index.groups_with_member(request, u'Nobody') == []
+
+    def test_external(self):
+        index = GroupIndex('test', self.definitions)
+        assert index.external == {u'EditorGroup': set([u'NotExistingGroup']),
+                                  u'AdminGroup': set([u'NotExistingGroup']),
+                                  u'RecursiveGroup': set([u'NotExistingGroup'])}
+
+
+class TestWikiGroupIndex(object):
+
+    def teardown_method(self, method):
+        become_trusted(self.request)
+        nuke_page(self.request, u'IndexTestGroup')
+        nuke_page(self.request, u'IndexTestOtherGroup')
+
+    def test_incremental(self):
+        request = self.request
+        become_trusted(request)
+        wiki_group_index = request.cfg.cache.wiki_group_index
+        create_page(request, u'IndexTestGroup', u' * ExampleUser\n * IndexTestOtherGroup\n')
+        create_page(request, u'IndexTestOtherGroup', u' * OtherUser\n')
+        groups = request.groups
+        assert u'OtherUser' in groups[u'IndexTestGroup']
+        index = wiki_group_index.get(request)
+        assert index.definitions[u'IndexTestOtherGroup'] == (set([u'OtherUser']), set())
+        assert wiki_group_index.get(request) is index # nothing changed
+
+        create_page(request, u'IndexTestOtherGroup', u' * ThirdUser\n')
+        assert u'OtherUser' not in groups[u'IndexTestGroup']
+        assert u'ThirdUser' in groups[u'IndexTestGroup']
+        assert u'IndexTestGroup' in list(groups.groups_with_member(u'ThirdUser'))
+
+        nuke_page(request, u'IndexTestOtherGroup')
+        assert u'IndexTestOtherGroup' not in groups
+        assert u'ThirdUser' not in groups[u'IndexTestGroup']
+
+    def test_persistent(self):
+        request = self.request
+        become_trusted(request)
+        create_page(request, u'IndexTestGroup', u' * ExampleUser\n')
+        request.cfg.cache.wiki_group_index.get(request)
+        # a new process loads the stored index and reads the edit-log from there
+        wiki_group_index = request.cfg.cache.wiki_group_index.__class__()
+        create_page(request, u'IndexTestOtherGroup', u' * OtherUser\n')
+        index = wiki_group_index.get(request)
+        assert index.definitions[u'IndexTestGroup'] == (set([u'ExampleUser']), set())
+        assert index.definitions[u'IndexTestOtherGroup'] == (set([u'OtherUser']), set())
+
+
+coverage_modules = ['MoinMoin.datastruct.backends.group_index',
+                    'MoinMoin.datastruct.backends.wiki_groups']
@@ -12,6 +12,7 @@ backends.
 """
 
 from MoinMoin.datastruct.backends import BaseGroupsBackend, GroupDoesNotExistError
+from MoinMoin.datastruct.backends.group_index import cached_index
 
 
 class CompositeGroups(BaseGroupsBackend):
@@ -65,6 +66,27 @@ class CompositeGroups(BaseGroupsBackend):
                 return True
         return False
 
+    def membership_index(self):
+        """
+        Return the GroupIndex of the groups of all backends (a group defined
+        in several backends is taken from the backend listed first), None if
+        one of the backends has no index (e.g. groups in LDAP).
+        """
+        indexes = []
+        for backend in self._backends:
+            index = backend.membership_index()
+            if index is None:
+                return None
+            indexes.append(index)
+
+        def definitions():
+            result = {}
+            for index in reversed(indexes):
+                result.update(index.definitions)
+            return result
+
+        return cached_index(self.request, ('composite', ) + tuple([index.key for index in indexes]), definitions)
+
     def __repr__(self):
         return "<%s backends=%s>" % (self.__class__, self._backends)
 
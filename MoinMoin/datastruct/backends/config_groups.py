@@ -10,6 +10,7 @@ members in a configuration file.
 """
 
 from MoinMoin.datastruct.backends import GreedyGroup, BaseGroupsBackend, GroupDoesNotExistError
+from MoinMoin.datastruct.backends.group_index import cached_index
 
 
 class ConfigGroup(GreedyGroup):
@@ -26,6 +27,7 @@ class ConfigGroups(BaseGroupsBackend):
         super(ConfigGroups, self).__init__(request)
 
         self._groups = groups
+        self._index = None
 
     def __contains__(self, group_name):
         return group_name in self._groups
@@ -42,3 +44,19 @@ class ConfigGroups(BaseGroupsBackend):
         except KeyError:
             raise GroupDoesNotExistError(group_name)
 
+    def membership_index(self):
+        if self._index is None:
+            # the groups dict is usually created again for every request,
+            # so we identify the index by its content
+            key = ('config', tuple(sorted([(group_name, tuple(sorted(members)))
+                                           for group_name, members in self._groups.iteritems()])))
+            self._index = cached_index(self.request, key, self._definitions)
+        return self._index
+
+    def _definitions(self):
+        definitions = {}
+        for group_name in self._groups:
+            group = self[group_name]
+            definitions[group_name] = group.members, group.member_groups
+        return definitions
+
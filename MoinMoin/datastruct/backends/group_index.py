@@ -0,0 +1,93 @@
+# -*- coding: iso-8859-1 -*-
+"""
+MoinMoin - group membership index
+
+A GroupIndex knows the transitive closure of the group definitions of a
+backend: for every member (user or group name) the names of all groups
+containing it, directly or via member groups. So checking membership or
+listing the groups of a member are dictionary lookups instead of loading
+and recursing through the group definitions.
+
+Member groups not defined in the indexed backend (e.g. groups of another
+backend, or not existing groups) are remembered per group and are checked
+via request.groups like GreedyGroup does it.
+
+@copyright: 2026 by the MoinMoin project
+@license: GPL, see COPYING for details
+"""
+
+MAX_INDEXES = 20 # GroupIndex objects kept in cfg.cache.group_indexes
+
+_empty = frozenset()
+
+
+class GroupIndex(object):
+
+    def __init__(self, key, definitions):
+        """
+        @param key: hashable, identifies the definitions
+        @param definitions: dict group name -> (members, member_groups)
+        """
+        self.key = key
+        self.definitions = definitions
+        member_of = {} # member -> set of group names
+        external = {} # group name -> member groups not in definitions
+        for group_name in definitions:
+            reached = set([group_name])
+            todo = [group_name]
+            outside = set()
+            while todo:
+                members, member_groups = definitions[todo.pop()]
+                for member in members:
+                    member_of.setdefault(member, set()).add(group_name)
+                for member in member_groups:
+                    member_of.setdefault(member, set()).add(group_name)
+                    if member not in definitions:
+                        outside.add(member)
+                    elif member not in reached:
+                        reached.add(member)
+                        todo.append(member)
+            if outside:
+                external[group_name] = outside
+        self.member_of = dict([(member, frozenset(names)) for member, names in member_of.iteritems()])
+        self.external = external
+
+    def _in_external(self, request, group_name, member, checked):
+        groups = request.groups
+        for external_name in self.external.get(group_name, ()):
+            if external_name not in checked:
+                checked[external_name] = external_name in groups and member in groups[external_name]
+            if checked[external_name]:
+                return True
+        return False
+
+    def has_member(self, request, group_name, member):
+        """ Is <member> in group <group_name> (directly or via member groups)? """
+        if group_name in self.member_of.get(member, _empty):
+            return True
+        return self._in_external(request, group_name, member, {})
+
+    def groups_with_member(self, request, member):
+        """ Return the names of the groups containing <member> (sorted) """
+        names = set(self.member_of.get(member, _empty))
+        checked = {}
+        for group_name in self.external:
+            if group_name not in names and self._in_external(request, group_name, member, checked):
+                names.add(group_name)
+        return sorted(names)
+
+
+def cached_index(request, key, get_definitions):
+    """ Return the GroupIndex for key, create it if needed
+
+    @param key: hashable, identifies the definitions
+    @param get_definitions: function returning the definitions for key
+    """
+    indexes = request.cfg.cache.group_indexes
+    try:
+        return indexes[key]
+    except KeyError:
+        if len(indexes) >= MAX_INDEXES:
+            indexes.clear()
+        index = indexes[key] = GroupIndex(key, get_definitions())
+        return index
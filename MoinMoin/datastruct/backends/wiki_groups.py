@@ -13,55 +13,180 @@ HelpOnConfiguration.
 MoinMoin.formatter.groups is used to extract group members from a
 page.
 
+The definitions of all group pages are kept in a GroupIndex
+(cfg.cache.wiki_group_index), which is persisted in the cache and updated
+from the edit-log when group pages change.
+
 
 @copyright: 2008 MoinMoin:ThomasWaldmann,
-            2009 MoinMoin:DmitrijsMilajevs
+            2009 MoinMoin:DmitrijsMilajevs,
+            2026 by the MoinMoin project
 @license: GPL, see COPYING for details
 """
 
+import threading
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
 from MoinMoin import caching, wikiutil
 from MoinMoin.Page import Page
 from MoinMoin.datastruct.backends import GreedyGroup, BaseGroupsBackend, GroupDoesNotExistError
+from MoinMoin.datastruct.backends.group_index import GroupIndex
 from MoinMoin.formatter.groups import Formatter
 
+SAVE_AFTER_ITEMS = 1000 # store the edit-log position after that many edit-log entries
+
+
+class WikiGroupIndex(object):
+    """
+    Keeps the GroupIndex of all group pages of a wiki up-to-date.
+
+    Every process reads the changed page names from the edit-log and only
+    loads the changed group pages again. The group definitions and the
+    edit-log position are stored in the cache (arena 'groupindex'), so a new
+    process does not need to load all group pages.
+    """
+    def __init__(self):
+        self.index = None
+        self.log_pos = None
+        self.pattern = None
+        self.generation = 0
+        self.unsaved = 0
+        self.lock = threading.Lock()
+
+    def _cache(self, request):
+        return caching.CacheEntry(request, 'groupindex', 'wiki', scope='wiki', use_pickle=True)
+
+    def get(self, request):
+        """ Return the up-to-date GroupIndex or None while it is (re)built """
+        if not self.lock.acquire(False):
+            # we are loading group pages for it (maybe in this thread) - the
+            # old index is better than nothing, None means "load the group"
+            return self.index
+        try:
+            if self.index is None or self.pattern != request.cfg.page_group_regex:
+                self._load(request)
+            else:
+                self._refresh(request)
+            return self.index
+        finally:
+            self.lock.release()
+
+    def _set(self, definitions):
+        self.generation += 1
+        self.index = GroupIndex(('wiki', id(self), self.generation), definitions)
+
+    def _save(self, request):
+        try:
+            self._cache(request).update((self.pattern, self.log_pos, self.index.definitions))
+            self.unsaved = 0
+        except caching.CacheError, err:
+            logging.warning("can't store wiki group index: %s" % str(err))
+
+    def _load(self, request):
+        from MoinMoin.logfile import editlog
+        self.pattern = request.cfg.page_group_regex
+        try:
+            pattern, log_pos, definitions = self._cache(request).content()
+            if pattern != self.pattern:
+                raise caching.CacheError
+        except (caching.CacheError, ValueError, TypeError):
+            log_pos = editlog.EditLog(request).size()
+            backend = WikiGroups(request)
+            definitions = {}
+            for group_name in backend:
+                try:
+                    definitions[group_name] = load_group(request, backend, group_name)
+                except GroupDoesNotExistError:
+                    pass
+            self.log_pos = log_pos
+            self._set(definitions)
+            self._save(request)
+        else:
+            self.log_pos = log_pos
+            self._set(definitions)
+            self._refresh(request)
+
+    def _refresh(self, request):
+        from MoinMoin.logfile import editlog
+        new_pos, items = editlog.EditLog(request).news(self.log_pos)
+        if not items:
+            return
+        group_regex = request.cfg.cache.page_group_regexact
+        changed = set([name for name in items if group_regex.search(name)])
+        self.log_pos = new_pos
+        self.unsaved += len(items)
+        if changed:
+            backend = WikiGroups(request)
+            definitions = dict(self.index.definitions)
+            for group_name in changed:
+                try:
+                    definitions[group_name] = load_group(request, backend, group_name)
+                except GroupDoesNotExistError:
+                    definitions.pop(group_name, None)
+            self._set(definitions)
+        if changed or self.unsaved >= SAVE_AFTER_ITEMS:
+            self._save(request)
+
+
+def load_group(request, backend, group_name):
+    """
+    Load the group page group_name (or get its members from the cache).
+
+    @return: members, member_groups
+    """
+    page = Page(request, group_name)
+    if page.exists():
+        arena = 'pagegroups'
+        key = wikiutil.quoteWikinameFS(group_name)
+        cache = caching.CacheEntry(request, arena, key, scope='wiki', use_pickle=True)
+        try:
+            cache_mtime = cache.mtime()
+            page_mtime = wikiutil.version2timestamp(page.mtime_usecs())
+            # TODO: fix up-to-date check mtime granularity problems.
+            #
+            # cache_mtime is float while page_mtime is integer
+            # The comparision needs to be done on the lowest type of both
+            if int(cache_mtime) > int(page_mtime):
+                # cache is uptodate
+                return cache.content()
+            else:
+                raise caching.CacheError
+        except caching.CacheError:
+            # either cache does not exist, is erroneous or not uptodate: recreate it
+            members_retrieved = set(backend._retrieve_members(group_name))
+            member_groups = set(member for member in members_retrieved if backend.is_group_name(member))
+            members = members_retrieved - member_groups
+            cache.update((members, member_groups))
+            return members, member_groups
+    else:
+        raise GroupDoesNotExistError(group_name)
+
 
 class WikiGroup(GreedyGroup):
 
     def _load_group(self):
-        request = self.request
-        group_name = self.name
-
-        page = Page(request, group_name)
-        if page.exists():
-            arena = 'pagegroups'
-            key = wikiutil.quoteWikinameFS(group_name)
-            cache = caching.CacheEntry(request, arena, key, scope='wiki', use_pickle=True)
+        index = self._backend.membership_index()
+        if index is not None:
             try:
-                cache_mtime = cache.mtime()
-                page_mtime = wikiutil.version2timestamp(page.mtime_usecs())
-                # TODO: fix up-to-date check mtime granularity problems.
-                #
-                # cache_mtime is float while page_mtime is integer
-                # The comparision needs to be done on the lowest type of both
-                if int(cache_mtime) > int(page_mtime):
-                    # cache is uptodate
-                    return cache.content()
-                else:
-                    raise caching.CacheError
-            except caching.CacheError:
-                # either cache does not exist, is erroneous or not uptodate: recreate it
-                members, member_groups = super(WikiGroup, self)._load_group()
-                cache.update((members, member_groups))
-                return members, member_groups
-        else:
-            raise GroupDoesNotExistError(group_name)
+                return index.definitions[self.name]
+            except KeyError:
+                raise GroupDoesNotExistError(self.name)
+        return load_group(self.request, self._backend, self.name)
 
 
 class WikiGroups(BaseGroupsBackend):
 
     def __contains__(self, group_name):
+        index = self.membership_index()
+        if index is not None:
+            return group_name in index.definitions
         return self.is_group_name(group_name) and Page(self.request, group_name).exists()
 
+    def membership_index(self):
+        return self.request.cfg.cache.wiki_group_index.get(self.request)
+
     def __iter__(self):
         """
         To find group pages, request.cfg.cache.page_group_regexact pattern is used.
@@ -0,0 +1,116 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - tests for MoinMoin.events.outbox
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import shutil
+import smtplib
+import tempfile
+
+from MoinMoin.events import emailnotify, outbox
+
+
+class RecordingOutbox(outbox.Outbox):
+    """ delivers into a list, fails while self.fail is set """
+    fail = False
+
+    def __init__(self, request):
+        outbox.Outbox.__init__(self, request)
+        self.sent = []
+
+    def _deliver_mail(self, mailer, to, subject, text, mail_from):
+        if self.fail:
+            return False
+        self.sent.append((to, subject))
+        return True
+
+
+class FakeSMTP(object):
+    connections = 0
+
+    def __init__(self, host, port):
+        FakeSMTP.connections += 1
+        self.sent = []
+
+    def sendmail(self, mail_from, to, msg):
+        self.sent.append(to)
+
+    def quit(self):
+        pass
+
+
+class TestOutbox:
+
+    def setup_method(self, method):
+        self.saved = self.request.cfg.outbox_dir, self.request.cfg.notification_outbox
+        self.request.cfg.outbox_dir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.request.cfg.outbox_dir, True)
+        self.request.cfg.outbox_dir, self.request.cfg.notification_outbox = self.saved
+
+    def put(self, box, count):
+        for i in range(count):
+            box.put('mail', to=[u'user%d@example.org' % i], subject=u'subject %d' % i, text=u'text',
+                    mail_from=u'Wiki <wiki@example.org>')
+
+    def testDeliverInOrder(self):
+        """ outbox: notifications are delivered oldest first and removed """
+        box = RecordingOutbox(self.request)
+        self.put(box, 3)
+        assert len(box.names()) == 3
+        assert box.deliver(limit=2) == (2, 0)
+        assert box.deliver() == (1, 0)
+        assert [subject for to, subject in box.sent] == [u'subject 0', u'subject 1', u'subject 2']
+        assert box.names() == []
+
+    def testRetry(self):
+        """ outbox: failed deliveries are retried later, then given up """
+        box = RecordingOutbox(self.request)
+        self.put(box, 1)
+        box.fail = True
+        assert box.deliver() == (0, 1)
+        name = box.names()[0]
+        entry = box.load(name)
+        assert entry['attempts'] == 1 and entry['next_try'] > 0
+        assert box.deliver() == (0, 0) # not due yet
+        for i in range(outbox.MAX_ATTEMPTS - 1):
+            entry['next_try'] = 0
+            box._write(name, entry)
+            box.deliver()
+            entry = box.load(name)
+        assert box.names() == []
+        assert os.listdir(box.failed_dir) == [name]
+
+    def testEmailNotifyQueues(self):
+        """ outbox: the email notification handler only queues if configured """
+        request = self.request
+        request.cfg.notification_outbox = True
+        data = {'subject': u'subject', 'text': u'text'}
+        assert emailnotify.send_notification(request, u'wiki@example.org', [u'user@example.org'], data)[0]
+        box = outbox.Outbox(request)
+        entry = box.load(box.names()[0])
+        assert entry['kind'] == 'mail'
+        assert entry['data']['to'] == [u'user@example.org']
+
+    def testOneConnection(self):
+        """ outbox: all mails are sent using one smtp connection """
+        cfg = self.request.cfg
+        saved = cfg.mail_smarthost, cfg.mail_sendmail, cfg.mail_login, smtplib.SMTP
+        cfg.mail_smarthost, cfg.mail_sendmail, cfg.mail_login = 'localhost', None, None
+        smtplib.SMTP = FakeSMTP
+        FakeSMTP.connections = 0
+        try:
+            box = outbox.Outbox(self.request)
+            self.put(box, 3)
+            assert box.deliver() == (3, 0)
+            assert FakeSMTP.connections == 1
+        finally:
+            cfg.mail_smarthost, cfg.mail_sendmail, cfg.mail_login, smtplib.SMTP = saved
+
+
+coverage_modules = ['MoinMoin.events.outbox']
@@ -5,7 +5,8 @@
     This code sends email notifications about page changes.
     TODO: refactor it to handle separate events for page changes, creations, etc
 
-    @copyright: 2007 by Karol Nowak <grywacz@gmail.com>
+    @copyright: 2007 by Karol Nowak <grywacz@gmail.com>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -14,6 +15,7 @@ from MoinMoin.Page import Page
 from MoinMoin.mail import sendmail
 from MoinMoin.user import User, superusers
 from MoinMoin.action.AttachFile import getAttachUrl
+from MoinMoin.events.outbox import Outbox
 
 import MoinMoin.events as ev
 import MoinMoin.events.notification as notification
@@ -80,6 +82,10 @@ def send_notification(request, from_address, emails, data):
     @rtype int
 
     """
+    if request.cfg.notification_outbox and emails:
+        Outbox(request).put('mail', to=emails, subject=data['subject'], text=data['text'],
+                            mail_from=from_address)
+        return (1, request.getText("Mail queued"))
     return sendmail.sendmail(request, emails, data['subject'], data['text'], mail_from=from_address)
 
 
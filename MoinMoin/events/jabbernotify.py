@@ -4,7 +4,8 @@
 
     This code sends notifications using a separate daemon.
 
-    @copyright: 2007 by Karol Nowak <grywacz@gmail.com>
+    @copyright: 2007 by Karol Nowak <grywacz@gmail.com>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -16,6 +17,7 @@ logging = log.getLogger(__name__)
 from MoinMoin.Page import Page
 from MoinMoin.user import User, superusers
 from MoinMoin.action.AttachFile import getAttachUrl
+from MoinMoin.events.outbox import Outbox
 
 import MoinMoin.events.notification as notification
 import MoinMoin.events as ev
@@ -198,6 +200,10 @@ def send_notification(request, jids, notification):
     if type(notification['url_list']) != list:
         raise ValueError("url_list must be of type list!")
 
+    if request.cfg.notification_outbox:
+        Outbox(request).put('jabber', jids=list(jids), notification=notification)
+        return True
+
     try:
         server.send_notification(request.cfg.secrets['jabberbot'], jids, notification)
         return True
@@ -0,0 +1,152 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - outbox for notifications
+
+    If cfg.notification_outbox is True, the email and jabber notification
+    handlers do not deliver the notifications while the page is saved, but
+    only write them to the outbox (one file per notification in
+    cfg.outbox_dir). 'moin maint deliver' sends them later, using one SMTP
+    connection for all mails, and retries failed deliveries (with increasing
+    delays). Notifications that could not be delivered after MAX_ATTEMPTS
+    tries are moved to the 'failed' sub directory.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import time
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin.util import filesys, lock, pickle, random_string, PICKLE_PROTOCOL
+
+MAX_ATTEMPTS = 10
+RETRY_DELAY = 60 # seconds before the first retry, doubled for every further one
+MAX_RETRY_DELAY = 6 * 3600
+LOCK_TIMEOUT = 3600 # a delivering process might have died after that
+
+
+def _makedirs(path):
+    if not os.path.isdir(path):
+        try:
+            os.makedirs(path)
+        except OSError:
+            pass # created in the meantime
+
+
+class Outbox(object):
+    """ The notifications waiting for delivery """
+
+    def __init__(self, request):
+        self.request = request
+        self.dir = request.cfg.outbox_dir
+        self.failed_dir = os.path.join(self.dir, 'failed')
+
+    def _write(self, name, entry):
+        """ Write entry atomically (readers never see partial entries) """
+        _makedirs(self.dir)
+        tmp_name = os.path.join(self.dir, '.%s.tmp' % name)
+        f = open(tmp_name, 'wb')
+        try:
+            pickle.dump(entry, f, PICKLE_PROTOCOL)
+        finally:
+            f.close()
+        filesys.rename(tmp_name, os.path.join(self.dir, name))
+
+    def put(self, kind, **data):
+        """ Add a notification to the outbox
+
+        @param kind: 'mail' or 'jabber'
+        @param data: arguments for the delivery of kind
+        """
+        # names sort by creation time, so we deliver in order
+        name = '%017.6f-%d-%s' % (time.time(), os.getpid(), random_string(8, '0123456789abcdef'))
+        entry = {'kind': kind, 'data': data, 'attempts': 0, 'next_try': 0, }
+        self._write(name, entry)
+        logging.debug("notification %s queued" % name)
+
+    def names(self):
+        """ Return the names of the waiting notifications (oldest first) """
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return []
+        return sorted([name for name in names
+                       if not name.startswith('.') and os.path.isfile(os.path.join(self.dir, name))])
+
+    def load(self, name):
+        """ Return the notification name or None if it is gone """
+        try:
+            f = open(os.path.join(self.dir, name), 'rb')
+        except IOError:
+            return None # delivered in the meantime
+        try:
+            return pickle.load(f)
+        finally:
+            f.close()
+
+    def _failed(self, name, entry):
+        entry['attempts'] += 1
+        if entry['attempts'] >= MAX_ATTEMPTS:
+            logging.error("giving up delivering notification %s after %d attempts" % (name, entry['attempts']))
+            _makedirs(self.failed_dir)
+            filesys.rename(os.path.join(self.dir, name), os.path.join(self.failed_dir, name))
+        else:
+            delay = min(RETRY_DELAY * 2 ** (entry['attempts'] - 1), MAX_RETRY_DELAY)
+            entry['next_try'] = time.time() + delay
+            self._write(name, entry)
+
+    def deliver(self, limit=None):
+        """ Deliver the waiting notifications that are due
+
+        @param limit: maximum number of notifications to try (None: all)
+        @rtype: tuple
+        @return: (number of delivered, number of failed) notifications, or
+                 None if some other process is delivering
+        """
+        from MoinMoin.mail.sendmail import Mailer
+        _makedirs(self.dir)
+        deliver_lock = lock.ExclusiveLock(os.path.join(self.dir, '.deliver.lock'), LOCK_TIMEOUT)
+        if not deliver_lock.acquire(2.0):
+            return None
+        delivered = failed = 0
+        mailer = Mailer(self.request)
+        try:
+            now = time.time()
+            for name in self.names():
+                if limit is not None and delivered + failed >= limit:
+                    break
+                entry = self.load(name)
+                if entry is None or entry['next_try'] > now:
+                    continue
+                try:
+                    ok = getattr(self, '_deliver_%s' % entry['kind'])(mailer, **entry['data'])
+                except Exception:
+                    logging.exception("delivering notification %s failed" % name)
+                    ok = False
+                if ok:
+                    os.remove(os.path.join(self.dir, name))
+                    delivered += 1
+                else:
+                    self._failed(name, entry)
+                    failed += 1
+        finally:
+            mailer.close()
+            deliver_lock.release()
+        return delivered, failed
+
+    def _deliver_mail(self, mailer, to, subject, text, mail_from):
+        is_ok, msg = mailer.send(to, subject, text, mail_from)
+        if not is_ok:
+            logging.warning("sending mail failed: %s" % msg)
+        return is_ok
+
+    def _deliver_jabber(self, mailer, jids, notification):
+        cfg = self.request.cfg
+        if not cfg.jabber_enabled:
+            logging.warning("can't deliver jabber notification, notification_bot_uri is not set")
+            return False
+        cfg.notification_server.send_notification(cfg.secrets['jabberbot'], jids, notification)
+        return True
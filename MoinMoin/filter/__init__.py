@@ -2,17 +2,25 @@
 """
     MoinMoin - Filter Package
 
-    @copyright: 2006-2009 MoinMoin:ThomasWaldmann
+    The text the filters extract from attachments is cached (see TextCache)
+    and the number of concurrent runs of a filter is limited (see
+    filter_file).
+
+    @copyright: 2006-2009 MoinMoin:ThomasWaldmann,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
 import sys, os
 import time
+import errno
+import hashlib
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
 
-from MoinMoin.util import pysupport
+from MoinMoin import caching
+from MoinMoin.util import pysupport, lock
 
 modules = pysupport.getPackageModules(__file__)
 
@@ -20,6 +28,10 @@ standard_codings = ['utf-8', 'iso-8859-15', 'iso-8859-1', ]
 
 from MoinMoin.util.SubProcess import exec_cmd
 
+# a run slot left behind by a crashed process expires after this time [s],
+# it must be longer than the timeout of the commands run by execfilter
+SLOT_TIMEOUT = 330.0
+
 
 def quote_filename(filename):
     """ quote a filename (could contain blanks or other special chars) in a
@@ -50,3 +62,124 @@ def execfilter(cmd, filename, codings=standard_codings):
             pass
     return data.decode('ascii', 'replace')
 
+
+class TextCache(object):
+    """ Cache of the text extracted by the filters
+
+    The entries are keyed by the SHA1 of the file content and the filter
+    name, so neither rebuilding an index nor the same file attached to
+    several pages runs the filter again. Every entry is a utf-8 file in the
+    cache arena 'filtertext', its mtime is its last use. If the entries get
+    bigger than cfg.filter_cache_size, the least recently used ones are
+    removed.
+    """
+    arena = 'filtertext'
+
+    def __init__(self, request):
+        self.request = request
+        self.max_size = request.cfg.filter_cache_size
+
+    def key(self, modulename, filename):
+        """ Return the cache key for the text modulename extracts from filename """
+        sha = hashlib.sha1()
+        f = file(filename, 'rb')
+        try:
+            while True:
+                data = f.read(65536)
+                if not data:
+                    break
+                sha.update(data)
+        finally:
+            f.close()
+        return '%s.%s' % (sha.hexdigest(), modulename)
+
+    def _entry(self, key):
+        return caching.CacheEntry(self.request, self.arena, key, scope='wiki', do_locking=False)
+
+    def get(self, key):
+        """ Return the cached text (unicode) or None """
+        entry = self._entry(key)
+        try:
+            text = entry.content().decode('utf-8')
+        except caching.CacheError:
+            return None
+        entry.touch() # remember the use for eviction
+        return text
+
+    def put(self, key, text):
+        """ Cache text (unicode) for key, evict old entries if needed """
+        data = text.encode('utf-8')
+        if len(data) > self.max_size:
+            return
+        try:
+            self._entry(key).update(data)
+        except caching.CacheError, err:
+            logging.warning("filter cache: could not store %s (%s)" % (key, err))
+            return
+        cfg_cache = self.request.cfg.cache
+        size = getattr(cfg_cache, 'filter_text_size', None)
+        added = getattr(cfg_cache, 'filter_text_added', 0) + len(data)
+        if size is None or size + len(data) > self.max_size or added > self.max_size // 10:
+            # other processes add entries too, so count what is really there
+            size = caching.get_arena_entries(self.request, self.arena, 'wiki')[0]
+            added = 0
+        else:
+            size += len(data)
+        if size > self.max_size:
+            size = caching.evict_arena(self.request, self.arena, 'wiki', self.max_size)
+        cfg_cache.filter_text_size = size
+        cfg_cache.filter_text_added = added
+
+
+def acquire_slot(request, modulename):
+    """ Wait for a free run slot of the filter modulename and acquire it
+
+    The slots are lock directories in the cache arena of the TextCache, so
+    they are shared by all processes of a wiki. Their number is
+    cfg.filter_max_concurrency[modulename] (or ['default']).
+
+    @return: the acquired lock (release it when the filter is done) or None,
+             if the runs of modulename are not limited
+    """
+    limits = request.cfg.filter_max_concurrency
+    count = limits.get(modulename, limits.get('default'))
+    if not count:
+        return None
+    slot_dir = os.path.join(caching.get_arena_dir(request, TextCache.arena, 'wiki'), '__slots__')
+    try:
+        os.makedirs(slot_dir)
+    except OSError, err:
+        if err.errno != errno.EEXIST:
+            raise
+    slots = [lock.ExclusiveLock(os.path.join(slot_dir, '%s.%d' % (modulename, i)), SLOT_TIMEOUT)
+             for i in range(count)]
+    while True:
+        for slot in slots:
+            if slot.acquire(0.1):
+                return slot
+
+
+def filter_file(indexobj, modulename, execute, filename):
+    """ Return the text execute (the filter modulename) extracts from filename
+
+    Uses the TextCache, unless cfg.filter_cache_size is 0. The filter runs
+    only when it gets a run slot (see acquire_slot), so a reindex does not
+    start hundreds of converter processes.
+    """
+    request = indexobj.request
+    cache = None
+    if request.cfg.filter_cache_size:
+        cache = TextCache(request)
+        key = cache.key(modulename, filename)
+        text = cache.get(key)
+        if text is not None:
+            return text
+    slot = acquire_slot(request, modulename)
+    try:
+        text = execute(indexobj, filename)
+    finally:
+        if slot is not None:
+            slot.release()
+    if cache is not None and text: # empty text might be a missing converter, try again next time
+        cache.put(key, text)
+    return text
@@ -6,6 +6,10 @@
     @license: GNU GPL, see COPYING for details.
 """
 
+import os
+import time
+import threading
+
 import py
 from MoinMoin import filter
 
@@ -56,6 +60,107 @@ class TestFilters:
             fname = self.make_file(data)
             assert _filter(None, fname) == expected
 
+
+class FakeIndex(object):
+    def __init__(self, request):
+        self.request = request
+
+
+class TestTextCache:
+
+    def setup_method(self, method):
+        self.saved_size = self.request.cfg.filter_cache_size
+        self.cleanup()
+        self.calls = []
+
+    def teardown_method(self, method):
+        self.request.cfg.filter_cache_size = self.saved_size
+        self.cleanup()
+
+    def cleanup(self):
+        from MoinMoin import caching
+        for key in caching.get_cache_list(self.request, filter.TextCache.arena, 'wiki'):
+            caching.CacheEntry(self.request, filter.TextCache.arena, key, scope='wiki').remove()
+        self.request.cfg.cache.filter_text_size = None
+
+    def execute(self, indexobj, filename):
+        self.calls.append(filename)
+        return file(filename, 'rb').read().decode('utf-8').upper()
+
+    make_file = TestFilters.make_file.im_func
+
+    def testCached(self):
+        index = FakeIndex(self.request)
+        fname1 = self.make_file('some text')
+        fname2 = self.make_file('some text') # same content, e.g. attached to another page
+        assert filter.filter_file(index, 'text', self.execute, fname1) == u'SOME TEXT'
+        assert filter.filter_file(index, 'text', self.execute, fname2) == u'SOME TEXT'
+        assert self.calls == [fname1]
+        filter.filter_file(index, 'text_html', self.execute, fname2) # other filter
+        assert self.calls == [fname1, fname2]
+
+    def testEmptyNotCached(self):
+        index = FakeIndex(self.request)
+        fname = self.make_file('')
+        filter.filter_file(index, 'text', self.execute, fname)
+        filter.filter_file(index, 'text', self.execute, fname)
+        assert len(self.calls) == 2
+
+    def testEviction(self):
+        self.request.cfg.filter_cache_size = 110
+        cache = filter.TextCache(self.request)
+        cache.put('first', u'x' * 40)
+        cache.put('second', u'x' * 40)
+        cache.get('first') # make it more recently used than second
+        os.utime(cache._entry('second')._filename(), (time.time() - 10, time.time() - 10))
+        cache.put('third', u'x' * 40)
+        assert cache.get('first') == u'x' * 40
+        assert cache.get('second') is None
+        assert cache.get('third') == u'x' * 40
+
+
+class TestRunSlots:
+
+    def setup_method(self, method):
+        self.saved_limits = self.request.cfg.filter_max_concurrency
+        self.saved_size = self.request.cfg.filter_cache_size
+        self.request.cfg.filter_cache_size = 0 # always run the filter
+        self.running = 0
+        self.overlaps = 0
+
+    def teardown_method(self, method):
+        self.request.cfg.filter_max_concurrency = self.saved_limits
+        self.request.cfg.filter_cache_size = self.saved_size
+
+    def execute(self, indexobj, filename):
+        self.running += 1
+        if self.running > 1:
+            self.overlaps += 1
+        time.sleep(0.3)
+        self.running -= 1
+        return u'text'
+
+    def run_twice(self):
+        index = FakeIndex(self.request)
+        fname = TestFilters.make_file.im_func(self, 'some text')
+        threads = [threading.Thread(target=filter.filter_file, args=(index, 'text', self.execute, fname))
+                   for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def testSerialized(self):
+        self.request.cfg.filter_max_concurrency = {'default': 2, 'text': 1}
+        self.run_twice()
+        assert self.overlaps == 0
+
+    def testUnlimited(self):
+        self.request.cfg.filter_max_concurrency = {'default': 0}
+        self.run_twice()
+        assert self.overlaps == 1
+
+
 coverage_modules = ['MoinMoin.filter.text',
                     'MoinMoin.filter.text_html',
                     'MoinMoin.filter.text_xml',
@@ -4,7 +4,8 @@
 
     See "base.py" for the formatter interface.
 
-    @copyright: 2000-2004 by Juergen Hermann <jh@web.de>
+    @copyright: 2000-2004 by Juergen Hermann <jh@web.de>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 import re
@@ -13,7 +14,7 @@ from MoinMoin import log
 logging = log.getLogger(__name__)
 
 from MoinMoin.util import pysupport
-from MoinMoin import wikiutil
+from MoinMoin import fragmentcache, wikiutil
 
 modules = pysupport.getPackageModules(__file__)
 
@@ -334,6 +335,13 @@ class FormatterBase:
         """
         # attention: this is copied into text_python!
         parser = wikiutil.searchAndImportPlugin(self.request.cfg, "parser", parser_name)
+        if fragmentcache._current(self.request) is not None:
+            try:
+                Dependencies = wikiutil.searchAndImportPlugin(self.request.cfg, "parser", parser_name, "Dependencies")
+            except (wikiutil.PluginMissingError, wikiutil.PluginAttributeError):
+                Dependencies = ["time"]
+            if Dependencies:
+                fragmentcache.record_dynamic(self.request)
         args = None
         if lines:
             args = self._get_bang_args(lines[0])
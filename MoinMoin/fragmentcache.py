@@ -0,0 +1,227 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - cache for the output of page including macros
+
+    Include and TableOfContents are dynamic macros (they are not compiled
+    into the page cache), so every view of a page using them loads and
+    renders the pages they include. This module caches their html output
+    (cache arena 'fragments').
+
+    The key of a fragment contains everything the output depends on besides
+    other pages: macro name and arguments, the including page, the user
+    (names and rights, language, theme and the preferences the html formatter
+    uses) and the state of the request's unique id generator. While
+    rendering a fragment, the macro records the pages it reads (and their
+    revisions) and the page name patterns it matches. A cached fragment is
+    used as long as:
+
+     * all recorded pages still have the recorded revision
+     * the edit-log does not show a change of a recorded page, a page
+       matching a recorded pattern or a group page, nor a new, renamed or
+       deleted page or a changed attachment (those change how links are
+       rendered)
+
+    If some dynamic macro or parser (one with Dependencies) runs while
+    rendering a fragment, the fragment is not cached.
+
+    The mtime of a fragment is its last use. If the fragments get bigger
+    than cfg.fragment_cache_size, the least recently used ones are removed.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import copy
+import hashlib
+import re
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching
+from MoinMoin.Page import Page
+
+# edit-log actions changing how links to a page are rendered
+STRUCTURAL_ACTIONS = ('SAVENEW', 'SAVE/RENAME', 'ATTNEW', 'ATTDEL', 'ATTDRW', )
+
+
+class Fragment(object):
+    """ The dependencies of a fragment being rendered """
+
+    def __init__(self):
+        self.pages = {} # pagename -> (rev, exists)
+        self.patterns = set()
+        self.cacheable = True
+
+    def merge(self, other):
+        self.pages.update(other.pages)
+        self.patterns.update(other.patterns)
+        self.cacheable = self.cacheable and other.cacheable
+
+
+def _current(request):
+    """ Return the fragment currently rendered or None """
+    fragments = getattr(request, '_fragments', None)
+    if fragments:
+        return fragments[-1]
+    return None
+
+
+def record_page(request, pagename):
+    """ Record that the current fragment depends on page pagename """
+    fragment = _current(request)
+    if fragment is not None and pagename not in fragment.pages:
+        pagefile, rev, exists = Page(request, pagename).get_rev()
+        fragment.pages[pagename] = rev, bool(exists)
+
+
+def record_pattern(request, pattern):
+    """ Record that the current fragment depends on the pages matching pattern (regex) """
+    fragment = _current(request)
+    if fragment is not None:
+        fragment.patterns.add(pattern)
+
+
+def record_dynamic(request):
+    """ Record that the current fragment depends on something we can't track """
+    fragment = _current(request)
+    if fragment is not None:
+        fragment.cacheable = False
+
+
+def _uid_state(request):
+    uid = request.uid_generator
+    return uid.include_id, uid.page_ids
+
+
+def _fragment_key(macro, name, args):
+    request = macro.request
+    user = request.user
+    trusted = user.auth_method in request.cfg.auth_methods_trusted
+    this_page = macro.formatter.page
+    key = (
+        name, args,
+        this_page.page_name, sorted(getattr(this_page, '_macroInclude_pagelist', {}).items()),
+        user.name, user.valid, trusted,
+        user.show_nonexist_qm, user.show_comments, user.show_topbottom,
+        request.current_lang, getattr(getattr(request, 'theme', None), 'name', None), request.action,
+        getattr(request, '_Include_backto', None), macro.formatter._base_depth,
+        _uid_state(request), request.uid_generator.include_stack[-1:],
+        getattr(request.cfg, 'cfg_mtime', None),
+    )
+    return hashlib.sha1(repr(key)).hexdigest()
+
+
+def _valid(request, content):
+    """ Are the dependencies of a cached fragment unchanged? """
+    from MoinMoin.logfile import editlog
+    pages, patterns, log_pos = content['pages'], content['patterns'], content['log_pos']
+    for pagename, (rev, exists) in pages.items():
+        pagefile, current_rev, current_exists = Page(request, pagename).get_rev()
+        if (current_rev, bool(current_exists)) != (rev, exists):
+            return False
+    elog = editlog.EditLog(request)
+    size = elog.size()
+    if log_pos > size:
+        return False # edit-log was truncated
+    if log_pos == size:
+        return True
+    patterns = [re.compile(pattern) for pattern in patterns]
+    group_regex = request.cfg.cache.page_group_regexact
+    elog.seek(log_pos)
+    for line in elog:
+        pagename = line.pagename
+        if (pagename in pages or line.action in STRUCTURAL_ACTIONS or
+            group_regex.search(pagename) or
+            [pattern for pattern in patterns if pattern.match(pagename)] or
+            not Page(request, pagename).exists()): # deleted
+            return False
+    content['log_pos'] = elog.position()
+    return True
+
+
+def cached_output(macro, name, args, render):
+    """ Return the output of render(), from the cache if possible
+
+    @param macro: the macro object
+    @param name: macro name
+    @param args: everything besides the pages the output depends on (repr-able)
+    @param render: function returning the output (unicode)
+    """
+    from MoinMoin.formatter.text_html import Formatter
+    request = macro.request
+    if (macro.formatter.__class__ is not Formatter or
+        not request.cfg.fragment_cache or request.rev):
+        # we only cache html of current revisions. dependencies still get
+        # recorded for fragments using this output (e.g. TableOfContents).
+        return render()
+
+    key = _fragment_key(macro, name, args)
+    cache = caching.CacheEntry(request, 'fragments', key, scope='wiki', use_pickle=True)
+    try:
+        content = cache.content()
+        log_pos = content['log_pos']
+        if _valid(request, content):
+            fragment = Fragment()
+            fragment.pages = content['pages']
+            fragment.patterns = set(content['patterns'])
+            parent = _current(request)
+            if parent is not None:
+                parent.merge(fragment)
+            uid = request.uid_generator
+            uid.include_id, uid.page_ids = copy.deepcopy(content['uid_state'])
+            if content['log_pos'] != log_pos:
+                # remember that we checked the edit-log up to here
+                cache.update(content)
+            else:
+                cache.touch() # remember the use for eviction
+            return content['output']
+    except caching.CacheError:
+        pass
+    except (KeyError, TypeError, ValueError):
+        logging.warning("ignoring broken fragment cache entry %s" % key)
+
+    from MoinMoin.logfile import editlog
+    log_pos = editlog.EditLog(request).size()
+    if not hasattr(request, '_fragments'):
+        request._fragments = []
+    request._fragments.append(Fragment())
+    try:
+        output = render()
+    finally:
+        fragment = request._fragments.pop()
+    parent = _current(request)
+    if parent is not None:
+        parent.merge(fragment)
+    if fragment.cacheable:
+        try:
+            cache.update({
+                'output': output,
+                'uid_state': copy.deepcopy(_uid_state(request)),
+                'pages': fragment.pages,
+                'patterns': sorted(fragment.patterns),
+                'log_pos': log_pos,
+            })
+        except caching.CacheError, err:
+            logging.warning("can't store fragment %s: %s" % (key, str(err)))
+        else:
+            _limit_size(request, cache.size())
+    return output
+
+
+def _limit_size(request, added):
+    """ Account for added bytes in the fragments arena, evict the least
+        recently used fragments if it got bigger than cfg.fragment_cache_size
+    """
+    max_size = request.cfg.fragment_cache_size
+    if not max_size:
+        return
+    cfg_cache = request.cfg.cache
+    size = getattr(cfg_cache, 'fragments_size', None)
+    if size is None:
+        size = caching.get_arena_entries(request, 'fragments', 'wiki')[0]
+    else:
+        size += added
+    if size > max_size:
+        size = caching.evict_arena(request, 'fragments', 'wiki', max_size)
+    cfg_cache.fragments_size = size
@@ -33,6 +33,7 @@ logging = log.getLogger(__name__)
 
 from MoinMoin import caching
 from MoinMoin.i18n import strings
+from MoinMoin.i18n.catalog import Catalog, load_catalog, catalog_data, po_catalog_data
 
 # This is a global for a reason: in persistent environments all languages in
 # use will be cached; Note: you have to restart if you update language data.
@@ -48,6 +49,10 @@ system_pages = {}
 
 translations = {}
 
+# formatMarkup results are written to the preformatted catalogs at the end
+# of the request, or as soon as there are that many new ones:
+PREFORMATTED_BATCH = 100
+
 def po_filename(request, language, domain, i18n_dir='i18n'):
     """ we use MoinMoin/i18n/<language>[.<domain>].mo as filename for the PO file.
 
@@ -221,37 +226,142 @@ class Translation(object):
         return text
 
     def loadLanguage(self, request, trans_dir="i18n"):
+        """ Load the translations (a Catalog) from the compiled catalog in the
+            cache, (re)compile it from the .po file if needed.
+        """
         request.clock.start('loadLanguage')
         # see comment about per-wiki scope above
-        cache = caching.CacheEntry(request, arena='i18n', key=self.language, scope='wiki', use_pickle=True)
+        cache = caching.CacheEntry(request, arena='i18n', key=self._cache_key(), scope='wiki')
         langfilename = po_filename(request, self.language, self.domain, i18n_dir=trans_dir)
-        needsupdate = cache.needsUpdate(langfilename)
-        if not needsupdate:
+        raw = None
+        if not cache.needsUpdate(langfilename):
             try:
-                unformatted = cache.content()
-                logging.debug("pickle %s load success" % self.language)
-            except caching.CacheError:
-                logging.debug("pickle %s load failed" % self.language)
-                needsupdate = 1
+                raw = self._load_catalog(cache)
+                logging.debug("catalog %s load success" % self.language)
+            except (caching.CacheError, EnvironmentError, ValueError), err:
+                logging.debug("catalog %s load failed (%s)" % (self.language, err))
 
-        if needsupdate:
+        if raw is None:
             logging.debug("langfilename %s needs update" % langfilename)
             f = file(langfilename)
-            self.load_po(f)
+            data = po_catalog_data(f)
             f.close()
-            trans = self.translation
-            unformatted = trans._catalog
-            self.has_wikimarkup = self.info.get('x-haswikimarkup', 'False') == 'True'
-            logging.debug("dumping lang %s" % self.language)
             try:
-                cache.update(unformatted)
-            except caching.CacheError:
-                pass
+                cache.update(data)
+                raw = self._load_catalog(cache)
+            except (caching.CacheError, EnvironmentError, ValueError), err:
+                logging.warning("could not store catalog %s (%s)" % (self.language, err))
+                raw = Catalog(data)
 
         self.formatted = {}
-        self.raw = unformatted
+        self.preformatted = {}
+        self.pending = {}
+        self.langfilename = langfilename
+        self.raw = raw
         request.clock.stop('loadLanguage')
 
+    def _load_catalog(self, cache):
+        try:
+            cache.open(mode='r')
+            return load_catalog(cache)
+        finally:
+            cache.close()
+
+    def _cache_key(self, percent=None):
+        if percent is None:
+            return '%s.%s.mo' % (self.language, self.domain)
+        return '%s.%s.formatted%d.mo' % (self.language, self.domain, int(bool(percent)))
+
+    def _formatted_cache(self, request, percent):
+        return caching.CacheEntry(request, arena='i18n', key=self._cache_key(percent), scope='wiki',
+                                  do_locking=False)
+
+    def _editlogMtime(self, request):
+        try:
+            return os.path.getmtime(request.rootpage.getPagePath('edit-log', isfile=1))
+        except OSError:
+            return 0
+
+    def _preformattedOutdated(self, request, cache):
+        """ formatMarkup results depend on the translations, the wiki config
+            and on which pages exist (links to non-existing pages look
+            different), so they expire whenever the wiki is changed.
+        """
+        if cache.needsUpdate(self.langfilename):
+            return True
+        cfg_mtime = request.cfg.cfg_mtime
+        mtime = cache.mtime()
+        return (cfg_mtime is not None and mtime < cfg_mtime) or mtime < self._editlogMtime(request)
+
+    def getPreformatted(self, request, original, percent):
+        """ Return the formatMarkup result for original stored by any process
+            (or None). They are stored per wiki (siteid) and percent value.
+        """
+        key = (request.cfg.siteid, percent)
+        catalog = self.preformatted.get(key)
+        if catalog is None:
+            cache = self._formatted_cache(request, percent)
+            catalog = {}
+            if not self._preformattedOutdated(request, cache):
+                try:
+                    catalog = self._load_catalog(cache)
+                except (caching.CacheError, EnvironmentError, ValueError):
+                    pass
+            self.preformatted[key] = catalog
+        return catalog.get(original)
+
+    def storePreformatted(self, request, original, percent, text):
+        """ Remember a formatMarkup result for writing it to the stored ones
+            (see flushPreformatted), so other (and new) processes do not need
+            to format it again.
+        """
+        key = (request.cfg.siteid, percent)
+        editlog_mtime, messages = self.pending.setdefault(key, (self._editlogMtime(request), {}))
+        messages[original] = text
+        if len(messages) >= PREFORMATTED_BATCH:
+            self.flushPreformatted(request)
+
+    def flushPreformatted(self, request):
+        """ Add the new formatMarkup results of the current wiki to the stored
+            ones. Results formatted before the last change of the wiki are
+            dropped.
+        """
+        for percent in (False, True):
+            pending = self.pending.pop((request.cfg.siteid, percent), None)
+            if pending is None:
+                continue
+            editlog_mtime, new_messages = pending
+            if editlog_mtime != self._editlogMtime(request):
+                continue
+            cache = self._formatted_cache(request, percent)
+            try:
+                cache.lock('w')
+            except caching.CacheError:
+                continue
+            try:
+                messages = {}
+                if not self._preformattedOutdated(request, cache):
+                    try:
+                        messages = dict(self._load_catalog(cache).iteritems())
+                    except (caching.CacheError, EnvironmentError, ValueError):
+                        pass
+                messages.update(new_messages)
+                try:
+                    cache.update(catalog_data(messages))
+                except caching.CacheError:
+                    pass
+            finally:
+                cache.unlock()
+
+
+def flush_preformatted(request):
+    """ Store the formatMarkup results of this request (see
+        Translation.storePreformatted), called at the end of the request.
+    """
+    for translation in translations.values():
+        if translation.pending:
+            translation.flushPreformatted(request)
+
 
 def getDirection(lang):
     """ Return the text direction for a language, either 'ltr' or 'rtl'. """
@@ -300,9 +410,14 @@ def getText(original, request, lang, **kw):
                     logging.error("formatting a %r text that is already being formatted: %r" % (lang, original))
                     translated = original + u'*' # get some error indication to the UI
             else:
-                translation.formatted[key] = None # we use this as "formatting in progress" indicator
-                translated = translation.formatMarkup(request, translated, percent)
-                translation.formatted[key] = translated # remember it
+                preformatted = translation.getPreformatted(request, original, percent)
+                if preformatted is not None:
+                    translated = preformatted
+                else:
+                    translation.formatted[key] = None # we use this as "formatting in progress" indicator
+                    translated = translation.formatMarkup(request, translated, percent)
+                    translation.formatted[key] = translated # remember it
+                    translation.storePreformatted(request, original, percent, translated)
     else:
         try:
             if languages is None:
@@ -0,0 +1,113 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.i18n.catalog Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import tempfile
+
+import py
+
+from MoinMoin import i18n
+from MoinMoin.i18n import catalog
+
+MESSAGES = {
+    u'Edit': u'Editieren',
+    u'Login': u'Anmelden',
+    u'Clear message': u'Nachricht l\xf6schen',
+    u'\xc4rger': u'Trouble',
+}
+
+
+class TestCatalog:
+
+    def testLookup(self):
+        c = catalog.Catalog(catalog.catalog_data(MESSAGES))
+        assert len(c) == len(MESSAGES)
+        for original, translated in MESSAGES.items():
+            assert original in c
+            assert c[original] == translated
+        assert u'Logout' not in c
+        assert c.get(u'Logout') is None
+        py.test.raises(KeyError, c.__getitem__, u'Logout')
+        assert dict(c.items()) == MESSAGES
+
+    def testEmpty(self):
+        c = catalog.Catalog(catalog.catalog_data({}))
+        assert len(c) == 0
+        assert u'Edit' not in c
+
+    def testBadData(self):
+        py.test.raises(ValueError, catalog.Catalog, 'no catalog at all, really')
+
+    def testLoad(self):
+        fd, fname = tempfile.mkstemp()
+        os.write(fd, catalog.catalog_data(MESSAGES))
+        os.close(fd)
+        try:
+            f = open(fname, 'rb')
+            c = catalog.load_catalog(f)
+            f.close()
+            assert c[u'Clear message'] == u'Nachricht l\xf6schen'
+        finally:
+            os.remove(fname)
+
+
+class TestTranslation:
+
+    def testLoadLanguage(self):
+        t = i18n.Translation('de')
+        t.loadLanguage(self.request)
+        assert isinstance(t.raw, catalog.Catalog)
+        assert t.raw[u'Edit'] == u'Editieren'
+        # second time it is loaded from the cache
+        t2 = i18n.Translation('de')
+        t2.loadLanguage(self.request)
+        assert t2.raw[u'Edit'] == u'Editieren'
+
+    def testPreformatted(self):
+        t = i18n.Translation('de')
+        t.loadLanguage(self.request)
+        t._formatted_cache(self.request, True).remove()
+        assert t.getPreformatted(self.request, u'Edit', True) is None
+        t.storePreformatted(self.request, u'Edit', True, u'<b>Editieren</b>')
+        assert not t._formatted_cache(self.request, True).exists() # written at the end of the request
+        t.flushPreformatted(self.request)
+        # a new process finds it
+        t2 = i18n.Translation('de')
+        t2.loadLanguage(self.request)
+        assert t2.getPreformatted(self.request, u'Edit', True) == u'<b>Editieren</b>'
+        assert t2.getPreformatted(self.request, u'Edit', False) is None
+        t._formatted_cache(self.request, True).remove()
+
+    def testPreformattedExpire(self):
+        """ i18n: preformatted texts expire when the wiki is changed """
+        t = i18n.Translation('de')
+        t.loadLanguage(self.request)
+        cache = t._formatted_cache(self.request, True)
+        cache.remove()
+        t.storePreformatted(self.request, u'Edit', True, u'<b>Editieren</b>')
+        t.flushPreformatted(self.request)
+        assert not t._preformattedOutdated(self.request, cache)
+        editlog = self.request.rootpage.getPagePath('edit-log', isfile=1)
+        mtime = os.path.getmtime(editlog)
+        try:
+            os.utime(editlog, (mtime, cache.mtime() + 10))
+            assert t._preformattedOutdated(self.request, cache)
+            # results formatted before a change are not stored
+            t.storePreformatted(self.request, u'Login', True, u'<b>Anmelden</b>')
+            os.utime(editlog, (mtime, cache.mtime() + 20))
+            t.flushPreformatted(self.request)
+            t2 = i18n.Translation('de')
+            t2.loadLanguage(self.request)
+            assert t2.getPreformatted(self.request, u'Edit', True) is None
+            assert t2.getPreformatted(self.request, u'Login', True) is None
+        finally:
+            os.utime(editlog, (mtime, mtime))
+            cache.remove()
+
+
+coverage_modules = ['MoinMoin.i18n.catalog']
@@ -0,0 +1,117 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - compiled translation catalogs
+
+    A Catalog is a read-only mapping (unicode -> unicode) on the data of a
+    .mo file (as generated by MoinMoin.i18n.msgfmt: the original strings are
+    sorted, so we can do a binary search for them). Usually the data is a
+    memory mapped cache file, so nothing needs to be unpickled or decoded
+    when a process starts using a language and all processes share the
+    memory pages of the catalog.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import mmap
+import struct
+
+from MoinMoin.i18n.msgfmt import MsgFmt
+
+MAGIC = 0x950412deL
+HEADER = struct.Struct("Iiiii") # magic, version, count, start of key index, start of value index
+ENTRY = struct.Struct("ii") # length, offset
+
+
+class Catalog(object):
+    """ Read-only mapping of the utf-8 .mo data of a translation """
+
+    def __init__(self, data):
+        """
+        @param data: .mo data (str or mmap)
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("catalog too short")
+        magic, version, count, keys_start, values_start = HEADER.unpack(data[:HEADER.size])
+        if magic != MAGIC:
+            raise ValueError("bad catalog magic %x" % magic)
+        self.data = data
+        self.count = count
+        self.keys_start = keys_start
+        self.values_start = values_start
+
+    def _string(self, index_start, i):
+        pos = index_start + i * ENTRY.size
+        length, offset = ENTRY.unpack(self.data[pos:pos + ENTRY.size])
+        return self.data[offset:offset + length]
+
+    def _find(self, original):
+        """ Return the index of original (unicode) or -1 """
+        key = original.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = self._string(self.keys_start, mid)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, original):
+        return self._find(original) >= 0
+
+    def __getitem__(self, original):
+        i = self._find(original)
+        if i < 0:
+            raise KeyError(original)
+        return self._string(self.values_start, i).decode('utf-8')
+
+    def get(self, original, default=None):
+        i = self._find(original)
+        if i < 0:
+            return default
+        return self._string(self.values_start, i).decode('utf-8')
+
+    def iteritems(self):
+        for i in xrange(self.count):
+            yield (self._string(self.keys_start, i).decode('utf-8'),
+                   self._string(self.values_start, i).decode('utf-8'))
+
+    def items(self):
+        return list(self.iteritems())
+
+    def keys(self):
+        return [original for original, translated in self.iteritems()]
+
+
+def load_catalog(f):
+    """ Return a Catalog on the memory mapped file f
+
+    Replace the file by renaming a new one over it, do not write into it.
+
+    @param f: opened file (or opened CacheEntry), the mapping stays valid
+              after closing it
+    """
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Catalog(data)
+
+
+def catalog_data(messages):
+    """ Return .mo data for messages (dict unicode -> unicode) """
+    mf = MsgFmt()
+    for original, translated in messages.items():
+        mf.messages[original.encode('utf-8')] = translated.encode('utf-8')
+    return mf.generate_mo()
+
+
+def po_catalog_data(f):
+    """ Return .mo data for the (utf-8) .po file f """
+    mf = MsgFmt()
+    mf.read_po(f.readlines())
+    return mf.generate_mo()
@@ -0,0 +1,356 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - page link index
+
+    Keeps a persistent index of the links between the pages of a wiki, so
+    that macros like WantedPages or OrphanedPages and "linkto:" searches
+    do not need to get the links of all pages each time.
+
+    The index contains:
+     * forward: page name -> set of page names it links to (for all
+       existing pages)
+     * reverse: page name -> set of page names linking to it
+     * wanted: page names that are linked to, but do not exist
+     * orphaned: existing page names that no page links to
+
+    The links of a page are taken from Page.getPageLinks (and thus from
+    its pagelinks cache). The index is built by "moin maint makecache" and
+    stored in the cache arena 'linkindex':
+
+     * 'links' is the index as it was built (or last compacted)
+     * 'delta' gets a line with the new links of a page appended whenever
+       PageEditor saves, renames or deletes it, so a save does not need
+       to rewrite the whole index. If the delta gets bigger than
+       MAX_DELTA_SIZE, the saving process folds it into 'links'.
+
+    Every process keeps the index in memory and applies the delta lines it
+    did not see yet. Pages changed without PageEditor are picked up from
+    the edit-log. Without an index, the links of all pages are collected
+    whenever the index is used (and a warning is logged).
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import bisect
+import os
+import threading
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching, wikiutil
+from MoinMoin.Page import Page
+from MoinMoin.logfile import editlog
+
+MAX_DELTA_SIZE = 1024 * 1024 # bytes of delta lines before they get folded into the index
+
+_lock = threading.RLock() # guards the index data kept in memory (cfg.cache.linkindex)
+
+
+def _delta_line(log_pos, pagename, links):
+    """ Return the delta line recording the links of page pagename
+
+    @param log_pos: edit-log size after the change of the page
+    @param links: list of the page names the page links to, None if
+                  the page does not exist
+    """
+    fields = [str(log_pos), links is None and '0' or '1', wikiutil.quoteWikinameFS(pagename)]
+    fields.extend([wikiutil.quoteWikinameFS(link) for link in links or []])
+    return '\t'.join(fields) + '\n'
+
+
+def _page_links(request, pagename):
+    """ Return the links of page pagename, None if it does not exist """
+    page = Page(request, pagename)
+    if not page.exists():
+        return None
+    return page.getPageLinks(request)
+
+
+def _parse_delta_line(line):
+    """ Return log_pos, pagename and links of a delta line """
+    fields = line.split('\t')
+    links = None
+    if fields[1] == '1':
+        links = [wikiutil.unquoteWikiname(link) for link in fields[3:]]
+    return int(fields[0]), wikiutil.unquoteWikiname(fields[2]), links
+
+
+class LinkIndex(object):
+    """ Forward and reverse page link index of a wiki """
+
+    def __init__(self, request):
+        self.request = request
+
+    def _cache(self):
+        return caching.CacheEntry(self.request, 'linkindex', 'links', scope='wiki',
+                                  use_pickle=True, do_locking=False)
+
+    def _delta_filename(self):
+        return os.path.join(caching.get_arena_dir(self.request, 'linkindex', 'wiki'), 'delta')
+
+    def exists(self):
+        return self._cache().exists()
+
+    def _read_delta(self, offset):
+        """ Return the complete delta lines after offset and the offset after them """
+        try:
+            f = file(self._delta_filename(), 'rb')
+        except IOError:
+            return [], offset
+        try:
+            f.seek(offset)
+            data = f.read()
+        finally:
+            f.close()
+        end = data.rfind('\n') + 1 # a line might just get written
+        return data[:end].splitlines(), offset + end
+
+    def _data(self):
+        """ Return the current index data, None if there is no index
+
+        The index data is kept in memory (per wiki) and only loaded again if
+        some process has rewritten it on disk, otherwise just the new delta
+        lines are applied. Then pages changed in the edit-log since are
+        updated in memory. The caller must hold _lock.
+        """
+        cfg = self.request.cfg
+        cache = self._cache()
+        memory = getattr(cfg.cache, 'linkindex', None)
+        while True:
+            uid = cache.uid()
+            if uid is None:
+                return None
+            if memory is None or memory[0] != uid:
+                try:
+                    data = cache.content()
+                except caching.CacheError:
+                    return None
+                data['covered'] = {}
+                memory = [uid, data, 0]
+            lines, delta_pos = self._read_delta(memory[2])
+            if cache.uid() == uid:
+                break
+            # compacted meanwhile, the delta belongs to the new index
+            memory = None
+        data = memory[1]
+        for line in lines:
+            try:
+                log_pos, pagename, links = _parse_delta_line(line)
+            except (ValueError, IndexError):
+                logging.warning("ignoring broken link index delta line %r" % line)
+                continue
+            self._set_links(data, pagename, links)
+            data['covered'][pagename] = log_pos
+        memory[2] = delta_pos
+        cfg.cache.linkindex = memory
+        if lines:
+            cfg.cache.linkindex_targets = None
+        self._catch_up(data)
+        return data
+
+    def _catch_up(self, data):
+        """ Update the pages changed in the edit-log since data['log_pos'],
+            unless a delta line recorded their links after the change
+        """
+        request = self.request
+        elog = editlog.EditLog(request)
+        size = elog.size()
+        if data['log_pos'] == size:
+            return
+        if data['log_pos'] > size: # edit-log was truncated
+            data['log_pos'] = 0
+        changed = set()
+        covered = data['covered']
+        elog.seek(data['log_pos'])
+        for line in elog:
+            position = elog.position()
+            pagenames = [line.pagename]
+            if line.action == 'SAVE/RENAME':
+                pagenames.append(line.extra) # == old page name
+            for pagename in pagenames:
+                if covered.get(pagename, 0) < position:
+                    changed.add(pagename)
+        data['log_pos'] = elog.position()
+        for pagename in changed:
+            self._set_links(data, pagename, _page_links(request, pagename))
+        if changed:
+            request.cfg.cache.linkindex_targets = None
+
+    def _collect(self):
+        """ Return new index data made from the links of all existing pages """
+        request = self.request
+        log_pos = editlog.EditLog(request).size()
+        data = {'log_pos': log_pos, 'forward': {}, 'reverse': {}, 'wanted': set(), 'orphaned': set(),
+                'covered': {}, }
+        pagenames = request.rootpage.getPageList(user='', exists=1)
+        for pagename in pagenames:
+            self._set_links(data, pagename, Page(request, pagename).getPageLinks(request))
+        return data
+
+    def _save(self, data):
+        """ Store data as the index and start a new delta (the caller must
+            hold the index write lock)
+        """
+        stored = dict(data)
+        del stored['covered']
+        cache = self._cache()
+        cache.update(stored)
+        f = file(self._delta_filename(), 'wb')
+        f.close()
+        data['covered'] = {}
+        self.request.cfg.cache.linkindex = [cache.uid(), data, 0]
+        self.request.cfg.cache.linkindex_targets = None
+
+    def build(self):
+        """ Build the index from the links of all existing pages
+            (used by "moin maint makecache")
+
+        @return: the index data
+        """
+        # changes while collecting are after data['log_pos'] in the edit-log
+        data = self._collect()
+        cache = self._cache()
+        cache.lock('w')
+        try:
+            _lock.acquire()
+            try:
+                self._save(data)
+            finally:
+                _lock.release()
+        finally:
+            cache.unlock()
+        logging.info("built link index for %d pages" % len(data['forward']))
+        return data
+
+    def update_pages(self, pagenames):
+        """ Record the current links of some pages that were changed
+            (does nothing if there is no index)
+
+        @param pagenames: names of the pages that were changed
+        """
+        request = self.request
+        if not self.exists():
+            return
+        log_pos = editlog.EditLog(request).size()
+        lines = []
+        for pagename in pagenames:
+            lines.append(_delta_line(log_pos, pagename, _page_links(request, pagename)))
+        cache = self._cache()
+        cache.lock('w')
+        try:
+            if not cache.exists():
+                return
+            f = file(self._delta_filename(), 'ab')
+            try:
+                f.write(''.join(lines))
+                delta_size = f.tell()
+            finally:
+                f.close()
+            if delta_size > MAX_DELTA_SIZE:
+                _lock.acquire()
+                try:
+                    data = self._data()
+                    if data is not None:
+                        self._save(data)
+                finally:
+                    _lock.release()
+        finally:
+            cache.unlock()
+
+    def _set_links(self, data, pagename, links):
+        """ Set the links of page pagename in data
+
+        @param links: list of the page names the page links to, None if
+                      the page does not exist
+        """
+        forward, reverse = data['forward'], data['reverse']
+        old_links = forward.pop(pagename, set())
+        if links is not None:
+            links = forward[pagename] = set(links)
+        else:
+            links = set()
+        for link in old_links - links:
+            sources = reverse[link]
+            sources.discard(pagename)
+            if not sources:
+                del reverse[link]
+        for link in links - old_links:
+            reverse.setdefault(link, set()).add(pagename)
+        # only these may have changed their wanted/orphaned state:
+        for name in old_links | links | set([pagename]):
+            if name in reverse and name not in forward:
+                data['wanted'].add(name)
+            else:
+                data['wanted'].discard(name)
+            if name in forward and name not in reverse:
+                data['orphaned'].add(name)
+            else:
+                data['orphaned'].discard(name)
+
+    def _query(self, query, fallback=None):
+        """ Return query(data) for the current index data
+
+        @param fallback: if given, return fallback() instead of collecting
+                         the links of all pages when there is no index
+        """
+        _lock.acquire()
+        try:
+            data = self._data()
+            if data is not None:
+                return query(data)
+        finally:
+            _lock.release()
+        if fallback is not None:
+            return fallback()
+        logging.warning("Slow link queries are used because the link index does not exist. You should create it using the moin maint makecache command.")
+        return query(self._collect())
+
+    def links(self, pagename):
+        """ Return the names of the pages pagename links to """
+        return self._query(lambda data: set(data['forward'].get(pagename, ())),
+                           lambda: set(_page_links(self.request, pagename) or ()))
+
+    def backlinks(self, pagename):
+        """ Return the names of the pages linking to pagename """
+        return self._query(lambda data: set(data['reverse'].get(pagename, ())))
+
+    def wanted(self):
+        """ Return dict of non-existing page name -> names of the pages linking to it """
+        def query(data):
+            reverse = data['reverse']
+            return dict([(name, set(reverse[name])) for name in data['wanted']])
+        return self._query(query)
+
+    def orphaned(self):
+        """ Return the names of the existing pages no page links to """
+        return self._query(lambda data: set(data['orphaned']))
+
+    def linking_to(self, prefix=None, search_re=None):
+        """ Return the names of the pages linking to pages with a name
+            starting with prefix or matching search_re
+
+        For a prefix, this only looks at the matching link targets, for a
+        regular expression, all link targets are checked.
+        """
+        def query(data):
+            reverse = data['reverse']
+            if prefix is not None:
+                cfg = self.request.cfg
+                targets = getattr(cfg.cache, 'linkindex_targets', None)
+                if targets is None or targets[0] is not data:
+                    targets = cfg.cache.linkindex_targets = data, sorted(reverse)
+                targets = targets[1]
+                names = []
+                for i in xrange(bisect.bisect_left(targets, prefix), len(targets)):
+                    if not targets[i].startswith(prefix):
+                        break
+                    names.append(targets[i])
+            else:
+                names = [name for name in reverse if search_re.match(name)]
+            pages = set()
+            for name in names:
+                pages |= reverse[name]
+            return pages
+        return self._query(query)
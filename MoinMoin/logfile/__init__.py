@@ -11,8 +11,9 @@
 from MoinMoin import log
 logging = log.getLogger(__name__)
 
-import os, codecs, errno
+import os, codecs, errno, struct, hashlib
 from MoinMoin import config, wikiutil
+from MoinMoin.util import lock
 
 class LogError(Exception):
     """ Base class for log errors """
@@ -80,6 +81,217 @@ class LineBuffer:
         self.lines = [unicode(line.rstrip('\n'), config.charset) for line in lines]
 
 
+def line_timestamp(line):
+    """ Return the timestamp in the first (TAB separated) field of a log line
+
+    @param line: log line (str or unicode)
+    @return: timestamp (long), 0 if there is no valid timestamp
+    """
+    try:
+        return long(line.split('\t', 1)[0])
+    except ValueError:
+        return 0
+
+
+class LogIndex:
+    """
+    Sidecar index of a log file, maps line numbers and timestamps to file offsets
+
+    The index file consists of a header identifying the indexed log file
+    (inode, SHA1 of the first and of the last indexed line) and fixed size
+    records, one record for each line of the log file: (file offset after
+    the line, timestamp of the line). Thus, getting the number of lines or
+    the offset of some line is O(1) and finding the first line with some
+    timestamp is a O(log n) binary search (assuming the log lines are sorted
+    by timestamp).
+
+    The index is brought up to date by reading the log lines appended since
+    the last update. If the log file was replaced or changed (not just
+    appended to), the index is rebuilt from scratch.
+    """
+    header = struct.Struct('<q20s20s')
+    record = struct.Struct('<qq')
+
+    def __init__(self, logfilename, filename=None):
+        """
+        @param logfilename: name of the log file
+        @param filename: name of the index file (default: logfilename + '.index')
+        """
+        self.logfilename = logfilename
+        self.filename = filename or logfilename + '.index'
+        self.loglevel = logging.NOTSET
+
+    def exists(self):
+        return os.path.exists(self.filename)
+
+    def _size(self, filename):
+        try:
+            return os.path.getsize(filename)
+        except OSError, err:
+            if err.errno == errno.ENOENT:
+                return 0
+            raise
+
+    def lines(self):
+        """ Return number of lines covered by the index """
+        return max(self._size(self.filename) - self.header.size, 0) // self.record.size
+
+    def _read_record(self, f, line_no):
+        f.seek(self.header.size + line_no * self.record.size)
+        return self.record.unpack(f.read(self.record.size))
+
+    def _identity(self, log, count, output):
+        """ Return the header for the first count lines of the log file
+
+        @param log: the log file (open)
+        @param count: number of indexed lines
+        @param output: the index file (open), to get the offsets of the lines
+        @return: header data or None if the log file is shorter
+        """
+        first = last = ''
+        if count:
+            log.seek(0)
+            first = log.readline()
+            start = count > 1 and self._read_record(output, count - 2)[0] or 0
+            end = self._read_record(output, count - 1)[0]
+            log.seek(start)
+            last = log.read(end - start)
+            if len(last) != end - start:
+                return None
+        return self.header.pack(os.fstat(log.fileno()).st_ino,
+                                hashlib.sha1(first).digest(), hashlib.sha1(last).digest())
+
+    def _read_header(self, f):
+        f.seek(0)
+        return f.read(self.header.size)
+
+    def valid(self):
+        """ Return True if the index was made from the current log file """
+        try:
+            log = file(self.logfilename, 'rb')
+        except IOError:
+            return False
+        try:
+            f = file(self.filename, 'rb')
+            try:
+                return self._read_header(f) == self._identity(log, self.lines(), f)
+            finally:
+                f.close()
+        finally:
+            log.close()
+
+    def covered(self):
+        """ Return the log file offset up to which the log file is indexed """
+        count = self.lines()
+        if not count:
+            return 0
+        f = file(self.filename, 'rb')
+        try:
+            return self._read_record(f, count - 1)[0]
+        finally:
+            f.close()
+
+    def offset(self, line_no):
+        """ Return the file offset of the begin of line line_no
+
+        @param line_no: line number (0 = first line, lines() = end of log)
+        """
+        if line_no <= 0:
+            return 0
+        f = file(self.filename, 'rb')
+        try:
+            return self._read_record(f, min(line_no, self.lines()) - 1)[0]
+        finally:
+            f.close()
+
+    def bisect(self, timestamp):
+        """ Return the number of the first line with a timestamp >= timestamp
+
+        @param timestamp: timestamp (long)
+        @return: line number, lines() if there is no such line
+        """
+        lo, hi = 0, self.lines()
+        f = file(self.filename, 'rb')
+        try:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._read_record(f, mid)[1] < timestamp:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        finally:
+            f.close()
+        return lo
+
+    def update(self, timeout=1.0):
+        """ Bring the index up to date with the log file
+
+        @param timeout: how long to wait for the index lock
+        @return: True if the index covers the complete log file now, False if
+                 we could not update it (e.g. because it is locked) or
+                 there is no log file (yet)
+        """
+        if not os.path.exists(self.logfilename):
+            return False
+        if (self.exists() and self.covered() == self._size(self.logfilename) and
+            self.valid()):
+            return True
+        _lock = lock.ExclusiveLock(self.filename + '.lock', 60.0)
+        try:
+            acquired = _lock.acquire(timeout)
+        except OSError, err:
+            # e.g. no write permission for the log directory
+            logging.debug("logfile: can't lock index %r (%s)" % (self.filename, str(err)))
+            return False
+        if not acquired:
+            logging.debug("logfile: can't lock index %r" % self.filename)
+            return False
+        try:
+            try:
+                self._update()
+            except (IOError, OSError), err:
+                logging.error("logfile: updating index %r failed (%s)" % (self.filename, str(err)))
+                return False
+        finally:
+            _lock.release()
+        return True
+
+    def _update(self):
+        input = file(self.logfilename, 'rb') # only create an index for an existing log
+        try:
+            fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0666 & config.umask)
+            output = os.fdopen(fd, 'r+b')
+            try:
+                count = self.lines()
+                header = self._read_header(output)
+                if count and header != self._identity(input, count, output):
+                    # the log file was replaced or changed (not just appended to)
+                    logging.info("logfile: rebuilding index %r" % self.filename)
+                    count = 0
+                # remove a partially written record, if any
+                output.truncate(self.header.size + count * self.record.size)
+                covered = count and self._read_record(output, count - 1)[0] or 0
+                input.seek(covered)
+                records = []
+                for line in input:
+                    if not line.endswith('\n'):
+                        break # incomplete line, likely just being written
+                    covered += len(line)
+                    records.append(self.record.pack(covered, line_timestamp(line)))
+                output.seek(self.header.size + count * self.record.size)
+                output.write(''.join(records))
+                output.flush()
+                count += len(records)
+                header = self._identity(input, count, output)
+                output.seek(0)
+                output.write(header)
+                logging.log(self.loglevel, "logfile: indexed %d new lines of %r" % (len(records), self.logfilename))
+            finally:
+                output.close()
+        finally:
+            input.close()
+
+
 class LogFile:
     """
     .filter: function that gets the values from .parser.
@@ -87,13 +299,16 @@ class LogFile:
     Overwrite .parser() and .add() to customize this class to special log files
     """
 
-    def __init__(self, filename, buffer_size=4096):
+    def __init__(self, filename, buffer_size=4096, use_index=False):
         """
         @param filename: name of the log file
         @param buffer_size: approx. size of one buffer in bytes
+        @param use_index: use a LogIndex (stored into filename + '.index')
+                          for seeking to lines / timestamps and counting lines
         """
         self.loglevel = logging.NOTSET
         self.__filename = filename
+        self._index = use_index and LogIndex(filename) or None
         self.__buffer = None # currently used buffer, points to one of the following:
         self.__buffer1 = None
         self.__buffer2 = None
@@ -104,12 +319,17 @@ class LogFile:
     def __iter__(self):
         return self
 
-    def reverse(self):
+    def reverse(self, line_no=None):
         """ yield log entries in reverse direction starting from last one
 
+        @param line_no: if given, start from the entry before line <line_no>
+                        (see seek_line)
         @rtype: iterator
         """
-        self.to_end()
+        if line_no is None:
+            self.to_end()
+        else:
+            self.seek_line(line_no)
         while 1:
             try:
                 logging.log(self.loglevel, "LogFile.reverse %s" % self.__filename)
@@ -179,16 +399,25 @@ class LogFile:
                 return 0
             raise
 
+    def _get_index(self):
+        """ Return the up-to-date LogIndex or None if not usable """
+        if self._index is not None and self._index.update():
+            return self._index
+        return None
+
     def lines(self):
         """ Return number of lines in the log file
 
         Return 0 if the file does not exist. Raises other OSError.
 
-        Expensive for big log files - O(n)
+        Expensive for big log files - O(n), O(1) if we have an index
 
         @return: size of log file in lines
         @rtype: Int
         """
+        index = self._get_index()
+        if index is not None:
+            return index.lines()
         try:
             f = file(self.__filename, 'r')
             try:
@@ -228,6 +457,15 @@ class LogFile:
                  to the end or beyond
         """
         logging.log(self.loglevel, "LogFile.peek %s" % self.__filename)
+        if (self._index is not None and self.__lineno is not None and
+            self.__buffer is not None and abs(lines) > self.__buffer.len):
+            # long distance, use the index to get there directly
+            index = self._get_index()
+            if index is not None:
+                line_no = self.__lineno + lines
+                count = index.lines()
+                self.seek_line(max(0, min(line_no, count)))
+                return not 0 <= line_no < count
         self.__rel_index += lines
         while self.__rel_index < 0:
             if self.__buffer is self.__buffer2:
@@ -414,6 +652,34 @@ class LogFile:
             # XXX test for valid position
         self.__lineno = line_no
 
+    def seek_line(self, line_no):
+        """ moves file position to the begin of line <line_no> (0 = first line).
+        This is O(1) if we have an index, otherwise we need to count lines
+        from the begin of the file.
+        """
+        index = self._get_index()
+        if index is not None:
+            self.seek(index.offset(line_no), line_no)
+        else:
+            self.to_begin()
+            self.peek(line_no)
+
+    def seek_timestamp(self, timestamp):
+        """ moves file position to the first line with a timestamp >= timestamp.
+        The log lines are expected to be sorted by their timestamps.
+        This is a O(log n) binary search if we have an index, otherwise we
+        search backwards from the end of the file.
+        """
+        index = self._get_index()
+        if index is not None:
+            self.seek_line(index.bisect(timestamp))
+        else:
+            self.to_end()
+            while not self.peek(-1):
+                if line_timestamp(self.__buffer.lines[self.__rel_index]) < timestamp:
+                    self.peek(1)
+                    break
+
     def line_no(self):
         """@return: the current line number or None if line number is unknown"""
         return self.__lineno
@@ -460,3 +726,5 @@ class LogFile:
             self._output.write(line)
             self._output.close() # does this maybe help against the sporadic fedora wikis 160 \0 bytes in the edit-log?
             del self._output # re-open the output file automagically
+            if self._index is not None and self._index.exists():
+                self._index.update()
@@ -0,0 +1,112 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.logfile.eventlog Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import tempfile
+import shutil
+import time
+
+from MoinMoin.logfile import eventlog
+
+
+class TestEventBuffer(object):
+
+    def setup_method(self, method):
+        self.test_dir = tempfile.mkdtemp('', 'eventlog_')
+        self.filename = os.path.join(self.test_dir, 'event-log')
+        self.saved_buffer_config = self.request.cfg.log_events_buffer
+
+    def teardown_method(self, method):
+        self.request.cfg.log_events_buffer = self.saved_buffer_config
+        eventlog._buffers.pop(self.filename, None)
+        shutil.rmtree(self.test_dir)
+
+    def written(self):
+        try:
+            return file(self.filename, 'rb').read()
+        except IOError:
+            return ''
+
+    def add(self, count, **values):
+        log = eventlog.EventLog(self.request, filename=self.filename)
+        for i in range(count):
+            log.add(self.request, 'VIEWPAGE', dict(values), add_http_info=0,
+                    mtime_usecs=1000000 + i)
+        return log
+
+    def testBatches(self):
+        self.request.cfg.log_events_buffer = (3, 3600)
+        self.add(2, pagename=u'FrontPage')
+        assert self.written() == ''
+        self.add(1, pagename=u'FrontPage')
+        assert self.written().count('\n') == 3
+        log = self.add(1, pagename=u'FrontPage')
+        assert self.written().count('\n') == 3
+        log.flush()
+        assert self.written().count('\n') == 4
+
+    def testParser(self):
+        self.request.cfg.log_events_buffer = (100, 3600)
+        self.add(2, pagename=u'\xc4rger')
+        eventlog.flush_all()
+        events = list(eventlog.EventLog(self.request, filename=self.filename))
+        assert [(usecs, event) for usecs, event, values in events] == [(1000000, 'VIEWPAGE'), (1000001, 'VIEWPAGE')]
+        assert events[0][2]['pagename'] == u'\xc4rger'
+
+    def testMaxAge(self):
+        self.request.cfg.log_events_buffer = (100, 0.2)
+        self.add(1)
+        eventlog.flush_due()
+        assert self.written() == ''
+        time.sleep(0.25)
+        eventlog.flush_due()
+        assert self.written().count('\n') == 1
+        self.add(1)
+        time.sleep(0.25)
+        self.add(1) # the oldest buffered event is too old
+        assert self.written().count('\n') == 3
+
+    def testForkedChild(self):
+        self.request.cfg.log_events_buffer = (100, 3600)
+        self.add(1)
+        event_buffer = eventlog._buffers[self.filename]
+        event_buffer.pid = -1 # we pretend to be a child of the process that buffered it
+        event_buffer.flush()
+        assert self.written() == ''
+
+    def testProcesses(self):
+        """ batches written by several processes at once must not get mixed up """
+        processes, batches, count = 6, 300, 100
+        pids = []
+        for p in range(processes):
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    event_buffer = eventlog.EventBuffer(self.filename, count, 3600)
+                    for b in range(batches):
+                        for i in range(count):
+                            event_buffer.add('%d\t%d\t%d\t%s\n' % (p, b, i, 'x' * 140))
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        lines = self.written().splitlines()
+        assert len(lines) == processes * batches * count
+        for line in lines:
+            assert line.endswith('\t' + 'x' * 140)
+            assert len(line.split('\t')) == 4
+
+    def testUnbuffered(self):
+        self.request.cfg.log_events_buffer = None
+        self.add(1)
+        assert self.written().count('\n') == 1
+        assert self.filename not in eventlog._buffers
+
+
+coverage_modules = ['MoinMoin.logfile.eventlog']
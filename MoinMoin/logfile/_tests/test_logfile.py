@@ -10,7 +10,9 @@ import tempfile
 import shutil
 from StringIO import StringIO
 
-from MoinMoin.logfile import LogFile
+import py
+
+from MoinMoin.logfile import LogFile, LogIndex, editlog
 
 
 class TestLogFile(object):
@@ -95,5 +97,97 @@ class TestLogFile(object):
         assert lf.position() == 0
         assert list(lf) == self.LOG + [newdata]
 
+
+class TestLogIndex(TestLogFile):
+    """ testing logfile index """
+
+    def teardown_method(self, method):
+        for fname in [self.fname, self.fname + '.index']:
+            if os.path.exists(fname):
+                os.remove(fname)
+
+    def test_lines(self):
+        lf = LogFile(self.fname, use_index=True)
+        assert lf.lines() == len(self.LOG)
+        assert os.path.exists(self.fname + '.index')
+        # the index is kept up to date when adding lines
+        newdata = [u'1303333333000000', u'00000003', u'SAVE', u'foo', u'0.0.0.0', u'example.org', u'666.666.666', u'', u'comment']
+        lf.add(*newdata)
+        assert LogIndex(self.fname).lines() == len(self.LOG) + 1
+        assert lf.lines() == len(self.LOG) + 1
+
+    def test_seek_line(self):
+        lf = LogFile(self.fname, use_index=True)
+        for line_no in range(len(self.LOG)):
+            lf.seek_line(line_no)
+            assert lf.line_no() == line_no
+            assert lf.next() == self.LOG[line_no]
+        lf.seek_line(len(self.LOG))
+        py.test.raises(StopIteration, lf.next)
+        assert lf.previous() == self.LOG[-1]
+
+    def test_peek(self):
+        lf = LogFile(self.fname, use_index=True, buffer_size=10)
+        lf.to_begin()
+        assert not lf.peek(3)
+        assert lf.line_no() == 3
+        assert lf.next() == self.LOG[3]
+        assert lf.peek(-10)
+        assert lf.line_no() == 0
+        assert lf.peek(10)
+        py.test.raises(StopIteration, lf.next)
+
+    def test_reverse_from_line(self):
+        lf = LogFile(self.fname, use_index=True)
+        assert list(lf.reverse(2)) == self.LOG[1::-1]
+
+    def test_seek_timestamp(self):
+        for use_index in [True, False]:
+            lf = LogFile(self.fname, use_index=use_index)
+            lf.seek_timestamp(1292680177309091)
+            assert list(lf) == self.LOG[2:]
+            lf.seek_timestamp(1292680177309092)
+            assert list(lf) == self.LOG[3:]
+            lf.seek_timestamp(0)
+            assert list(lf) == self.LOG
+            lf.seek_timestamp(1999999999000000)
+            assert list(lf) == []
+
+    def test_missing_log(self):
+        os.remove(self.fname) # e.g. a new wiki without edits
+        assert not LogIndex(self.fname).update()
+        lf = LogFile(self.fname, use_index=True)
+        assert lf.lines() == 0
+        lf.seek_timestamp(0)
+        assert list(lf) == []
+        assert not os.path.exists(self.fname + '.index')
+
+    def test_rebuild(self):
+        lf = LogFile(self.fname, use_index=True)
+        assert lf.lines() == len(self.LOG)
+        # log file gets replaced by a shorter one
+        self.write_log(self.fname, self.LOG[:2])
+        lf = LogFile(self.fname, use_index=True)
+        assert lf.lines() == 2
+        lf.seek_line(1)
+        assert lf.next() == self.LOG[1]
+
+    def test_rebuild_same_size(self):
+        lf = LogFile(self.fname, use_index=True)
+        assert lf.lines() == len(self.LOG)
+        # log file gets rewritten with other lines of the same size
+        log = [[u'1999999999000000'] + linedata[1:] for linedata in self.LOG]
+        self.write_log(self.fname, log)
+        lf = LogFile(self.fname, use_index=True)
+        lf.seek_timestamp(1999999999000000)
+        assert list(lf) == log
+
+
+class TestEditLogIndex(object):
+    def test_global_only(self):
+        """ only the global edit-log uses an index """
+        assert editlog.EditLog(self.request)._index is not None
+        assert editlog.EditLog(self.request, rootpagename=u'FrontPage')._index is None
+
 coverage_modules = ['MoinMoin.logfile']
 
@@ -39,6 +39,16 @@ class EditLogLine:
     def __init__(self, usercache):
         self._usercache = usercache
 
+    def __getstate__(self):
+        # the usercache holds User objects (and thus requests), don't pickle it
+        state = self.__dict__.copy()
+        del state['_usercache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._usercache = {}
+
     def __cmp__(self, other):
         try:
             return cmp(self.ed_time_usecs, other.ed_time_usecs)
@@ -149,13 +159,18 @@ class EditLog(LogFile):
         well as for the local edit-log (e.g. PageEditor, info action).
     """
     def __init__(self, request, filename=None, buffer_size=4096, **kw):
+        # only the global edit-log is big enough to need an index, page
+        # edit-logs are tiny (and index files in page dirs would be copied
+        # with the pages)
+        use_index = False
         if filename is None:
             rootpagename = kw.get('rootpagename', None)
             if rootpagename:
                 filename = Page(request, rootpagename).getPagePath('edit-log', isfile=1)
             else:
                 filename = request.rootpage.getPagePath('edit-log', isfile=1)
-        LogFile.__init__(self, filename, buffer_size)
+                use_index = True
+        LogFile.__init__(self, filename, buffer_size, use_index=use_index)
         self._NUM_FIELDS = 9
         self._usercache = {}
 
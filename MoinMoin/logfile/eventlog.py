@@ -3,14 +3,134 @@
 
     The global event-log is mainly used for statistics (e.g. EventStats).
 
-    @copyright: 2007 MoinMoin:ThomasWaldmann
+    As an event is logged for (nearly) every page view, the events are not
+    appended one by one, but buffered per process and appended in batches,
+    see EventBuffer and cfg.log_events_buffer.
+
+    @copyright: 2007 MoinMoin:ThomasWaldmann,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
+import os
 import time
+import atexit
+import threading
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
 
 from MoinMoin.logfile import LogFile
-from MoinMoin import wikiutil
+from MoinMoin import config, wikiutil
+
+
+class EventBuffer(object):
+    """ Event-log lines of this process that are not written yet
+
+    The buffered lines are appended to the event-log (with a single write)
+    when max_events lines are buffered, when a line is added or a request
+    ends (see flush_due) and the oldest line is max_age seconds old, or when
+    the process exits. We use no timer thread, a pending timer would crash
+    the interpreter at exit.
+    A batch is appended with a single os.write call (not with a buffered
+    file object, which splits big writes), so the batches of several
+    processes do not get mixed up in the event-log.
+    """
+    def __init__(self, filename, max_events, max_age):
+        self.filename = filename
+        self.max_events = max_events
+        self.max_age = max_age
+        self.lines = []
+        self.first = None # time the oldest buffered line was added
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def add(self, line):
+        """ Buffer line (str, complete line), write the buffer if it is full """
+        self.lock.acquire()
+        try:
+            self._check_pid()
+            if not self.lines:
+                self.first = time.time()
+            self.lines.append(line)
+            if len(self.lines) >= self.max_events or self._due():
+                self._flush()
+        finally:
+            self.lock.release()
+
+    def _due(self):
+        return self.first is not None and time.time() - self.first >= self.max_age
+
+    def flush(self, due_only=False):
+        """ Write the buffered lines to the event-log
+
+        @param due_only: only write them if the oldest line is max_age seconds old
+        """
+        self.lock.acquire()
+        try:
+            self._check_pid()
+            if not due_only or self._due():
+                self._flush()
+        finally:
+            self.lock.release()
+
+    def _check_pid(self):
+        if self.pid != os.getpid():
+            # we are a forked child process, the lines we inherited will be
+            # written by our parent process.
+            self.pid = os.getpid()
+            self.lines = []
+            self.first = None
+
+    def _flush(self):
+        if not self.lines:
+            return
+        data = ''.join(self.lines)
+        self.lines = []
+        self.first = None
+        try:
+            fd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0666)
+            try:
+                while data:
+                    written = os.write(fd, data)
+                    data = data[written:]
+            finally:
+                os.close(fd)
+        except (IOError, OSError), err:
+            # we might run at the end of a request or at exit, so just log it
+            logging.error("eventlog: could not write %d bytes to %r (%s)" % (len(data), self.filename, err))
+
+
+_buffers = {} # event-log filename -> EventBuffer
+_buffers_lock = threading.Lock()
+
+def _get_buffer(filename, max_events, max_age):
+    """ Return the EventBuffer of event-log filename (create it if needed) """
+    _buffers_lock.acquire()
+    try:
+        event_buffer = _buffers.get(filename)
+        if event_buffer is None:
+            event_buffer = _buffers[filename] = EventBuffer(filename, max_events, max_age)
+        else:
+            event_buffer.max_events, event_buffer.max_age = max_events, max_age
+        return event_buffer
+    finally:
+        _buffers_lock.release()
+
+def flush_all():
+    """ Write the buffered events of all event-logs """
+    for event_buffer in _buffers.values():
+        event_buffer.flush()
+
+def flush_due():
+    """ Write the buffered events of the event-logs whose oldest buffered
+        event is older than their max_age (called at the end of a request)
+    """
+    for event_buffer in _buffers.values():
+        event_buffer.flush(due_only=True)
+
+atexit.register(flush_all)
+
 
 class EventLog(LogFile):
     """ The global event-log is mainly used for statistics (e.g. EventStats) """
@@ -23,6 +143,7 @@ class EventLog(LogFile):
             else:
                 filename = request.rootpage.getPagePath('event-log', isfile=1)
         LogFile.__init__(self, filename, buffer_size)
+        self.filename = filename
 
     def add(self, request, eventtype, values=None, add_http_info=1,
             mtime_usecs=None):
@@ -55,7 +176,18 @@ class EventLog(LogFile):
 
         # Encode values in a query string TODO: use more readable format
         values = wikiutil.makeQueryString(values)
-        self._add(u"%d\t%s\t%s\n" % (mtime_usecs, eventtype, values))
+        line = u"%d\t%s\t%s\n" % (mtime_usecs, eventtype, values)
+        if cfg.log_events_buffer:
+            max_events, max_age = cfg.log_events_buffer
+            _get_buffer(self.filename, max_events, max_age).add(line.encode(config.charset))
+        else:
+            self._add(line)
+
+    def flush(self):
+        """ Write the events this process buffered for this event-log """
+        event_buffer = _buffers.get(self.filename)
+        if event_buffer is not None:
+            event_buffer.flush()
 
     def parser(self, line):
         """ parse a event-log line into its components """
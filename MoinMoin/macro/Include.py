@@ -9,17 +9,19 @@
     for detailed docs.
 
     @copyright: 2000-2004 Juergen Hermann <jh@web.de>,
-                2000-2001 Richard Jones <richard@bizarsoftware.com.au>
+                2000-2001 Richard Jones <richard@bizarsoftware.com.au>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
 #Dependencies = ["pages"] # included page
 Dependencies = ["time"] # works around MoinMoinBugs/TableOfContentsLacksLinks
+RecordsDependencies = True # tells the fragment cache which pages we include
 
 generates_headings = True
 
 import re, StringIO
-from MoinMoin import wikiutil
+from MoinMoin import fragmentcache, wikiutil
 from MoinMoin.Page import Page
 
 
@@ -66,11 +68,21 @@ def execute(macro, text, args_re=re.compile(_args_re_pattern), title_re=re.compi
         return (_sysmsg % ('error', _('Invalid include arguments "%s"!')) % (text, ))
 
     # prepare including page
-    result = []
-    print_mode = request.action in ("print", "format")
     this_page = macro.formatter.page
     if not hasattr(this_page, '_macroInclude_pagelist'):
         this_page._macroInclude_pagelist = {}
+    if not hasattr(request, "_Include_backto"):
+        request._Include_backto = this_page.page_name
+
+    return fragmentcache.cached_output(macro, 'Include', text,
+                                       lambda: _include(macro, args, title_re))
+
+def _include(macro, args, title_re):
+    request = macro.request
+    _ = request.getText
+    result = []
+    print_mode = request.action in ("print", "format")
+    this_page = macro.formatter.page
 
     # get list of pages to include
     inc_name = wikiutil.AbsPageName(this_page.page_name, args.group('name'))
@@ -81,6 +93,7 @@ def execute(macro, text, args_re=re.compile(_args_re_pattern), title_re=re.compi
         except re.error:
             pass # treat as plain page name
         else:
+            fragmentcache.record_pattern(request, inc_name)
             # Get user filtered readable page list
             pagelist = request.rootpage.getPageList(filter=inc_match.match)
 
@@ -101,6 +114,7 @@ def execute(macro, text, args_re=re.compile(_args_re_pattern), title_re=re.compi
 
     # iterate over pages
     for inc_name in pagelist:
+        fragmentcache.record_page(request, inc_name)
         if not request.user.may.read(inc_name):
             continue
         if inc_name in this_page._macroInclude_pagelist:
@@ -172,9 +186,6 @@ def execute(macro, text, args_re=re.compile(_args_re_pattern), title_re=re.compi
         ##result.append("*** f=%s t=%s ***" % (from_re, to_re))
         ##result.append("*** f=%d t=%d ***" % (from_pos, to_pos))
 
-        if not hasattr(request, "_Include_backto"):
-            request._Include_backto = this_page.page_name
-
         # do headings
         level = None
         if args.group('heading') and args.group('hquote'):
@@ -6,6 +6,8 @@
     @license: GNU GPL, see COPYING for details.
 """
 
+from MoinMoin.linkindex import LinkIndex
+
 Dependencies = ["pages"]
 
 def macro_OrphanedPages(macro):
@@ -16,15 +18,9 @@ def macro_OrphanedPages(macro):
     if macro.request.isSpiderAgent: # reduce bot cpu usage
         return ''
 
-    # delete all linked pages from a dict of all pages
-    pages = macro.request.rootpage.getPageDict()
-    orphaned = {}
-    orphaned.update(pages)
-    for page in pages.values():
-        links = page.getPageLinks(macro.request)
-        for link in links:
-            if link in orphaned:
-                del orphaned[link]
+    # pages no page links to, readable by current user
+    may_read = macro.request.user.may.read
+    orphaned = [name for name in LinkIndex(macro.request).orphaned() if may_read(name)]
 
     result = []
     f = macro.formatter
@@ -34,7 +30,7 @@ def macro_OrphanedPages(macro):
         result.append(f.paragraph(0))
     else:
         # return a list of page links
-        orphanednames = orphaned.keys()
+        orphanednames = orphaned
         orphanednames.sort()
         result.append(f.number_list(1))
         for name in orphanednames:
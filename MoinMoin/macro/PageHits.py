@@ -7,9 +7,8 @@
 
 """
 
-from MoinMoin import caching, logfile
 from MoinMoin.Page import Page
-from MoinMoin.logfile import eventlog
+from MoinMoin.stats.eventstats import EventStats
 
 
 class PageHits:
@@ -17,57 +16,18 @@ class PageHits:
     def __init__(self, macro):
         self.macro = macro
         self.request = macro.request
-        self.cache = caching.CacheEntry(self.request, 'charts', 'pagehits', scope='wiki', use_pickle=True)
 
     def execute(self):
         """ Execute the macro and return output """
         if self.request.isSpiderAgent: # reduce bot cpu usage
             return ''
-        cacheDate, hits = self.cachedHits()
-        self.addHitsFromLog(hits, cacheDate)
+        hits = EventStats(self.request).pagehits()
         self.filterReadableHits(hits)
         hits = [(hits[pagename], pagename) for pagename in hits]
         hits.sort()
         hits.reverse()
         return self.format(hits)
 
-    def cachedHits(self):
-        """ Return tuple (cache date, cached hits) for all pages """
-        date, hits = 0, {}
-        if self.cache.exists():
-            try:
-                date, hits = self.cache.content()
-            except caching.CacheError:
-                self.cache.remove()
-        return date, hits
-
-    def addHitsFromLog(self, hits, cacheDate):
-        """ Parse the log, add hits after cacheDate and update the cache """
-        event_log = eventlog.EventLog(self.request)
-        event_log.set_filter(['VIEWPAGE'])
-
-        changed = False
-        # don't use event_log.date()
-        latest = None
-        for event in event_log.reverse():
-            if latest is None:
-                latest = event[0]
-            if event[0] <= cacheDate:
-                break
-            page = event[2].get('pagename', None)
-            if page:
-                hits[page] = hits.get(page, 0) + 1
-                changed = True
-
-        if changed:
-            self.updateCache(latest, hits)
-
-    def updateCache(self, date, hits):
-        try:
-            self.cache.update((date, hits))
-        except caching.CacheError:
-            pass
-
     def filterReadableHits(self, hits):
         """ Filter out hits the user many not see """
         userMayRead = self.request.user.may.read
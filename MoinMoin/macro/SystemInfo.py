@@ -110,6 +110,14 @@ class SystemInfo:
             eventlogger = eventlog.EventLog(request)
             row('Event log', self.formatInReadableUnits(eventlogger.size()))
 
+            for cache in (request.cfg.cache.meta, request.cfg.cache.pagelists, ):
+                if hasattr(cache, 'worker_stats'):
+                    stats = cache.worker_stats(request)
+                else:
+                    stats = [cache.stats()]
+                row('Item cache %s' % cache.name, ', '.join(
+                    ['pid %(pid)d: %(hits)d/%(requests)d hits' % worker for worker in stats]))
+
         nonestr = _("NONE")
         # a valid user gets info about all installed extensions
         row(_('Global extension macros'), ', '.join(macro.modules) or nonestr)
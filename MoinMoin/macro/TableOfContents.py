@@ -21,17 +21,25 @@
     in the end we can output the same IDs and the TOC is linked
     correctly, even in the case of multiple nested inclusions.
 
-    @copyright: 2007 MoinMoin:JohannesBerg
+    The output is kept in the fragment cache (see MoinMoin.fragmentcache),
+    keyed by the page text, so it is only recomputed if the page or one of
+    the pages it includes changes.
+
+    @copyright: 2007 MoinMoin:JohannesBerg,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
+import hashlib
+
 from MoinMoin.formatter import FormatterBase
 from MoinMoin.Page import Page
-from MoinMoin import wikiutil
+from MoinMoin import fragmentcache, wikiutil
 
 
 # cannot be cached because of TOCs in included pages
 Dependencies = ['time']
+RecordsDependencies = True # included pages are recorded by the Include macro
 
 class TOCFormatter(FormatterBase):
     def __init__(self, request, **kw):
@@ -146,7 +154,13 @@ Prints a table of contents.
         maxdepth = 99
 
     pname = macro.formatter.page.page_name
+    raw_hash = hashlib.sha1(macro.parser.raw.encode('utf-8')).hexdigest()
+
+    return fragmentcache.cached_output(macro, 'TableOfContents',
+                                       (maxdepth, mindepth, pname, raw_hash),
+                                       lambda: _toc(macro, maxdepth, mindepth, pname))
 
+def _toc(macro, maxdepth, mindepth, pname):
     macro.request.uid_generator.push()
 
     macro.request._tocfm_collected_headings = []
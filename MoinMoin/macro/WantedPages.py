@@ -7,6 +7,8 @@
 """
 
 from MoinMoin import wikiutil
+from MoinMoin.Page import Page
+from MoinMoin.linkindex import LinkIndex
 
 Dependencies = ["pages"]
 
@@ -31,35 +33,22 @@ def macro_WantedPages(macro):
                  page.link_to(request, label, querystr={'allpages': '%s' % (allpages and '0' or '1')}) + \
                  macro.formatter.div(0)
 
-    # Get page dict readable by current user
-    pages = request.rootpage.getPageDict()
-
-    # build a dict of wanted pages
+    # build a dict of wanted pages readable by current user
     wanted = {}
-    deprecated_links = []
-    for name, page in pages.items():
+    for link, where in LinkIndex(request).wanted().items():
+        if not request.user.may.read(link):
+            continue
         # Skip system pages, because missing translations are not wanted pages,
         # unless you are a translator and clicked "Include system pages"
-        if not allpages and wikiutil.isSystemPage(request, name):
+        where = [name for name in where
+                 if (allpages or not wikiutil.isSystemPage(request, name))
+                    and request.user.may.read(name)]
+        if not where:
             continue
-
-        # Add links to pages which do not exist in pages dict
-        links = page.getPageLinks(request)
-        is_deprecated = page.parse_processing_instructions(
-                ).get('deprecated', False)
-
-        for link in links:
-            if not link in pages and request.user.may.read(link):
-                if is_deprecated:
-                    deprecated_links.append(link)
-                if link in wanted:
-                    wanted[link][name] = 1
-                else:
-                    wanted[link] = {name: 1}
-
-    for link in deprecated_links:
-        if len(wanted[link]) == 1:
-            del wanted[link]
+        # links only from a deprecated page are not wanted
+        if len(where) == 1 and Page(request, where[0]).pi.get('deprecated', False):
+            continue
+        wanted[link] = where
 
     # Check for the extreme case when there are no wanted pages
     if not wanted:
@@ -81,11 +70,11 @@ def macro_WantedPages(macro):
 
         # Add links to pages that want this page, highliting
         # the link in those pages.
-        where = wanted[name].keys()
+        where = wanted[name]
         where.sort()
         if macro.formatter.page.page_name in where:
             where.remove(macro.formatter.page.page_name)
-        wherelinks = [pages[pagename].link_to(request, querystr={'highlight': name}, rel='nofollow')
+        wherelinks = [Page(request, pagename).link_to(request, querystr={'highlight': name}, rel='nofollow')
                       for pagename in where]
         result.append(": " + ', '.join(wherelinks))
         result.append(macro.formatter.listitem(0))
@@ -10,7 +10,8 @@
 
     @copyright: 2000-2004 Juergen Hermann <jh@web.de>,
                 2006-2009 MoinMoin:ThomasWaldmann,
-                2007 MoinMoin:JohannesBerg
+                2007 MoinMoin:JohannesBerg,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -21,7 +22,7 @@ from MoinMoin import log
 logging = log.getLogger(__name__)
 
 import re, time, os
-from MoinMoin import action, config, util
+from MoinMoin import action, config, fragmentcache, util
 from MoinMoin import wikiutil, i18n
 from MoinMoin.Page import Page
 from MoinMoin.datastruct.backends.wiki_dicts import WikiDict
@@ -125,6 +126,8 @@ class Macro:
                     execute = self.__class__._m_lang
                 else:
                     raise ImportError("Cannot load macro %s" % macro_name)
+        if fragmentcache._current(self.request) is not None:
+            self._record_dependencies(macro_name)
         try:
             return execute(self, args)
         except Exception, err:
@@ -160,6 +163,21 @@ class Macro:
         self.request.current_lang = self.name
         return ''
 
+    def _record_dependencies(self, macro_name):
+        """ Tell the fragment cache if the output of macro_name depends on
+            something it does not know about (macros recording their
+            dependencies have a true RecordsDependencies attribute).
+        """
+        if not self.get_dependencies(macro_name):
+            return
+        try:
+            records = wikiutil.importPlugin(self.request.cfg, 'macro',
+                                            macro_name, 'RecordsDependencies')
+        except wikiutil.PluginError:
+            records = False
+        if not records:
+            fragmentcache.record_dynamic(self.request)
+
     def get_dependencies(self, macro_name):
         if macro_name in self.Dependencies:
             return self.Dependencies[macro_name]
@@ -10,7 +10,6 @@ import os
 from MoinMoin import caching, macro
 from MoinMoin.logfile import eventlog
 from MoinMoin.PageEditor import PageEditor
-from MoinMoin.Page import Page
 from MoinMoin._tests import become_trusted, create_page, make_macro, nuke_eventlog, nuke_page
 
 class TestHits:
@@ -23,8 +22,8 @@ class TestHits:
         self.page = create_page(request, self.pagename, u"Foo!")
         # for that test eventlog needs to be empty
         nuke_eventlog(request)
-        # hits is based on hitcounts which reads the cache
-        caching.CacheEntry(request, 'charts', 'hitcounts', scope='wiki').remove()
+        # hits is based on the event-log counters
+        caching.CacheEntry(request, 'charts', 'eventstats', scope='wiki').remove()
 
     def teardown_class(self):
         nuke_page(self.request, self.pagename)
@@ -36,10 +35,8 @@ class TestHits:
     def _cleanStats(self):
         # cleans all involved cache and log files
         nuke_eventlog(self.request)
-        # hits is based on hitcounts which reads the cache
-        caching.CacheEntry(self.request, 'charts', 'hitcounts', scope='wiki').remove()
-        arena = Page(self.request, self.pagename)
-        caching.CacheEntry(self.request, arena, 'hitcounts', scope='item').remove()
+        # hits is based on the event-log counters
+        caching.CacheEntry(self.request, 'charts', 'eventstats', scope='wiki').remove()
 
     def testHitsNoArg(self):
         """ macro Hits test: 'no args for Hits (Hits is executed on current page) """
@@ -3,7 +3,8 @@
     MoinMoin - email helper functions
 
     @copyright: 2003 Juergen Hermann <jh@web.de>,
-                2008-2009 MoinMoin:ThomasWaldmann
+                2008-2009 MoinMoin:ThomasWaldmann,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -67,116 +68,158 @@ def sendmail(request, to, subject, text, mail_from=None):
     @rtype: tuple
     @return: (is_ok, Description of error or OK message)
     """
-    import smtplib, socket
-    from email.message import Message
-    from email.charset import Charset, QP
-    from email.utils import formatdate, make_msgid
-
-    _ = request.getText
-    cfg = request.cfg
-    mail_from = mail_from or cfg.mail_from
-
-    logging.debug("send mail, from: %r, subj: %r" % (mail_from, subject))
-    logging.debug("send mail, to: %r" % (to, ))
-
-    if not to:
-        return (1, _("No recipients, nothing to do"))
-
-    subject = subject.encode(config.charset)
-
-    # Create a text/plain body using CRLF (see RFC2822)
-    text = text.replace(u'\n', u'\r\n')
-    text = text.encode(config.charset)
-
-    # Create a message using config.charset and quoted printable
-    # encoding, which should be supported better by mail clients.
-    # TODO: check if its really works better for major mail clients
-    msg = Message()
-    charset = Charset(config.charset)
-    charset.header_encoding = QP
-    charset.body_encoding = QP
-    msg.set_charset(charset)
-
-    # work around a bug in python 2.4.3 and above:
-    msg.set_payload('=')
-    if msg.as_string().endswith('='):
-        text = charset.body_encode(text)
-
-    msg.set_payload(text)
-
-    # Create message headers
-    # Don't expose emails addreses of the other subscribers, instead we
-    # use the same mail_from, e.g. u"Jrgen Wiki <noreply@mywiki.org>"
-    address = encodeAddress(mail_from, charset)
-    msg['From'] = address
-    msg['To'] = address
-    msg['Date'] = formatdate()
-    msg['Message-ID'] = make_msgid()
-    msg['Subject'] = Header(subject, charset)
-    # See RFC 3834 section 5:
-    msg['Auto-Submitted'] = 'auto-generated'
-
-    if cfg.mail_sendmail:
-        # Set the BCC.  This will be stripped later by sendmail.
-        msg['BCC'] = ','.join(to)
-        # Set Return-Path so that it isn't set (generally incorrectly) for us.
-        msg['Return-Path'] = address
-
-    # Send the message
-    if not cfg.mail_sendmail:
+    mailer = Mailer(request)
+    try:
+        return mailer.send(to, subject, text, mail_from)
+    finally:
+        mailer.close()
+
+
+class Mailer(object):
+    """ Sends mails, using one SMTP connection for all of them
+
+    The connection is opened when the first mail is sent and opened again
+    after an error.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.server = None
+
+    def _connect(self):
+        import smtplib
+        cfg = self.request.cfg
+        logging.debug("trying to send mail (smtp) via smtp server '%s'" % cfg.mail_smarthost)
+        host, port = (cfg.mail_smarthost + ':25').split(':')[:2]
+        server = smtplib.SMTP(host, int(port))
         try:
-            logging.debug("trying to send mail (smtp) via smtp server '%s'" % cfg.mail_smarthost)
-            host, port = (cfg.mail_smarthost + ':25').split(':')[:2]
-            server = smtplib.SMTP(host, int(port))
-            try:
-                #server.set_debuglevel(1)
-                if cfg.mail_login:
-                    user, pwd = cfg.mail_login.split()
-                    try: # try to do tls
+            #server.set_debuglevel(1)
+            if cfg.mail_login:
+                user, pwd = cfg.mail_login.split()
+                try: # try to do tls
+                    server.ehlo()
+                    if server.has_extn('starttls'):
+                        server.starttls()
                         server.ehlo()
-                        if server.has_extn('starttls'):
-                            server.starttls()
-                            server.ehlo()
-                            logging.debug("tls connection to smtp server established")
-                    except:
-                        logging.debug("could not establish a tls connection to smtp server, continuing without tls")
-                    logging.debug("trying to log in to smtp server using account '%s'" % user)
-                    server.login(user, pwd)
-                server.sendmail(mail_from, to, msg.as_string())
-            finally:
-                try:
-                    server.quit()
-                except AttributeError:
-                    # in case the connection failed, SMTP has no "sock" attribute
-                    pass
-        except UnicodeError, e:
-            logging.exception("unicode error [%r -> %r]" % (mail_from, to, ))
-            return (0, str(e))
-        except smtplib.SMTPException, e:
-            logging.exception("smtp mail failed with an exception.")
-            return (0, str(e))
-        except (os.error, socket.error), e:
-            logging.exception("smtp mail failed with an exception.")
-            return (0, _("Connection to mailserver '%(server)s' failed: %(reason)s") % {
-                'server': cfg.mail_smarthost,
-                'reason': str(e)
-            })
-    else:
-        try:
-            logging.debug("trying to send mail (sendmail)")
-            sendmailp = os.popen(cfg.mail_sendmail, "w")
-            # msg contains everything we need, so this is a simple write
-            sendmailp.write(msg.as_string())
-            sendmail_status = sendmailp.close()
-            if sendmail_status:
-                logging.error("sendmail failed with status: %s" % str(sendmail_status))
-                return (0, str(sendmail_status))
+                        logging.debug("tls connection to smtp server established")
+                except:
+                    logging.debug("could not establish a tls connection to smtp server, continuing without tls")
+                logging.debug("trying to log in to smtp server using account '%s'" % user)
+                server.login(user, pwd)
         except:
-            logging.exception("sendmail failed with an exception.")
-            return (0, _("Mail not sent"))
+            self._quit(server)
+            raise
+        return server
 
-    logging.debug("Mail sent OK")
-    return (1, _("Mail sent OK"))
+    def _quit(self, server):
+        try:
+            server.quit()
+        except AttributeError:
+            # in case the connection failed, SMTP has no "sock" attribute
+            pass
+        except Exception, e:
+            logging.debug("closing the smtp connection failed: %s" % str(e))
+
+    def close(self):
+        """ Close the SMTP connection (if any) """
+        if self.server is not None:
+            server, self.server = self.server, None
+            self._quit(server)
+
+    def send(self, to, subject, text, mail_from=None):
+        """ Create and send a text/plain message, see sendmail """
+        import smtplib, socket
+        from email.message import Message
+        from email.charset import Charset, QP
+        from email.utils import formatdate, make_msgid
+
+        request = self.request
+        _ = request.getText
+        cfg = request.cfg
+        mail_from = mail_from or cfg.mail_from
+
+        logging.debug("send mail, from: %r, subj: %r" % (mail_from, subject))
+        logging.debug("send mail, to: %r" % (to, ))
+
+        if not to:
+            return (1, _("No recipients, nothing to do"))
+
+        subject = subject.encode(config.charset)
+
+        # Create a text/plain body using CRLF (see RFC2822)
+        text = text.replace(u'\n', u'\r\n')
+        text = text.encode(config.charset)
+
+        # Create a message using config.charset and quoted printable
+        # encoding, which should be supported better by mail clients.
+        # TODO: check if its really works better for major mail clients
+        msg = Message()
+        charset = Charset(config.charset)
+        charset.header_encoding = QP
+        charset.body_encoding = QP
+        msg.set_charset(charset)
+
+        # work around a bug in python 2.4.3 and above:
+        msg.set_payload('=')
+        if msg.as_string().endswith('='):
+            text = charset.body_encode(text)
+
+        msg.set_payload(text)
+
+        # Create message headers
+        # Don't expose emails addreses of the other subscribers, instead we
+        # use the same mail_from, e.g. u"Jrgen Wiki <noreply@mywiki.org>"
+        address = encodeAddress(mail_from, charset)
+        msg['From'] = address
+        msg['To'] = address
+        msg['Date'] = formatdate()
+        msg['Message-ID'] = make_msgid()
+        msg['Subject'] = Header(subject, charset)
+        # See RFC 3834 section 5:
+        msg['Auto-Submitted'] = 'auto-generated'
+
+        if cfg.mail_sendmail:
+            # Set the BCC.  This will be stripped later by sendmail.
+            msg['BCC'] = ','.join(to)
+            # Set Return-Path so that it isn't set (generally incorrectly) for us.
+            msg['Return-Path'] = address
+
+        # Send the message
+        if not cfg.mail_sendmail:
+            try:
+                if self.server is None:
+                    self.server = self._connect()
+                self.server.sendmail(mail_from, to, msg.as_string())
+            except UnicodeError, e:
+                logging.exception("unicode error [%r -> %r]" % (mail_from, to, ))
+                return (0, str(e))
+            except smtplib.SMTPException, e:
+                logging.exception("smtp mail failed with an exception.")
+                self.close()
+                return (0, str(e))
+            except (os.error, socket.error), e:
+                logging.exception("smtp mail failed with an exception.")
+                self.close()
+                return (0, _("Connection to mailserver '%(server)s' failed: %(reason)s") % {
+                    'server': cfg.mail_smarthost,
+                    'reason': str(e)
+                })
+        else:
+            try:
+                logging.debug("trying to send mail (sendmail)")
+                sendmailp = os.popen(cfg.mail_sendmail, "w")
+                # msg contains everything we need, so this is a simple write
+                sendmailp.write(msg.as_string())
+                sendmail_status = sendmailp.close()
+                if sendmail_status:
+                    logging.error("sendmail failed with status: %s" % str(sendmail_status))
+                    return (0, str(sendmail_status))
+            except:
+                logging.exception("sendmail failed with an exception.")
+                return (0, _("Mail not sent"))
+
+        logging.debug("Mail sent OK")
+        return (1, _("Mail sent OK"))
 
 def encodeSpamSafeEmail(email_address, obfuscation_text=''):
     """ Encodes a standard email address to an obfuscated address
@@ -0,0 +1,123 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - page name index
+
+    Index of all page names of a wiki for the LikePages action and macro
+    (the latter is on every "page not found" page, so it is used a lot by
+    spiders). Instead of scanning all page names for every request, it finds
+
+     * page names starting or ending with some string (binary search in the
+       sorted names and in the sorted reversed names)
+     * page names similar to some name (the same difflib.get_close_matches
+       finds, but only comparing the names sharing enough characters for
+       the quick_ratio upper bound of their similarity to reach the cutoff)
+
+    The index is kept in the 'pagelists' item cache next to the page list it
+    is built from, so it gets rebuilt whenever the page list changes.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import bisect
+import difflib
+import heapq
+
+MAX_CLOSE_MATCHES = 100 # we never need more than that
+CACHE_KEY = 'nameindex2' # change it when PageNameIndex changes (the cache might be shared)
+
+
+def char_counts(name):
+    """ Return dict character -> number of times it occurs in name """
+    counts = {}
+    for char in name:
+        counts[char] = counts.get(char, 0) + 1
+    return counts
+
+
+class PageNameIndex(object):
+    """ Page names sorted forwards and backwards, plus an index of the
+        characters of the lowercased names.
+    """
+
+    def __init__(self, pagenames):
+        self.names = sorted(pagenames)
+        self.reversed_names = sorted([name[::-1] for name in self.names])
+        # pages might have the same name with different case (although that's stupid)
+        self.lower_names = {}
+        for name in self.names:
+            self.lower_names.setdefault(name.lower(), []).append(name)
+        self.lower = sorted(self.lower_names.keys())
+        self.lengths = [len(name) for name in self.lower]
+        self.chars = {} # character -> list of (index into lower, count)
+        for i, name in enumerate(self.lower):
+            for char, count in char_counts(name).iteritems():
+                self.chars.setdefault(char, []).append((i, count))
+
+    def startswith(self, prefix):
+        """ Return the page names starting with prefix (sorted) """
+        names = self.names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def endswith(self, suffix):
+        """ Return the page names ending with suffix """
+        reversed_names = self.reversed_names
+        prefix = suffix[::-1]
+        i = bisect.bisect_left(reversed_names, prefix)
+        result = []
+        while i < len(reversed_names) and reversed_names[i].startswith(prefix):
+            result.append(reversed_names[i][::-1])
+            i += 1
+        return result
+
+    def close_matches(self, name, n=MAX_CLOSE_MATCHES, cutoff=0.6):
+        """ Return the page names similar to name (case insensitive), the
+            most similar first (the order difflib.get_close_matches uses).
+
+        @param name: page name to match
+        @param n: maximum number of lowercased names to find
+        @param cutoff: minimum similarity (see difflib.SequenceMatcher.ratio)
+        @rtype: list
+        @return: page names (might be more than n, if pages differ only in case)
+        """
+        word = name.lower()
+        # count the characters each name shares with word (names sharing
+        # none have ratio 0), SequenceMatcher.quick_ratio uses that count
+        # for an upper bound of ratio, so this can not miss a match
+        shared = {}
+        for char, count in char_counts(word).iteritems():
+            for i, name_count in self.chars.get(char, ()):
+                shared[i] = shared.get(i, 0) + min(count, name_count)
+        s = difflib.SequenceMatcher()
+        s.set_seq2(word)
+        scored = []
+        for i, matches in shared.iteritems():
+            if 2.0 * matches / (len(word) + self.lengths[i]) < cutoff:
+                continue
+            x = self.lower[i]
+            s.set_seq1(x)
+            score = s.ratio()
+            if score >= cutoff:
+                scored.append((score, x))
+        result = []
+        for score, x in heapq.nlargest(n, scored):
+            result.extend(self.lower_names[x])
+        return result
+
+
+def get_index(request):
+    """ Return the PageNameIndex of all pages (including deleted pages and
+        pages the user may not read).
+    """
+    pagelists = request.cfg.cache.pagelists
+    index = pagelists.getItem(request, 'all', CACHE_KEY)
+    if index is None:
+        request.clock.start('pagenameindex')
+        index = PageNameIndex(request.rootpage.getPageList(user='', exists=''))
+        pagelists.putItem(request, 'all', CACHE_KEY, index)
+        request.clock.stop('pagenameindex')
+    return index
@@ -0,0 +1,94 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.parser.highlight Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin import caching
+from MoinMoin.Page import Page
+from MoinMoin.parser import highlight
+from MoinMoin.formatter.text_html import Formatter as HtmlFormatter
+
+PAGENAME = u'ThisPageDoesNotExistsAndWillNeverBeReally'
+
+CODE = u"""def foo(bar):
+    return bar < 1 # "comment"
+"""
+
+
+class TestHighlightCache:
+
+    def setup_method(self, method):
+        self.request.cfg.cache.highlight = highlight.HighlightCache(size=2)
+
+    def teardown_method(self, method):
+        for key in caching.get_cache_list(self.request, 'highlight', 'wiki'):
+            caching.CacheEntry(self.request, 'highlight', key, scope='wiki').remove()
+
+    def parse(self, code, format_args='python'):
+        request = self.request
+        request.reset()
+        page = Page(request, PAGENAME)
+        page.hilite_re = None
+        page.set_raw_body(code)
+        formatter = HtmlFormatter(request)
+        formatter.setPage(page)
+        page.formatter = formatter
+        request.page = page
+        request.formatter = formatter
+        parser = highlight.Parser(code, request, format_args=format_args)
+        formatter.startContent('') # needed for _include_stack init
+        output = request.redirectedOutput(parser.format, formatter)
+        formatter.endContent('')
+        return output
+
+    def testSameOutput(self):
+        """ highlight: cached lines give the same output """
+        cache = self.request.cfg.cache.highlight
+        first = self.parse(CODE)
+        assert cache.requests == 1 and cache.hits == 0
+        assert self.parse(CODE) == first
+        assert cache.hits == 1
+        assert '<span class="ResWord">def</span>' in first
+        assert '&lt;' in first
+        # from disk, as a new process would do it
+        self.request.cfg.cache.highlight = highlight.HighlightCache()
+        assert self.parse(CODE) == first
+
+    def testKey(self):
+        """ highlight: the cache key contains the lexer and line numbers still work """
+        python = self.parse(CODE)
+        text = self.parse(CODE, 'text')
+        assert '<span class="ResWord">def</span>' not in text
+        numbered = self.parse(CODE, 'python start=10')
+        assert 'line-10' in numbered and 'line-10' not in python
+        assert self.request.cfg.cache.highlight.hits == 1
+
+    def testLRU(self):
+        """ highlight: only the most recently used blocks are kept in memory """
+        cache = self.request.cfg.cache.highlight
+        for i in range(3):
+            self.parse(CODE + u'# %d\n' % i)
+        assert len(cache.lines) == 2
+
+    def testDiskLimit(self):
+        """ highlight: the least recently used blocks are removed from disk """
+        cfg = self.request.cfg
+        saved_size = cfg.highlight_cache_size
+        try:
+            self.parse(CODE)
+            cache = self.request.cfg.cache.highlight
+            entry_size = cache.disk_size
+            cfg.highlight_cache_size = entry_size * 4
+            for i in range(10):
+                self.parse(CODE + u'# %d\n' % i)
+            total, entries = caching.get_arena_entries(self.request, cache.arena, 'wiki')
+            assert total <= cfg.highlight_cache_size
+            assert 1 < len(entries) <= 4
+        finally:
+            cfg.highlight_cache_size = saved_size
+
+
+coverage_modules = ['MoinMoin.parser.highlight']
@@ -2,11 +2,21 @@
 """
     MoinMoin - highlighting parser using the Pygments highlighting library
 
-    @copyright: 2008 Radomir Dopieralski <moindev@sheep.art.pl>
+    The highlighted lines of a code block only depend on the code and the
+    lexer, so they are kept in a per-process LRU cache and on disk (cache
+    arena 'highlight', limited to cfg.highlight_cache_size), keyed by the
+    SHA1 of the code. The code area around
+    them (line numbers, anchors and the user dependent "Toggle line numbers"
+    link) is created for every view.
+
+    @copyright: 2008 Radomir Dopieralski <moindev@sheep.art.pl>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 import hashlib
 import re
+import threading
+from collections import OrderedDict
 
 import pygments
 import pygments.util
@@ -14,12 +24,17 @@ import pygments.lexers
 import pygments.formatter
 from pygments.token import Token
 
-from MoinMoin import config, wikiutil
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching, config, wikiutil
 from MoinMoin.parser import parse_start_step
 from MoinMoin.Page import Page
 
 Dependencies = ['user'] # the "Toggle line numbers link" depends on user's language
 
+HIGHLIGHT_CACHE_SIZE = 200 # code blocks kept in memory per process
+
 
 def extensions_from_lexer_filenames(filenames):
     # pygment's lexer.filenames is like ['*.py', 'Python'], but we only want
@@ -36,6 +51,19 @@ def extensions_for_all_lexers():
     return extensions
 
 
+class LexerExtensions(object):
+    """ Parser.extensions, determined on first access (not on import,
+        as most processes never need it, see wikiutil.getParserRegistry)
+    """
+    def __init__(self):
+        self.extensions = None
+
+    def __get__(self, obj, cls):
+        if self.extensions is None:
+            self.extensions = extensions_for_all_lexers()
+        return self.extensions
+
+
 class PygmentsFormatter(pygments.formatter.Formatter):
     """ a formatter for Pygments that uses the moin formatter for creating output """
     line_re = re.compile(r'(\n)')
@@ -102,16 +130,26 @@ class PygmentsFormatter(pygments.formatter.Formatter):
         self.result += line_parts
         self.result.append(fmt.code_line(0))
 
+    def add_lines(self, lines):
+        """ Add highlighted lines (see highlighted_lines) """
+        self.lineno = self.start_line
+        for line in lines:
+            self.add_next_line([line])
+
     def format(self, tokensource, outfile):
+        self.add_lines(self.highlighted_lines(tokensource))
+
+    def highlighted_lines(self, tokensource):
+        """ Return the formatted content of the lines (without line anchors) """
         fmt = self.formatter
-        self.lineno = self.start_line
+        lines = []
         line_parts = []
         for ttype, value in tokensource:
             class_ = self.get_class(ttype)
             if value:
                 for line in self.line_re.split(value):
                     if line == '\n':
-                        self.add_next_line(line_parts)
+                        lines.append(u''.join(line_parts))
                         line_parts = []
                         continue
                     if class_:
@@ -120,13 +158,97 @@ class PygmentsFormatter(pygments.formatter.Formatter):
                     if class_:
                         line_parts.append(fmt.code_token(0, class_))
         if line_parts and line_parts != [u'']: # Don't output an empty line at the end.
-            self.add_next_line(line_parts)
+            lines.append(u''.join(line_parts))
+        return lines
+
+
+class HighlightCache(object):
+    """ The highlighted lines of recently used code blocks (cfg.cache.highlight)
+
+    Kept in memory for the HIGHLIGHT_CACHE_SIZE most recently used keys and
+    on disk, as long as the entries are smaller than cfg.highlight_cache_size
+    (the mtime of an entry is its last use, the least recently used ones get
+    removed). As the key contains the hash of the code, the entries never
+    get invalid.
+    """
+    name = 'highlight'
+    arena = 'highlight'
+
+    def __init__(self, size=HIGHLIGHT_CACHE_SIZE):
+        self.size = size
+        self.lines = OrderedDict() # key -> lines, least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.requests = 0
+        self.disk_size = None # size of the disk entries, as far as we know
+
+    def _entry(self, request, key):
+        return caching.CacheEntry(request, self.arena, key, scope='wiki', use_pickle=True)
+
+    def get(self, request, key):
+        """ Return the cached lines for key or None """
+        self.lock.acquire()
+        try:
+            self.requests += 1
+            lines = self.lines.pop(key, None)
+            if lines is not None:
+                self.lines[key] = lines
+                self.hits += 1
+                return lines
+        finally:
+            self.lock.release()
+        if not request.cfg.highlight_cache_size:
+            return None
+        entry = self._entry(request, key)
+        try:
+            lines = entry.content()
+        except caching.CacheError:
+            return None
+        entry.touch() # remember the use for eviction
+        self._remember(key, lines)
+        return lines
+
+    def put(self, request, key, lines):
+        self._remember(key, lines)
+        max_size = request.cfg.highlight_cache_size
+        if not max_size:
+            return
+        entry = self._entry(request, key)
+        try:
+            entry.update(lines)
+        except caching.CacheError, err:
+            logging.warning("can't store highlighted code %s: %s" % (key, str(err)))
+            return
+        if self.disk_size is None:
+            self.disk_size = caching.get_arena_entries(request, self.arena, 'wiki')[0]
+        else:
+            self.disk_size += entry.size()
+        if self.disk_size > max_size:
+            self.disk_size = caching.evict_arena(request, self.arena, 'wiki', max_size)
+
+    def _remember(self, key, lines):
+        self.lock.acquire()
+        try:
+            self.lines.pop(key, None)
+            self.lines[key] = lines
+            while len(self.lines) > self.size:
+                self.lines.popitem(last=False)
+        finally:
+            self.lock.release()
+
+
+def highlight_cache(request):
+    """ Return the HighlightCache of the wiki """
+    cache = getattr(request.cfg.cache, 'highlight', None)
+    if cache is None:
+        cache = request.cfg.cache.highlight = HighlightCache()
+    return cache
 
 
 class Parser:
     parsername = "highlight"  # compatibility wrappers override this with the pygments lexer name
     Dependencies = Dependencies
-    extensions = extensions_for_all_lexers()
+    extensions = LexerExtensions()
 
     def __init__(self, raw, request, filename=None, format_args='', **kw):
         self.request = request
@@ -183,8 +305,22 @@ class Parser:
                 lexer = pygments.lexers.TextLexer()
 
         fmt.result.append(formatter.code_area(1, self._code_id, self.parsername, self.show_nums, self.num_start, self.num_step, msg))
-        pygments.highlight(self.raw, lexer, fmt)
+        fmt.add_lines(self._highlighted_lines(formatter, fmt, lexer))
         fmt.result.append(formatter.code_area(0, self._code_id))
         fmt.result.append(formatter.div(0))
         self.request.write("".join(fmt.result))
 
+    def _highlighted_lines(self, formatter, fmt, lexer):
+        from MoinMoin.formatter.text_html import Formatter
+        if formatter.__class__ is not Formatter or formatter._highlight_re:
+            # other formatters might depend on their state
+            return fmt.highlighted_lines(lexer.get_tokens(self.raw))
+        cache = highlight_cache(self.request)
+        key = hashlib.new('sha1', repr((self._code_id, lexer.__class__.__module__,
+                                        lexer.__class__.__name__, lexer.options,
+                                        formatter._in_code, pygments.__version__))).hexdigest()
+        lines = cache.get(self.request, key)
+        if lines is None:
+            lines = fmt.highlighted_lines(lexer.get_tokens(self.raw))
+            cache.put(self.request, key, lines)
+        return lines
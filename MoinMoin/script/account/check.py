@@ -69,6 +69,10 @@ General syntax: moin [options] account check [check-options]
     5. Optionally you may want to make wikinames out of the user names
        moin ... account check --wikinames
        moin ... account check --wikinames --save
+
+    6. If you have modified user profiles on disk (not using moin), rebuild
+       the cache used for looking up users by name, email, etc.:
+       moin ... account check --lookupcache
 """
 
     def __init__(self, argv, def_values):
@@ -95,6 +99,9 @@ General syntax: moin [options] account check [check-options]
         self._addFlag("removepasswords",
             "Remove pre-1.1 cleartext passwords from accounts."
         )
+        self._addFlag("lookupcache",
+            "Rebuild the user lookup cache from all user profiles."
+        )
 
     def _addFlag(self, name, help):
         self.parser.add_option("--" + name,
@@ -210,7 +217,8 @@ General syntax: moin [options] account check [check-options]
         flags_given = (self.options.usersunique
                     or self.options.emailsunique
                     or self.options.wikinames
-                    or self.options.removepasswords)
+                    or self.options.removepasswords
+                    or self.options.lookupcache)
 
         # no option given ==> show usage
         if not flags_given:
@@ -219,6 +227,9 @@ General syntax: moin [options] account check [check-options]
 
         self.init_request()
 
+        if self.options.lookupcache:
+            user.rebuildLookupCaches(self.request)
+
         self.users = {} # uid : UserObject
         self.names = {} # name : [uid, uid, uid]
         self.emails = {} # email : [uid, uid, uid]
@@ -0,0 +1,35 @@
+# -*- coding: iso-8859-1 -*-
+"""
+MoinMoin - cli metrics script
+
+@copyright: 2026 by the MoinMoin project
+@license: GNU GPL, see COPYING for details.
+"""
+
+import sys
+
+from MoinMoin.script import MoinScript
+from MoinMoin.util import metrics
+
+class PluginScript(MoinScript):
+    """\
+Purpose:
+========
+Show the request timing histograms and item cache hit ratios the wiki
+server processes stored (every cfg.metrics_interval seconds), merged and
+in the Prometheus text format (like action=metrics does).
+
+Detailed Instructions:
+======================
+General syntax: moin [options] cli metrics
+
+[options] usually should be:
+    --config-dir=/path/to/my/cfg/ --wiki-url=http://wiki.example.org/
+"""
+
+    def __init__(self, argv, def_values):
+        MoinScript.__init__(self, argv, def_values)
+
+    def mainloop(self):
+        self.init_request()
+        sys.stdout.write(metrics.report(self.request))
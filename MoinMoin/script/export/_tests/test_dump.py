@@ -0,0 +1,104 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.script.export.dump Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import shutil
+import tempfile
+
+from MoinMoin import wikiutil
+from MoinMoin.script.export import dump
+from MoinMoin._tests import become_trusted, create_page, append_page, nuke_page
+
+PREFIX = u'AutoCreatedMoinMoinTemporaryTestPageDump'
+
+
+class TestIncrementalDump:
+    plain = PREFIX + u'Plain'
+    included = PREFIX + u'Included'
+    includer = PREFIX + u'Includer'
+    pattern_includer = PREFIX + u'PatternIncluder'
+    matched = PREFIX + u'Matched1'
+    new_match = PREFIX + u'Matched2'
+    dynamic = PREFIX + u'Dynamic'
+
+    def setup_method(self, method):
+        become_trusted(self.request)
+        self.outputdir = tempfile.mkdtemp()
+        self.saved_url = self.request.url
+        create_page(self.request, self.plain, u"plain text\n")
+        create_page(self.request, self.included, u"included text\n")
+        create_page(self.request, self.includer, u"<<Include(%s)>>\n" % self.included)
+        create_page(self.request, self.pattern_includer, u"<<Include(^%sMatched)>>\n" % PREFIX)
+        create_page(self.request, self.matched, u"matched text\n")
+        create_page(self.request, self.dynamic, u"<<DateTime>>\n")
+        self.pages = sorted([self.plain, self.included, self.includer,
+                             self.pattern_includer, self.matched, self.dynamic])
+        self.dump()
+
+    def teardown_method(self, method):
+        self.request.url = self.saved_url
+        become_trusted(self.request)
+        for pagename in self.pages + [self.new_match]:
+            nuke_page(self.request, pagename)
+        shutil.rmtree(self.outputdir, ignore_errors=True)
+
+    def dump(self):
+        """ Dump self.pages incrementally, return the names of the rendered pages """
+        for pagename in self.pages:
+            try:
+                os.utime(self.filename(pagename), (1, 1))
+            except OSError:
+                pass
+        errlog = file(os.path.join(self.outputdir, 'error.log'), 'w')
+        try:
+            errcnt = dump.dump_pages(self.request, self.pages, self.outputdir, '', None, errlog,
+                                     incremental=True)
+        finally:
+            errlog.close()
+        assert errcnt == 0
+        return set([pagename for pagename in self.pages
+                    if os.path.getmtime(self.filename(pagename)) != 1])
+
+    def filename(self, pagename):
+        return os.path.join(self.outputdir, wikiutil.quoteWikinameURL(pagename))
+
+    def testManifest(self):
+        manifest = dump.load_manifest(self.outputdir, None)
+        assert sorted(manifest) == self.pages
+        assert manifest[self.plain][0] == dump.page_state(self.request, self.plain)
+        assert manifest[self.dynamic][1]['dynamic']
+        assert dump.load_manifest(self.outputdir, u'OtherUser') == {}
+
+    def testUnchanged(self):
+        assert self.dump() == set([self.dynamic])
+
+    def testChangedPage(self):
+        append_page(self.request, self.plain, u"more text")
+        assert self.dump() == set([self.plain, self.dynamic])
+
+    def testChangedIncludedPage(self):
+        append_page(self.request, self.included, u"more included text")
+        assert self.dump() == set([self.included, self.includer, self.dynamic])
+
+    def testChangedPatternMatch(self):
+        create_page(self.request, self.new_match, u"new matching page\n")
+        assert self.dump() == set([self.pattern_includer, self.dynamic])
+
+    def testDeletedPage(self):
+        attachments = os.path.join(self.outputdir, 'attachments', wikiutil.quoteWikinameFS(self.plain))
+        os.makedirs(attachments)
+        file(os.path.join(attachments, 'some.txt'), 'w').close()
+        nuke_page(self.request, self.plain)
+        self.pages.remove(self.plain)
+        self.dump()
+        assert not os.path.exists(self.filename(self.plain))
+        assert not os.path.exists(attachments)
+        assert self.plain not in dump.load_manifest(self.outputdir, None)
+
+
+coverage_modules = ['MoinMoin.script.export.dump']
@@ -0,0 +1,114 @@
+# -*- coding: iso-8859-1 -*-
+"""
+MoinMoin - Backup a MoinMoin wiki into a (incremental) tar file
+
+@copyright: 2026 by the MoinMoin project
+@license: GNU GPL, see COPYING for details.
+"""
+
+import sys
+
+from MoinMoin import script
+from MoinMoin.action.backup import readManifest, writeBackup
+from MoinMoin.util.pgzip import ParallelGzipFile
+
+
+class PluginScript(script.MoinScript):
+    """\
+Purpose:
+========
+This tool makes the same backup as the backup action (the files configured
+by backup_include and backup_exclude), but does not tie up a web server
+worker for it and can compress with multiple threads.
+
+Detailed Instructions:
+======================
+General syntax: moin [options] export backup [backup-options]
+
+[options] usually should be:
+    --config-dir=/path/to/my/cfg/ --wiki-url=http://wiki.example.org/
+
+[backup-options] see below:
+    0. You must run this script as owner of the wiki files, usually this is the
+       web server user.
+
+    1. To write a full backup to 'full.tar.gz' and its manifest (also
+       contained in the tar file as MoinMoin-backup-manifest.txt) to 'full.manifest':
+       moin ... export backup --target=full.tar.gz --manifest=full.manifest
+
+    2. To write an incremental backup with the files changed since the
+       backup of 'full.manifest' to 'incr.tar.gz', using 4 compressing threads:
+       moin ... export backup --target=incr.tar.gz --since=full.manifest --threads=4
+
+       Files with the same size and mtime as in the old manifest are not
+       read again. The manifest of an incremental backup lists all files, so
+       you can see which files got deleted and use it for the next
+       incremental backup.
+
+    The compression is taken from backup_compression (gz or bz2), multiple
+    threads are only used for gz.
+"""
+
+    def __init__(self, argv=None, def_values=None):
+        script.MoinScript.__init__(self, argv, def_values)
+        self.parser.add_option(
+            "-t", "--target", dest = "target",
+            help = "Write the backup to FILE [default: stdout]"
+        )
+        self.parser.add_option(
+            "--since", metavar = "MANIFEST", dest = "since",
+            help = "Only backup files changed since the backup of MANIFEST"
+        )
+        self.parser.add_option(
+            "--manifest", metavar = "FILE", dest = "manifest",
+            help = "Also write the manifest of the backup to FILE"
+        )
+        self.parser.add_option(
+            "--threads", metavar = "N", dest = "threads", type = "int", default = 1,
+            help = "Number of compressing threads (default: 1, 0: number of CPUs)"
+        )
+
+    def mainloop(self):
+        self.init_request()
+        request = self.request
+        compression = request.cfg.backup_compression
+
+        base = None
+        if self.options.since:
+            f = open(self.options.since, 'rb')
+            try:
+                try:
+                    base = readManifest(f)
+                except ValueError, err:
+                    script.fatal("%s is not a backup manifest (%s)" % (self.options.since, err))
+            finally:
+                f.close()
+
+        threads = self.options.threads
+        if threads == 0:
+            import multiprocessing
+            threads = multiprocessing.cpu_count()
+
+        if self.options.target:
+            output = open(self.options.target, 'wb')
+        else:
+            output = sys.stdout
+        if compression == 'gz' and threads > 1:
+            fileobj = ParallelGzipFile(output, threads)
+            mode = 'w|'
+        else:
+            fileobj = output
+            mode = 'w|%s' % compression
+        count, added, manifest = writeBackup(request, fileobj, mode, base)
+        if fileobj is not output:
+            fileobj.close()
+        if output is not sys.stdout:
+            output.close()
+
+        if self.options.manifest:
+            f = open(self.options.manifest, 'wb')
+            try:
+                f.write(manifest)
+            finally:
+                f.close()
+        script.log("%d files, %d of them in the backup." % (count, added))
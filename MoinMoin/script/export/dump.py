@@ -3,19 +3,22 @@
 MoinMoin - Dump a MoinMoin wiki to static pages
 
 @copyright: 2002-2004 Juergen Hermann <jh@web.de>,
-            2005-2006 MoinMoin:ThomasWaldmann
+            2005-2006 MoinMoin:ThomasWaldmann,
+            2026 by the MoinMoin project
 @license: GNU GPL, see COPYING for details.
 """
 
-import sys, os, time, codecs, shutil, re, errno
+import sys, os, time, shutil, re, errno, tempfile, traceback
 
-from MoinMoin import config, wikiutil, Page, user
+from MoinMoin import config, fragmentcache, wikiutil, Page, user
 from MoinMoin import script
 from MoinMoin.action import AttachFile
+from MoinMoin.util import filesys, pickle, PICKLE_PROTOCOL
 
 url_prefix_static = "."
 logo_html = '<img src="logo.png">'
 HTML_SUFFIX = ".html"
+MANIFEST = ".moin-dump-manifest" # what the last dump contains, for --incremental
 
 page_template = u'''<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01//EN" "http://www.w3.org/TR/html4/strict.dtd">
 <html>
@@ -67,6 +70,30 @@ td.noborder {
 '''
 
 
+def _write_atomic(dest_file, write):
+    """ Call write(fileobj) for a temporary file and rename it to dest_file,
+        so readers of dest_file never see a half written file.
+    """
+    dest_dir = os.path.dirname(dest_file)
+    fd, tmp_file = tempfile.mkstemp('.tmp', '.dump', dest_dir)
+    try:
+        f = os.fdopen(fd, 'wb')
+        try:
+            write(f)
+        finally:
+            f.close()
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_file, 0666 & ~umask) # fix mode that mkstemp chose
+        filesys.rename(tmp_file, dest_file)
+    except:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+
 def _attachment(request, pagename, filename, outputdir, **kw):
     filename = filename.encode(config.charset)
     source_dir = AttachFile.getAttachDir(request, pagename)
@@ -78,18 +105,251 @@ def _attachment(request, pagename, filename, outputdir, **kw):
         if not os.access(dest_dir, os.F_OK):
             try:
                 os.makedirs(dest_dir)
-            except:
-                script.fatal("Cannot create attachment directory '%s'" % dest_dir)
+            except OSError, err:
+                if err.errno != errno.EEXIST: # maybe another worker process created it
+                    script.fatal("Cannot create attachment directory '%s'" % dest_dir)
         elif not os.path.isdir(dest_dir):
             script.fatal("'%s' is not a directory" % dest_dir)
 
-        shutil.copyfile(source_file, dest_file)
-        script.log('Writing "%s"...' % dest_url)
+        source_stat = os.stat(source_file)
+        try:
+            dest_stat = os.stat(dest_file)
+        except OSError:
+            dest_stat = None
+        if (dest_stat is None or dest_stat.st_size != source_stat.st_size or
+            dest_stat.st_mtime != source_stat.st_mtime):
+            def copy(f):
+                source = open(source_file, 'rb')
+                try:
+                    shutil.copyfileobj(source, f)
+                finally:
+                    source.close()
+            _write_atomic(dest_file, copy)
+            shutil.copystat(source_file, dest_file) # the mtime tells the next dump it is current
+            script.log('Writing "%s"...' % dest_url)
         return dest_url
     else:
         return ""
 
 
+def page_state(request, pagename):
+    """ Return what the dump of page pagename depends on: its revision and
+        the mtimes of its attachments.
+    """
+    page = Page.Page(request, pagename)
+    attachments = {}
+    attach_dir = AttachFile.getAttachDir(request, pagename)
+    try:
+        filenames = os.listdir(attach_dir)
+    except OSError:
+        filenames = []
+    for filename in filenames:
+        try:
+            attachments[filename] = os.stat(os.path.join(attach_dir, filename)).st_mtime
+        except OSError:
+            pass
+    return page.get_real_rev(), attachments
+
+
+def matching_pages(pattern, pagenames):
+    """ Return the names in pagenames matching pattern (like Include does) """
+    try:
+        regex = re.compile(pattern)
+    except re.error:
+        return None
+    return [pagename for pagename in pagenames if regex.match(pagename)]
+
+
+def page_dependencies(fragment, all_pages):
+    """ Return what the output of a page depends on besides page_state: the
+        pages it included (with their revisions), the pages matching the
+        page name patterns it included and whether it used dynamic macros.
+
+    @param fragment: fragmentcache.Fragment recorded while rendering the page
+    @param all_pages: names of all pages of the wiki
+    """
+    patterns = dict([(pattern, matching_pages(pattern, all_pages)) for pattern in fragment.patterns])
+    return {'pages': fragment.pages, 'patterns': patterns, 'dynamic': not fragment.cacheable}
+
+
+def dependencies_unchanged(request, dependencies, all_pages):
+    """ Is the output of a page still current regarding its dependencies
+        (see page_dependencies)?
+    """
+    if dependencies['dynamic']:
+        return False
+    for pagename, (rev, exists) in dependencies['pages'].items():
+        pagefile, current_rev, current_exists = Page.Page(request, pagename).get_rev()
+        if (current_rev, bool(current_exists)) != (rev, exists):
+            return False
+    for pattern, pagenames in dependencies['patterns'].items():
+        if matching_pages(pattern, all_pages) != pagenames:
+            return False
+    return True
+
+
+def load_manifest(outputdir, dump_user):
+    """ Return dict pagename -> (page_state, page_dependencies) of the last dump
+        (made by the same user)
+    """
+    try:
+        f = open(os.path.join(outputdir, MANIFEST), 'rb')
+        try:
+            manifest = pickle.load(f)
+        finally:
+            f.close()
+    except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+        return {}
+    if manifest.get('user') != dump_user:
+        return {} # other user, other ACLs
+    return manifest['pages']
+
+
+def save_manifest(outputdir, dump_user, pages):
+    _write_atomic(os.path.join(outputdir, MANIFEST),
+                  lambda f: pickle.dump({'user': dump_user, 'pages': pages}, f, PICKLE_PROTOCOL))
+
+
+def dump_page(request, pagename, outputdir, navibar_html, urlbase):
+    """ Render page pagename into its html file in outputdir
+
+    @return: (pagename, error text or None, fragmentcache.Fragment with the
+             dependencies of the page)
+    """
+    # we have the same name in URL and FS
+    file = wikiutil.quoteWikinameURL(pagename)
+    script.log('Writing "%s"...' % file)
+    pagehtml = ''
+    error = None
+    request.url = urlbase + pagename # add current pagename to url base
+    page = Page.Page(request, pagename)
+    request.page = page
+    fragment = fragmentcache.Fragment()
+    try:
+        request.reset()
+        # record the dependencies of the page like for a fragment
+        request._fragments = [fragment]
+        pagehtml = request.redirectedOutput(page.send_page, count_hit=0, content_only=1)
+    except:
+        print >> sys.stderr, "*** Caught exception while writing page!"
+        error = "%s\n%s\n%s" % ("~" * 78, file, traceback.format_exc())
+    request._fragments = []
+    timestamp = time.strftime("%Y-%m-%d %H:%M")
+    html = page_template % {
+        'charset': config.charset,
+        'pagename': pagename,
+        'pagehtml': pagehtml,
+        'logo_html': logo_html,
+        'navibar_html': navibar_html,
+        'timestamp': timestamp,
+        'theme': request.cfg.theme_default,
+    }
+    _write_atomic(os.path.join(outputdir, file), lambda f: f.write(html.encode(config.charset)))
+    return pagename, error, fragment
+
+
+_worker = None
+
+def init_worker(url, pagename, dump_user, outputdir, navibar_html):
+    """ Create the request used by a worker process (the output url and
+        attachment hooks of the parent process are inherited).
+    """
+    global _worker
+    from MoinMoin.web.contexts import ScriptContext
+    request = ScriptContext(url, pagename)
+    request.script_root = url_prefix_static
+    request.user = user.User(request, name=dump_user)
+    _worker = request, outputdir, navibar_html, request.url
+
+def dump_page_worker(pagename):
+    request, outputdir, navibar_html, urlbase = _worker
+    return dump_page(request, pagename, outputdir, navibar_html, urlbase)
+
+
+def remove_page_files(outputdir, pagename):
+    """ Remove the html file and the attachments of page pagename from a dump """
+    try:
+        os.remove(os.path.join(outputdir, wikiutil.quoteWikinameURL(pagename)))
+    except OSError:
+        pass
+    shutil.rmtree(os.path.join(outputdir, "attachments", wikiutil.quoteWikinameFS(pagename)),
+                  ignore_errors=True)
+
+
+def dump_pages(request, pages, outputdir, navibar_html, dump_user, errlog,
+               incremental=False, always=(), remove_deleted=True,
+               processes=1, wiki_url=None, page_option=''):
+    """ Render pages into outputdir and update the manifest there
+
+    @param pages: sorted names of the pages to dump
+    @param errlog: file the errors of the pages get written to
+    @param incremental: only render the pages that changed since the last dump
+    @param always: names of the pages rendered even if they did not change
+    @param remove_deleted: remove the files of the pages of the last dump
+                           not in pages (i.e. pages is the whole wiki)
+    @param processes: number of worker processes, 0: number of CPUs
+    @param wiki_url, page_option: --wiki-url and --page for the workers
+    @return: number of errors
+    """
+    old_manifest = load_manifest(outputdir, dump_user)
+    manifest = {}
+    if remove_deleted:
+        # only keep the pages we still dump
+        dumped = set(pages)
+        for pagename in old_manifest:
+            if pagename in dumped:
+                manifest[pagename] = old_manifest[pagename]
+            else:
+                remove_page_files(outputdir, pagename)
+    else:
+        manifest.update(old_manifest)
+    all_pages = request.rootpage.getPageList(user='')
+    all_pages.sort()
+    always = set(always)
+    states = {}
+    todo = []
+    for pagename in pages:
+        states[pagename] = page_state(request, pagename)
+        old = old_manifest.get(pagename)
+        if not (incremental and pagename not in always and
+                old is not None and len(old) == 2 and old[0] == states[pagename] and
+                dependencies_unchanged(request, old[1], all_pages) and
+                os.path.exists(os.path.join(outputdir, wikiutil.quoteWikinameURL(pagename)))):
+            todo.append(pagename)
+    script.log("%d of %d pages need to be rendered" % (len(todo), len(pages)))
+
+    if processes <= 0:
+        try:
+            import multiprocessing
+            processes = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            processes = 1
+    processes = min(processes, len(todo)) or 1
+
+    urlbase = request.url # save wiki base url
+    if processes == 1:
+        results = (dump_page(request, pagename, outputdir, navibar_html, urlbase) for pagename in todo)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes, init_worker,
+                                    (wiki_url, page_option, dump_user, outputdir, navibar_html))
+        results = pool.imap_unordered(dump_page_worker, todo, chunksize=8)
+
+    errcnt = 0
+    for pagename, error, fragment in results:
+        if error is None:
+            manifest[pagename] = states[pagename], page_dependencies(fragment, all_pages)
+        else:
+            errcnt = errcnt + 1
+            manifest.pop(pagename, None) # render it again next time
+            print >> errlog, error
+    if processes > 1:
+        pool.close()
+        pool.join()
+    save_manifest(outputdir, dump_user, manifest)
+    return errcnt
+
+
 class PluginScript(script.MoinScript):
     """\
 Purpose:
@@ -113,6 +373,17 @@ General syntax: moin [options] export dump [dump-options]
     2. To dump all the pages readable by 'JohnSmith' on the wiki to the directory
        '/mywiki'
        moin ... export dump --target-dir=/mywiki --username JohnSmith
+
+    3. To only render the pages (and copy the attachments) that changed
+       since the last dump to '/mywiki', using 4 worker processes:
+       moin ... export dump --target-dir=/mywiki --incremental --processes=4
+
+       A page is rendered again if its revision or its attachments changed,
+       if a page it includes changed, or if it uses macros whose output
+       changes otherwise (like TitleIndex, RecentChanges or PageList). The
+       front page, TitleIndex and WordIndex are always rendered again.
+       Pages that only link to a changed page are not rendered again.
+       The html files and the attachments of deleted pages are removed.
 """
 
     def __init__(self, argv=None, def_values=None):
@@ -125,6 +396,14 @@ General syntax: moin [options] export dump [dump-options]
             "-u", "--username", dest = "dump_user",
             help = "User the dump will be performed as (for ACL checks, etc)"
         )
+        self.parser.add_option(
+            "--incremental", dest = "incremental", action = "store_true", default = False,
+            help = "Only render pages that changed since the last dump to the target directory"
+        )
+        self.parser.add_option(
+            "--processes", metavar = "N", dest = "processes", type = "int", default = 1,
+            help = "Number of worker processes rendering the pages (default: 1, 0: number of CPUs)"
+        )
 
     def mainloop(self):
         """ moin-dump's main code. """
@@ -172,10 +451,6 @@ General syntax: moin [options] export dump [dump-options]
 
         AttachFile.getAttachUrl = lambda pagename, filename, request, **kw: _attachment(request, pagename, filename, outputdir, **kw)
 
-        errfile = os.path.join(outputdir, 'error.log')
-        errlog = open(errfile, 'w')
-        errcnt = 0
-
         page_front_page = wikiutil.getLocalizedPage(request, request.cfg.page_front_page).page_name
         page_title_index = wikiutil.getLocalizedPage(request, 'TitleIndex').page_name
         page_word_index = wikiutil.getLocalizedPage(request, 'WordIndex').page_name
@@ -184,51 +459,24 @@ General syntax: moin [options] export dump [dump-options]
         for p in [page_front_page, page_title_index, page_word_index]:
             navibar_html += '[<a href="%s">%s</a>]&nbsp;' % (wikiutil.quoteWikinameURL(p), wikiutil.escape(p))
 
-        urlbase = request.url # save wiki base url
-        for pagename in pages:
-            # we have the same name in URL and FS
-            file = wikiutil.quoteWikinameURL(pagename)
-            script.log('Writing "%s"...' % file)
-            try:
-                pagehtml = ''
-                request.url = urlbase + pagename # add current pagename to url base
-                page = Page.Page(request, pagename)
-                request.page = page
-                try:
-                    request.reset()
-                    pagehtml = request.redirectedOutput(page.send_page, count_hit=0, content_only=1)
-                except:
-                    errcnt = errcnt + 1
-                    print >> sys.stderr, "*** Caught exception while writing page!"
-                    print >> errlog, "~" * 78
-                    print >> errlog, file # page filename
-                    import traceback
-                    traceback.print_exc(None, errlog)
-            finally:
-                timestamp = time.strftime("%Y-%m-%d %H:%M")
-                filepath = os.path.join(outputdir, file)
-                fileout = codecs.open(filepath, 'w', config.charset)
-                fileout.write(page_template % {
-                    'charset': config.charset,
-                    'pagename': pagename,
-                    'pagehtml': pagehtml,
-                    'logo_html': logo_html,
-                    'navibar_html': navibar_html,
-                    'timestamp': timestamp,
-                    'theme': request.cfg.theme_default,
-                })
-                fileout.close()
+        errfile = os.path.join(outputdir, 'error.log')
+        errlog = open(errfile, 'w')
+        errcnt = dump_pages(request, pages, outputdir, navibar_html, self.options.dump_user, errlog,
+                            incremental=self.options.incremental,
+                            always=[page_front_page, page_title_index, page_word_index],
+                            remove_deleted=not self.options.page,
+                            processes=self.options.processes,
+                            wiki_url=self.options.wiki_url, page_option=self.options.page)
 
         # copy FrontPage to "index.html"
         indexpage = page_front_page
         if self.options.page:
             indexpage = pages[0] # index page has limited use when dumping specific pages, but create one anyway
-        shutil.copyfile(
-            os.path.join(outputdir, wikiutil.quoteWikinameFS(indexpage) + HTML_SUFFIX),
-            os.path.join(outputdir, 'index' + HTML_SUFFIX)
-        )
+        source = os.path.join(outputdir, wikiutil.quoteWikinameFS(indexpage) + HTML_SUFFIX)
+        if os.path.exists(source):
+            _write_atomic(os.path.join(outputdir, 'index' + HTML_SUFFIX),
+                          lambda f: f.write(open(source, 'rb').read()))
 
         errlog.close()
         if errcnt:
             print >> sys.stderr, "*** %d error(s) occurred, see '%s'!" % (errcnt, errfile)
-
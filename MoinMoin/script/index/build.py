@@ -1,6 +1,6 @@
 # -*- coding: iso-8859-1 -*-
 """
-MoinMoin - build xapian search engine's index
+MoinMoin - build xapian's or moin's builtin search engine index
 
 @copyright: 2006-2009 MoinMoin:ThomasWaldmann
 @license: GNU GPL, see COPYING for details.
@@ -16,7 +16,8 @@ class IndexScript(MoinScript):
     """\
 Purpose:
 ========
-This tool allows you to control xapian's index of Moin.
+This tool allows you to control xapian's index of Moin (or moin's builtin
+search index, see --engine below).
 
 Detailed Instructions:
 ======================
@@ -58,6 +59,13 @@ General syntax: moin [options] index build [build-options]
        # quick, replaces the old index with the new one:
        moin ... index build --mode=usenewindex
        start this moin wiki process(es)
+
+    4. All of the above for moin's builtin search index (used if you have set
+       search_index = True and do not use xapian):
+       moin ... index build --engine=builtin --mode=...
+
+       Note: the builtin index does not index attachments and files, it
+       is kept up to date from the edit-log automatically when searching.
 """
 
     def __init__(self, argv, def_values):
@@ -75,6 +83,10 @@ General syntax: moin [options] index build [build-options]
             "--count", metavar="COUNT", dest="count",
             help="for queued indexing only: how many queue entries to process in this indexing run"
         )
+        self.parser.add_option(
+            "--engine", metavar="ENGINE", dest="engine", default="xapian",
+            help="either xapian (default) or builtin (moin's builtin search index)"
+        )
 
     def mainloop(self):
         self.init_request()
@@ -86,10 +98,13 @@ General syntax: moin [options] index build [build-options]
         self.command()
 
 class PluginScript(IndexScript):
-    """ Xapian index build script class """
+    """ Xapian (or builtin) index build script class """
 
     def command(self):
-        from MoinMoin.search.Xapian import XapianIndex
+        if self.options.engine == 'builtin':
+            from MoinMoin.search.builtin import MoinIndex as Index
+        else:
+            from MoinMoin.search.Xapian import XapianIndex as Index
         mode = self.options.mode
         if mode in ['rebuild', 'buildnewindex', 'makequeue', 'buildnewindexqueued', ]:
             # rebuilding the DB into a new index directory, so the rebuild
@@ -104,11 +119,11 @@ class PluginScript(IndexScript):
             pass # XXX give error msg about invalid mode
 
         if mode in ['makequeue', ]:
-            idx = XapianIndex(self.request, name=idx_name)
+            idx = Index(self.request, name=idx_name)
             idx.queuePages()
 
         if mode in ['rebuild', 'buildnewindex', 'buildnewindexqueued', ]:
-            idx = XapianIndex(self.request, name=idx_name)
+            idx = Index(self.request, name=idx_name)
             if mode == 'buildnewindexqueued':
                 idx.indexPagesQueued(int(self.options.count))
             else:
@@ -121,8 +136,8 @@ class PluginScript(IndexScript):
             # 'usenewindex' (see above).
             # XXX code here assumes that idx.db is a directory
             # TODO improve this with xapian stub DBs
-            idx_old = XapianIndex(self.request, name='index').db
-            idx_new = XapianIndex(self.request, name='index.new').db
+            idx_old = Index(self.request, name='index').db
+            idx_new = Index(self.request, name='index.new').db
             try:
                 shutil.rmtree(idx_old)
             except OSError, err:
@@ -55,13 +55,18 @@ General syntax: moin [options] maint cleancache
             ('charts', 'hitcounts'),
             ('charts', 'pagehits'),
             ('charts', 'useragents'),
+            ('groupindex', 'wiki'),
+            ('interwiki', 'map'),
+            ('plugins', 'parsers'),
         ]
         for arena, key in arena_key_list:
             caching.CacheEntry(request, arena, key, scope='wiki').remove()
 
-        # clean dict and groups related cache
+        # clean dict and groups related cache, macro output and highlighted code
         arena_scope_list =  [('pagedicts', 'wiki'),
                              ('pagegroups', 'wiki'),
+                             ('fragments', 'wiki'),
+                             ('highlight', 'wiki'),
                              ('users', 'userdir'),
         ]
         for arena, scope in arena_scope_list:
@@ -3,7 +3,8 @@
 MoinMoin - cleansessions script
 
 @copyright: 2009 MoinMoin:ReimarBauer,
-            2010 MoinMoin:ThomasWaldmann
+            2010 MoinMoin:ThomasWaldmann,
+            2026 by the MoinMoin project
 @license: GNU GPL, see COPYING for details.
 """
 
@@ -46,8 +47,14 @@ General syntax: moin [options] maint cleansessions [cleansessions-options]
     def mainloop(self):
         self.init_request()
         request = self.request
+        session_service = request.cfg.session_service
         checks = []
 
+        if not self.options.all_sessions and not self.options.username:
+            # the session service might know the expired sessions without loading all
+            session_service.expire_sessions(request)
+            return
+
         if not self.options.all_sessions:
             now = time.time()
             def session_expired(session):
@@ -71,7 +78,6 @@ General syntax: moin [options] maint cleansessions [cleansessions-options]
                         return False
                 checks.append(user_matches)
 
-        session_service = request.cfg.session_service
         for sid in session_service.get_all_session_ids(request):
             session = session_service.get_session(request, sid)
 
@@ -0,0 +1,62 @@
+# -*- coding: iso-8859-1 -*-
+"""
+MoinMoin - deliver queued notifications
+
+@copyright: 2026 by the MoinMoin project
+@license: GNU GPL, see COPYING for details.
+"""
+
+import time
+
+from MoinMoin.events.outbox import Outbox
+from MoinMoin.script import MoinScript, log
+
+class PluginScript(MoinScript):
+    """\
+Purpose:
+========
+This script delivers the email and jabber notifications queued in the
+outbox (see notification_outbox), using one SMTP connection for all mails.
+Failed deliveries are retried by later runs.
+
+Detailed Instructions:
+======================
+General syntax: moin [options] maint deliver [deliver-options]
+
+[options] usually should be:
+    --config-dir=/path/to/my/cfg/ --wiki-url=http://wiki.example.org/
+
+[deliver-options] see below:
+    --limit=N       deliver at most N notifications per run
+    --loop          keep running, deliver new notifications every --interval seconds
+    --interval=SECS seconds between two runs with --loop (default: 10)
+"""
+
+    def __init__(self, argv, def_values):
+        MoinScript.__init__(self, argv, def_values)
+
+        self.parser.add_option(
+            "--limit", metavar="N", dest="limit", type="int",
+            help="deliver at most N notifications per run"
+        )
+        self.parser.add_option(
+            "--loop", action="store_true", dest="loop",
+            help="keep running, deliver new notifications every --interval seconds"
+        )
+        self.parser.add_option(
+            "--interval", metavar="SECS", dest="interval", type="float", default=10.0,
+            help="seconds between two runs with --loop (default: 10)"
+        )
+
+    def mainloop(self):
+        self.init_request()
+        outbox = Outbox(self.request)
+        while True:
+            result = outbox.deliver(self.options.limit)
+            if result is None:
+                log("Another process is delivering notifications.")
+            elif result != (0, 0):
+                log("%d notifications delivered, %d failed." % result)
+            if not self.options.loop:
+                break
+            time.sleep(self.options.interval)
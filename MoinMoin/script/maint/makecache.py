@@ -6,10 +6,13 @@ MoinMoin - makecache script
 @license: GNU GPL, see COPYING for details.
 """
 
-from MoinMoin import caching
+import time
+
+from MoinMoin import caching, wikiutil
 from MoinMoin.Page import Page
-from MoinMoin.script import MoinScript
-from MoinMoin.stats import hitcounts
+from MoinMoin.linkindex import LinkIndex
+from MoinMoin.script import MoinScript, log
+from MoinMoin.stats.eventstats import EventStats
 
 class PluginScript(MoinScript):
     """\
@@ -22,27 +25,147 @@ You will usually do this after changing MoinMoin code and calling "maint cleanca
 version, installing or removing macros.
 
 text_html is the name of the cache file used for compiled pages formatted
-by the wiki text to html formatter.
+by the wiki text to html formatter, pagelinks is the cache of the links
+of a page.
+
+Only pages with outdated or missing caches are rendered, the most viewed
+pages (according to the event-log) first. Rendering is done by a pool of
+worker processes. Then the page link index (used e.g. by WantedPages,
+OrphanedPages and linkto: searches) is built from the pagelinks caches.
 
 Detailed Instructions:
 ======================
-General syntax: moin [options] maint makecache
+General syntax: moin [options] maint makecache [makecache-options]
 
 [options] usually should be:
     --config-dir=/path/to/my/cfg/ --wiki-url=http://wiki.example.org/
+
+[makecache-options] see below:
+    0. To render the caches using 4 worker processes:
+       moin ... maint makecache --processes=4
+
+    1. To prioritize by the page views of the last 7 days:
+       moin ... maint makecache --days=7
 """
 
     def __init__(self, argv, def_values):
         MoinScript.__init__(self, argv, def_values)
+        self.parser.add_option(
+            "--processes", metavar="N", dest="processes", type="int", default=0,
+            help="number of worker processes (default: number of CPUs, 1: don't use worker processes)"
+        )
+        self.parser.add_option(
+            "--days", metavar="DAYS", dest="days", type="int", default=30,
+            help="prioritize pages by their views in the last DAYS days (default: 30, 0: don't read the event-log)"
+        )
 
     def mainloop(self):
         self.init_request()
         request = self.request
 
-        # make cache related to pagelinks entries of a page
         pages = request.rootpage.getPageList(user='', exists=1)
-        for pagename in pages:
-            page = Page(request, pagename)
-            request.page = page
-            p = page.getPageLinks(request)
+        stale = [pagename for pagename in pages if needs_update(request, pagename)]
+        hits = hitcounts(request, self.options.days)
+        stale.sort(key=lambda pagename: (-hits.get(pagename, 0), pagename))
+        log("%d of %d pages need cache updates" % (len(stale), len(pages)))
+
+        processes = self.options.processes
+        if processes <= 0:
+            try:
+                import multiprocessing
+                processes = multiprocessing.cpu_count()
+            except (ImportError, NotImplementedError):
+                processes = 1
+        processes = min(processes, len(stale)) or 1
+
+        start = time.time()
+        if processes == 1:
+            results = (make_cache(request, pagename) for pagename in stale)
+        else:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes, init_worker,
+                                        (self.options.wiki_url, self.options.page))
+            results = pool.imap_unordered(make_cache_worker, stale, chunksize=8)
+        done = failed = 0
+        for pagename, ok in results:
+            done += 1
+            if not ok:
+                failed += 1
+            if done % 100 == 0:
+                elapsed = time.time() - start
+                log("%d/%d pages (%.1f pages/s)" % (done, len(stale), done / max(elapsed, 0.001)))
+        if processes > 1:
+            pool.close()
+            pool.join()
+        elapsed = time.time() - start
+        log("rendered %d pages in %.1fs (%.1f pages/s, %d processes), %d failed" % (
+            done, elapsed, done / max(elapsed, 0.001), processes, failed))
+
+        start = time.time()
+        data = LinkIndex(request).build()
+        log("built the link index for %d pages in %.1fs" % (len(data['forward']), time.time() - start))
+
+
+def page_caches(request, page):
+    """ Return the cache entries we create for page (and the files they depend on).
+
+    text_html is left out if the wiki does not cache it or the page's parser
+    does not support caching.
+    """
+    text_filename = page._text_filename()
+    caches = [(caching.CacheEntry(request, page, 'pagelinks', scope='item'), (text_filename, ))]
+    if 'text_html' in request.cfg.caching_formats:
+        try:
+            parser = wikiutil.searchAndImportPlugin(request.cfg, "parser", page.pi['format'])
+        except wikiutil.PluginMissingError:
+            parser = None
+        if getattr(parser, 'caching', False):
+            attachments_path = page.getPagePath('attachments', check_create=0)
+            caches.append((caching.CacheEntry(request, page, 'text_html', scope='item'),
+                           (text_filename, attachments_path)))
+    return caches
+
+
+def needs_update(request, pagename):
+    """ Return True if some cache of page pagename is missing or outdated """
+    page = Page(request, pagename)
+    for cache, depends_on in page_caches(request, page):
+        if cache.needsUpdate(*depends_on):
+            return True
+    return False
+
+
+def hitcounts(request, days):
+    """ Return dict pagename -> number of page views in the last days """
+    if days <= 0:
+        return {}
+    return EventStats(request).pagehits(since=time.time() - days * 24 * 3600)
+
+
+def make_cache(request, pagename):
+    """ Render page pagename to update its caches.
+
+    @return: (pagename, True if it worked)
+    """
+    try:
+        page = Page(request, pagename)
+        request.page = page
+        # this updates text_html and pagelinks caches,
+        # send_special avoids the ACL check, we throw away the output anyway
+        request.redirectedOutput(page.send_page, content_only=1, send_special=True)
+        return pagename, True
+    except Exception, err:
+        log("failed to render %r: %s" % (pagename, err))
+        return pagename, False
+
+
+_worker_request = None
+
+def init_worker(url, pagename):
+    """ Create the request used by a worker process """
+    global _worker_request
+    from MoinMoin.web.contexts import ScriptContext
+    _worker_request = ScriptContext(url, pagename)
 
+def make_cache_worker(pagename):
+    return make_cache(_worker_request, pagename)
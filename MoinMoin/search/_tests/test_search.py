@@ -10,13 +10,13 @@
 """
 
 
-import os, StringIO, time
+import os, shutil, StringIO, time
 
 import py
 
 from MoinMoin.search import QueryError, _get_searcher
 from MoinMoin.search.queryparser import QueryParser
-from MoinMoin.search.builtin import MoinSearch
+from MoinMoin.search.builtin import MoinSearch, MoinIndex
 from MoinMoin._tests import nuke_xapian_index, wikiconfig, become_trusted, create_page, nuke_page, append_page
 from MoinMoin.wikiutil import Version
 from MoinMoin.action import AttachFile
@@ -432,6 +432,86 @@ class TestMoinSearch(BaseSearchTest):
         assert found_pages == expected_pages
 
 
+class TestMoinIndex(object):
+    """ search: test moin's builtin search index """
+
+    class Config(wikiconfig.Config):
+        search_index = True
+
+    pages = {u'IndexTestNeedle': u'Find the NEEDLE in the haystack.',
+             u'IndexTestHay': u'Just hay, nothing else.',
+            }
+
+    def setup_class(self):
+        become_trusted(self.request)
+        for page, text in self.pages.iteritems():
+            create_page(self.request, page, text)
+        index = MoinIndex(self.request)
+        shutil.rmtree(index.db, True)
+        index = MoinIndex(self.request)
+        index.indexPages(pages=self.pages.keys())
+
+    def teardown_class(self):
+        for page in self.pages:
+            nuke_page(self.request, page)
+        shutil.rmtree(MoinIndex(self.request).db, True)
+
+    def search(self, query):
+        return MoinSearch(self.request, QueryParser().parse_query(query)).run()
+
+    def candidates(self, query):
+        return MoinIndex(self.request).search(QueryParser().parse_query(query))
+
+    def test_exists(self):
+        assert MoinIndex(self.request).exists()
+
+    def test_postings(self):
+        index = MoinIndex(self.request)
+        assert index.postings(u'needle') == set([u'IndexTestNeedle'])
+        assert index.postings(u'indextesthay', 'title') == set([u'IndexTestHay'])
+        assert index.pages_containing(u'ay') == set([u'IndexTestNeedle', u'IndexTestHay'])
+        assert index.pages_containing(u'ay', ['title']) == set([u'IndexTestHay'])
+
+    def test_terms_containing(self):
+        index = MoinIndex(self.request)
+        assert u'haystack' in index.terms_containing(u'aysta')
+        assert u'haystack' in index.terms_containing(u'ys')
+        assert u'indextesthay' in index.terms_containing(u'testhay', 'title')
+        assert not index.terms_containing(u'haystacks')
+        assert not index.terms_containing(u'haystack', 'title')
+
+    def test_candidates(self):
+        assert self.candidates(u'needle') == set([u'IndexTestNeedle'])
+        assert self.candidates(u'haystack') == set([u'IndexTestNeedle'])
+        assert self.candidates(u'needle or nothing') == set([u'IndexTestNeedle', u'IndexTestHay'])
+        assert self.candidates(u'needle nothing') == set()
+        assert self.candidates(u'title:TestHay') == set([u'IndexTestHay'])
+        assert self.candidates(u'needle -haystack') == set([u'IndexTestNeedle'])
+        # the index can't answer these:
+        assert self.candidates(u'-needle') is None
+        assert self.candidates(u're:ne{2}dle') is None
+        assert self.candidates(u'ne.dle') is None
+        assert self.candidates(u'needle or linkto:FrontPage') is None
+
+    def test_search(self):
+        result = self.search(u'NEEDLE')
+        assert set([hit.page_name for hit in result.hits]) == set([u'IndexTestNeedle'])
+        result = self.search(u'case:needle')
+        assert not result.hits
+
+    def test_update_from_editlog(self):
+        page_name = u'IndexTestCreatePage'
+        try:
+            create_page(self.request, page_name, u'a freshly created needle')
+            result = self.search(u'freshly')
+            assert set([hit.page_name for hit in result.hits]) == set([page_name])
+        finally:
+            nuke_page(self.request, page_name)
+        result = self.search(u'freshly')
+        assert not result.hits
+        assert not MoinIndex(self.request).postings(u'freshly')
+
+
 class TestXapianSearch(BaseSearchTest):
     """ search: test Xapian indexing / search """
 
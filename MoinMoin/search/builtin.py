@@ -10,13 +10,16 @@
     @license: GNU GPL, see COPYING for details
 """
 
-import sys, os, time, errno, codecs
+import sys, os, re, time, errno, codecs, zlib
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
 
 from MoinMoin import wikiutil, config, caching
 from MoinMoin.Page import Page
+from MoinMoin.linkindex import LinkIndex
+from MoinMoin.filter import filter_file
+from MoinMoin.util import filesys, lock
 from MoinMoin.search.results import getSearchResults, Match, TextMatch, TitleMatch, getSearchResults
 
 ##############################################################################
@@ -93,6 +96,10 @@ class IndexerQueue(object):
         finally:
             cache.unlock()
 
+    def empty(self):
+        """ Check if the queue is empty (without locking) """
+        return not self._queue(self.get_cache(locking=False))
+
     def mget(self, count):
         """ Get (and remove) first <count> entries from the queue
 
@@ -254,7 +261,7 @@ class BaseIndex(object):
             else:
                 logging.info("Cannot load filter for mimetype %s" % modulename)
         try:
-            data = execute(self, filename)
+            data = filter_file(self, modulename, execute, filename)
             logging.debug("Filter %s returned %d characters for file %s" % (modulename, len(data), filename))
         except (OSError, IOError), err:
             data = ''
@@ -297,6 +304,352 @@ class BaseIndex(object):
         return FakeRequest(request, user)
 
 
+class MoinIndex(BaseIndex):
+    """ Moin's builtin, pure python inverted full text index
+
+    The index maps the (lowercased) words of page bodies ('content') and page
+    names ('title') to the pages they occur in. Postings are spread over a
+    fixed number of bucket files, so looking up a term only needs to load the
+    bucket of that term. The vocabulary (term -> number of pages) is kept in
+    a separate file. As moin search does substring matching, the terms
+    containing some search word are found with a trigram index of the
+    vocabulary (trigram -> terms, terms shorter than 3 characters are kept
+    under the term itself).
+
+    Only current page revisions are indexed, attachments are not indexed.
+
+    The index is updated incrementally: pages mentioned in new edit-log
+    entries are put into the indexer queue, which is processed before
+    searching (see do_queued_updates).
+    """
+    index_version = 2
+    bucket_count = 256
+    fields = ('content', 'title', )
+    word_re = re.compile(r'\w+', re.U)
+
+    def __init__(self, request, name='index'):
+        """
+        @param request: current request
+        @param name: name of the index directory (below the main directory)
+        """
+        super(MoinIndex, self).__init__(request)
+        self.db = os.path.join(self.main_dir, name)
+        if not os.path.exists(self.db):
+            os.makedirs(self.db)
+
+    def _main_dir(self):
+        """ Get the directory of the builtin search index """
+        return os.path.join(self.request.cfg.cache_dir, self.request.cfg.siteid, 'searchindex')
+
+    def _cache(self, key):
+        # all index files are only written while holding the update lock and
+        # updated by renaming a temporary file, so readers need no locking.
+        return caching.CacheEntry(self.request, self.db, key, scope='dir',
+                                  use_pickle=True, do_locking=False)
+
+    def _load(self, key, default=None):
+        try:
+            return self._cache(key).content()
+        except caching.CacheError:
+            return default
+
+    def _save(self, key, data):
+        self._cache(key).update(data)
+
+    def _update_lock(self):
+        return lock.ExclusiveLock(os.path.join(self.db, '__update_lock__'), 60.0)
+
+    def exists(self):
+        """ Check if index exists """
+        return self._load('meta', {}).get('version') == self.index_version
+
+    def mtime(self):
+        """ Modification time of the index """
+        return self._cache('meta').mtime()
+
+    def touch(self):
+        """ Touch the index """
+        filesys.touch(os.path.join(self.db, 'meta'))
+
+    def tokenize(self, text):
+        """ Return the list of terms (words) in text
+
+        @param text: text to tokenize (unicode)
+        """
+        return self.word_re.findall(text.lower())
+
+    def _trigrams(self, term):
+        """ Return the keys term is found under in the trigram index """
+        if len(term) < 3:
+            return set([term])
+        return set([term[i:i+3] for i in xrange(len(term) - 2)])
+
+    def _bucket_key(self, field, term):
+        """ Return the key of the bucket file holding the postings of term """
+        return '%s-%02x' % (field, zlib.crc32(term.encode('utf-8')) % self.bucket_count)
+
+    def trigrams(self):
+        """ Return the trigram index: dict field -> {trigram: set of terms}
+
+        The trigram index is kept in RAM as long as its on-disk file is unchanged.
+        """
+        cache = self._cache('trigrams')
+        uid = cache.uid()
+        cached_uid, trigrams = self.request.cfg.search_index_trigrams.get(self.db, (None, None))
+        if trigrams is None or uid is None or uid != cached_uid:
+            try:
+                trigrams = cache.content()
+            except caching.CacheError:
+                trigrams = {}
+            self.request.cfg.search_index_trigrams[self.db] = (uid, trigrams)
+        return trigrams
+
+    def terms_containing(self, word, field='content'):
+        """ Return the set of terms of the vocabulary containing word
+
+        For words of 3 or more characters, only the terms having all trigrams
+        of word are checked. Shorter words are looked up in the keys of the
+        trigram index, which are much less than the terms.
+
+        @param word: a word as yielded by tokenize()
+        @param field: 'content' or 'title'
+        """
+        trigrams = self.trigrams().get(field, {})
+        if len(word) < 3:
+            terms = set()
+            for key, key_terms in trigrams.iteritems():
+                if word in key:
+                    terms |= key_terms
+            return terms
+        candidates = [trigrams.get(key, ()) for key in self._trigrams(word)]
+        candidates.sort(key=len)
+        terms = set(candidates[0])
+        for key_terms in candidates[1:]:
+            if not terms:
+                break
+            terms &= key_terms
+        return set([term for term in terms if word in term])
+
+    def postings(self, term, field='content'):
+        """ Return the postings of term: set of page names
+
+        @param term: a term as yielded by tokenize()
+        @param field: 'content' or 'title'
+        """
+        return self._load(self._bucket_key(field, term), {}).get(term, set())
+
+    def pages_containing(self, word, fields=None):
+        """ Return the set of names of pages having a term containing word
+
+        @param word: a word as yielded by tokenize()
+        @param fields: fields to look into (default: all fields)
+        """
+        pages = set()
+        for field in fields or self.fields:
+            buckets = {}
+            for term in self.terms_containing(word, field):
+                buckets.setdefault(self._bucket_key(field, term), []).append(term)
+            for key, terms in buckets.iteritems():
+                bucket = self._load(key, {})
+                for term in terms:
+                    pages.update(bucket.get(term, ()))
+        return pages
+
+    def _search(self, query):
+        """ Get the names of the pages that may match query
+
+        @param query: the search query objects tree
+        @rtype: set of unicode or None
+        @return: page names or None, if the index can't narrow down the
+                 pages to search in (e.g. for regex searches)
+        """
+        return query.moinindex_pages(self)
+
+    def _update_pages(self, request, pagenames, mode='update'):
+        """ (Re-)index pages, remove pages that are gone from the index
+
+        This should be called with the update lock held only!
+
+        @param request: request suitable for indexing
+        @param pagenames: names of the pages to index
+        @param mode: 'add' = just add, no checks
+                     'update' = only index pages with changed revision
+        @return: number of pages (re-)indexed or removed
+        """
+        documents = self._load('documents', {})
+        vocabulary = self._load('vocabulary', {})
+        trigrams = self._load('trigrams', {})
+        buckets = {}
+
+        def get_bucket(field, term):
+            key = self._bucket_key(field, term)
+            if key not in buckets:
+                buckets[key] = self._load(key, {})
+            return buckets[key]
+
+        done_count = 0
+        for pagename in pagenames:
+            page = Page(request, pagename)
+            old = documents.get(pagename)
+            if page.exists():
+                revision = page.get_real_rev()
+                if mode == 'update' and old and old['revision'] == revision:
+                    continue
+                new = {'revision': revision,
+                       'content': set(self.tokenize(page.get_raw_body())),
+                       'title': set(self.tokenize(pagename)),
+                      }
+            elif old:
+                new = None
+            else:
+                continue
+
+            if old:
+                for field in self.fields:
+                    field_vocabulary = vocabulary.setdefault(field, {})
+                    field_trigrams = trigrams.setdefault(field, {})
+                    for term in old[field]:
+                        bucket = get_bucket(field, term)
+                        postings = bucket.get(term, set())
+                        postings.discard(pagename)
+                        if not postings:
+                            bucket.pop(term, None)
+                        count = field_vocabulary.get(term, 0) - 1
+                        if count > 0:
+                            field_vocabulary[term] = count
+                        else:
+                            field_vocabulary.pop(term, None)
+                            for key in self._trigrams(term):
+                                key_terms = field_trigrams.get(key, set())
+                                key_terms.discard(term)
+                                if not key_terms:
+                                    field_trigrams.pop(key, None)
+                del documents[pagename]
+
+            if new:
+                for field in self.fields:
+                    field_vocabulary = vocabulary.setdefault(field, {})
+                    field_trigrams = trigrams.setdefault(field, {})
+                    for term in new[field]:
+                        get_bucket(field, term).setdefault(term, set()).add(pagename)
+                        count = field_vocabulary.get(term, 0)
+                        if not count:
+                            for key in self._trigrams(term):
+                                field_trigrams.setdefault(key, set()).add(term)
+                        field_vocabulary[term] = count + 1
+                documents[pagename] = {'revision': new['revision'],
+                                       'content': tuple(new['content']),
+                                       'title': tuple(new['title']),
+                                      }
+            done_count += 1
+
+        if done_count:
+            # write postings first, trigrams last: concurrent searches might
+            # miss brand new terms, but never find terms without postings.
+            for key, bucket in buckets.iteritems():
+                self._save(key, bucket)
+            self._save('documents', documents)
+            self._save('vocabulary', vocabulary)
+            self._save('trigrams', trigrams)
+        return done_count
+
+    def _save_meta(self, log_pos):
+        self._save('meta', {'version': self.index_version, 'log_pos': log_pos, })
+
+    def do_queued_updates(self, amount=-1):
+        """ Queue pages changed in the edit-log and index <amount> queue entries
+
+        If some other process is just updating the index, we do nothing and
+        the index gets used as it is.
+
+        @param amount: amount of queue entries to process (default: -1 == all)
+        @return: number of pages (re-)indexed or removed
+        """
+        from MoinMoin.logfile import editlog
+        elog = editlog.EditLog(self.request)
+        meta = self._load('meta', {})
+        if meta.get('log_pos') == elog.size() and self.update_queue.empty():
+            # nothing new, no need to lock anything
+            return 0
+        update_lock = self._update_lock()
+        if not update_lock.acquire(1.0):
+            logging.debug("can't lock search index, not doing queued updates now")
+            return 0
+        try:
+            meta = self._load('meta', {})
+            log_pos, pagenames = elog.news(meta.get('log_pos'))
+            if pagenames:
+                self.update_queue.mput([(pagename, None, None) for pagename in set(pagenames)])
+            entries = []
+            while amount:
+                # trick: if amount starts from -1, it will never get 0
+                count = amount > 0 and min(amount, 100) or 100
+                got = self.update_queue.mget(count)
+                if not got:
+                    break
+                entries.extend(got)
+                amount -= len(got)
+            # attachments and filesystem files are not indexed
+            pagenames = set([pagename for pagename, attachmentname, revno in entries
+                             if pagename and not attachmentname])
+            done_count = 0
+            if pagenames:
+                request = self._indexingRequest(self.request)
+                done_count = self._update_pages(request, pagenames)
+                logging.debug("updated search index with %d queued updates" % done_count)
+            if log_pos != meta.get('log_pos') or not meta:
+                self._save_meta(log_pos)
+        finally:
+            update_lock.release()
+        return done_count
+
+    def _queue_pages(self, request, files=None, pages=None):
+        """ Put all (given) pages into indexer queue
+
+        This should be called from queuePages only!
+
+        @param request: request suitable for indexing
+        @param files: not supported (ignored)
+        @param pages: list of pages to index, if not given, all pages are indexed
+        """
+        if pages is None:
+            pages = request.rootpage.getPageList(user='', exists=1)
+        logging.info("queuing %d pages..." % len(pages))
+        self.update_queue.mput([(pagename, None, None) for pagename in pages])
+
+    def _index_pages(self, request, files=None, mode='update', pages=None):
+        """ Index all (given) pages
+
+        This should be called from indexPages only!
+
+        @param request: request suitable for indexing
+        @param files: not supported (ignored)
+        @param mode: 'add' = just add, no checks
+                     'update' = check if already in index and update if needed (revision)
+        @param pages: list of pages to index, if not given, all pages are indexed
+        """
+        from MoinMoin.logfile import editlog
+        if files:
+            logging.warning("moin's builtin search index does not index files.")
+        update_lock = self._update_lock()
+        if not update_lock.acquire(60.0):
+            logging.warning("search index is locked, can't index.")
+            return
+        try:
+            # everything in the edit-log up to here is covered by this run
+            log_pos = editlog.EditLog(request).size()
+            if pages is None:
+                pages = request.rootpage.getPageList(user='', exists=1)
+                if mode == 'update':
+                    # also remove pages that are gone meanwhile
+                    pages = set(pages) | set(self._load('documents', {}))
+            logging.info("indexing %d pages..." % len(pages))
+            self._update_pages(request, pages, mode)
+            self._save_meta(log_pos)
+        finally:
+            update_lock.release()
+
+
 ##############################################################################
 ### Searching
 ##############################################################################
@@ -352,13 +705,15 @@ class BaseSearch(object):
 
         @param hits: list of hits
         """
-        userMayRead = self.request.user.may.read
         fs_rootpage = self.fs_rootpage + "/"
         thiswiki = (self.request.cfg.interwikiname, 'Self')
+        readable = set(self.request.user.may.filter('read',
+                       [page.page_name for wikiname, page, attachment, match, rev in hits
+                        if wikiname in thiswiki and page.exists()]))
         filtered = [(wikiname, page, attachment, match, rev)
                 for wikiname, page, attachment, match, rev in hits
                     if (not wikiname in thiswiki or
-                       page.exists() and userMayRead(page.page_name) or
+                       page.page_name in readable or
                        page.page_name.startswith(fs_rootpage)) and
                        (not self.mtime or self.mtime <= page.mtime_usecs()/1000000)]
         return filtered
@@ -456,11 +811,22 @@ class MoinSearch(BaseSearch):
     def _getPageList(self):
         """ Get list of pages to search in
 
-        If the query has a page filter, use it to filter pages before
-        searching. If not, get a unfiltered page list. The filtering
-        will happen later on the hits, which is faster with current
-        slow storage.
+        If moin's builtin search index or the page link index can tell
+        which pages may match, use just these. Otherwise, if the query has a page filter, use it
+        to filter pages before searching. If not, get a unfiltered page
+        list. The filtering will happen later on the hits, which is faster
+        with current slow storage.
         """
+        pages = self._getIndexedPageList()
+        if not self.historysearch:
+            linking = self.query.linkindex_pages(LinkIndex(self.request))
+            if linking is not None:
+                if pages is not None:
+                    linking &= set(pages)
+                pages = list(linking)
+        if pages is not None:
+            return pages
+
         filter_ = self.query.pageFilter()
         if filter_:
             # There is no need to filter the results again.
@@ -469,3 +835,21 @@ class MoinSearch(BaseSearch):
         else:
             return self.request.rootpage.getPageList(user='', exists=0)
 
+    def _getIndexedPageList(self):
+        """ Get list of pages to search in from moin's builtin search index
+
+        @return: list of page names or None, if the index is not enabled,
+                 does not exist or can't answer the query
+        """
+        if not self.request.cfg.search_index or self.historysearch:
+            return None
+        index = MoinIndex(self.request)
+        if not index.exists():
+            logging.warning("Slow moin search is used because the builtin search index does not exist. You should create it using the moin index build --engine=builtin command.")
+            return None
+        index.do_queued_updates()
+        pages = index.search(self.query)
+        if pages is None:
+            return None
+        logging.debug("builtin search index found %d candidate pages" % len(pages))
+        return list(pages)
@@ -30,6 +30,8 @@ try:
 except ImportError:
     pass
 
+_regex_special_re = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
 
 class BaseExpression(object):
     """ Base class for all search terms """
@@ -155,6 +157,45 @@ class BaseExpression(object):
     def xapian_need_postproc(self):
         return self.case
 
+    def moinindex_pages(self, index):
+        """ Return the names of the pages that may match this term
+
+        Used with moin's builtin search index to reduce the amount of pages
+        we need to search in. The result must include all matching pages,
+        but may include more. None means that all pages need to be searched.
+
+        @param index: a MoinIndex instance
+        @rtype: set of unicode or None
+        """
+        return None
+
+    def linkindex_pages(self, index):
+        """ Return the names of the pages that may match this term
+
+        Like moinindex_pages, but using the page link index.
+
+        @param index: a LinkIndex instance
+        @rtype: set of unicode or None
+        """
+        return None
+
+    def _moinindex_search(self, index, fields):
+        """ Return the pages having all words of the pattern in fields
+
+        The pattern is used as a regex even for non-regex searches, so we can
+        only rely on its words if it has no regex special characters.
+        """
+        if self.negated or self.use_re or _regex_special_re.search(self._pattern):
+            return None
+        pages = None
+        for word in index.tokenize(self._pattern):
+            found = index.pages_containing(word, fields)
+            if pages is None:
+                pages = found
+            else:
+                pages = pages & found
+        return pages
+
     def __unicode__(self):
         neg = self.negated and '-' or ''
         return u'%s%s"%s"' % (neg, self._tag, unicode(self._pattern))
@@ -270,6 +311,25 @@ class AndExpression(BaseExpression):
 
         return Query(OP_AND_NOT, query, query_negated)
 
+    def moinindex_pages(self, index):
+        return self._index_pages('moinindex_pages', index)
+
+    def linkindex_pages(self, index):
+        return self._index_pages('linkindex_pages', index)
+
+    def _index_pages(self, method, index):
+        if self.negated:
+            return None
+        pages = None
+        for term in self._subterms:
+            found = getattr(term, method)(index)
+            if found is not None:
+                if pages is None:
+                    pages = found
+                else:
+                    pages = pages & found
+        return pages
+
 
 class OrExpression(AndExpression):
     """ A term connecting several sub terms with a logical OR """
@@ -310,10 +370,25 @@ class OrExpression(AndExpression):
         # XXX: negated terms managed by _moinSearch?
         return Query(OP_OR, [term.xapian_term(request, connection) for term in self._subterms])
 
+    def _index_pages(self, method, index):
+        if self.negated:
+            return None
+        pages = set()
+        for term in self._subterms:
+            found = getattr(term, method)(index)
+            if found is None:
+                return None
+            pages |= found
+        return pages
+
 
 class BaseTextFieldSearch(BaseExpression):
 
     _field_to_search = None
+    _moinindex_fields = None
+
+    def moinindex_pages(self, index):
+        return self._moinindex_search(index, self._moinindex_fields)
 
     def xapian_term(self, request, connection):
         if self.use_re:
@@ -363,6 +438,7 @@ class TextSearch(BaseTextFieldSearch):
 
     costs = 10000
     _field_to_search = 'content'
+    _moinindex_fields = ('content', 'title', )
 
     def highlight_re(self):
         if not self.highlight:
@@ -410,6 +486,7 @@ class TitleSearch(BaseTextFieldSearch):
     _tag = 'title:'
     costs = 100
     _field_to_search = 'title'
+    _moinindex_fields = ('title', )
 
     def pageFilter(self):
         """ Page filter function for single title search """
@@ -468,6 +545,13 @@ class LinkSearch(BaseFieldSearch):
 
         return u"(%s)" % self._textpattern
 
+    def linkindex_pages(self, index):
+        if self.negated:
+            return None
+        if self.case and not self.use_re and not _regex_special_re.search(self._pattern):
+            return index.linking_to(prefix=self._pattern)
+        return index.linking_to(search_re=self.search_re)
+
     def _get_matches(self, page):
         # Get matches in page links
         matches = []
@@ -551,6 +635,9 @@ class CategorySearch(BaseFieldSearch):
 
         return u'(\\b%s\\b)' % self._pattern
 
+    def moinindex_pages(self, index):
+        return self._moinindex_search(index, ('content', ))
+
     def xapian_term(self, request, connection):
         # XXX Probably, it is a good idea to inherit this class from
         # BaseFieldSearch and get rid of this definition
@@ -20,6 +20,7 @@
 """
 
 import re
+import threading
 
 from MoinMoin import wikiutil, user
 from MoinMoin.Page import Page
@@ -28,6 +29,9 @@ from MoinMoin.Page import Page
 ### Basic Permissions Interface -- most features enabled by default
 #############################################################################
 
+#: max. number of ACL decisions remembered by ACLDecisionCache (per wiki and process)
+MAX_ACL_DECISIONS = 100000
+
 def _check(request, pagename, username, right):
     """ Check <right> access permission for user <username> on page <pagename>
 
@@ -40,6 +44,9 @@ def _check(request, pagename, username, right):
     For both configurations, we check acl_rights_before before the page/default
     acl and acl_rights_after after the page/default acl, of course.
 
+    If cfg.acl_decision_cache is True, the decision is remembered, see
+    ACLDecisionCache.
+
     This method should not be called by users, use __getattr__ instead.
 
     @param request: the current request object
@@ -50,6 +57,27 @@ def _check(request, pagename, username, right):
     @rtype: bool
     @return: True if you have permission or False
     """
+    if request.cfg.acl_decision_cache:
+        return request.cfg.cache.acl_decisions.check(request, pagename, username, right)
+    return _evaluate(request, pagename, username, right)
+
+
+def _filter(request, pagenames, username, right):
+    """ Return the names in pagenames user <username> has <right> for (see _check) """
+    if request.cfg.acl_decision_cache:
+        return request.cfg.cache.acl_decisions.filter(request, pagenames, username, right)
+    return [pagename for pagename in pagenames
+            if _evaluate(request, pagename, username, right)]
+
+
+def _evaluate(request, pagename, username, right, acls=None):
+    """ Evaluate the ACLs for _check
+
+    @param acls: if given, a dict that gets the acl lines of all pages whose
+                 ACL was used for the decision (pagename -> acl lines)
+    """
+    if acls is None:
+        acls = {}
     cache = request.cfg.cache
     allowed = cache.acl_rights_before.may(request, username, right)
     if allowed is not None:
@@ -64,6 +92,7 @@ def _check(request, pagename, username, right):
             name = '/'.join(pages[:i])
             # Get page acl and ask for permission
             acl = Page(request, name).getACL(request)
+            acls[name] = acl.acl_lines
             if acl.acl:
                 some_acl = True
                 allowed = acl.may(request, username, right)
@@ -83,6 +112,7 @@ def _check(request, pagename, username, right):
         else:
             p = Page(request, pagename)
         acl = p.getACL(request) # this will be fast in a reused page obj
+        acls[pagename] = acl.acl_lines
         allowed = acl.may(request, username, right)
         if allowed is not None:
             return allowed
@@ -94,6 +124,136 @@ def _check(request, pagename, username, right):
     return False
 
 
+class ACLDecisionCache:
+    """ Remembers the decisions of _check for (page, user, right).
+
+    A decision only depends on the ACL of the page (and of its parent pages
+    for acl_hierarchic), the groups, the acl_rights_* config and whether the
+    user is known and trusted. So we drop:
+
+     * the decisions for a page and, for acl_hierarchic, its sub pages, if
+       the edit-log shows a change of the page's ACL
+     * all decisions if a group page, acl_hierarchic or the acl_rights_*
+       ACLs changed
+
+    Groups defined outside of the wiki (e.g. in LDAP) can change without us
+    noticing, use cfg.acl_decision_cache = False if you have those.
+
+    The cache is shared by the threads of a process: all changes are done
+    while holding self._lock, lookups are plain dict accesses.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.decisions = {} # pagename -> {(username, known, trusted, right): allowed}
+        self.acls = {} # pagename -> acl lines some decisions are based on
+        self.count = 0
+        self.generation = 0 # increased whenever decisions are dropped
+        self.log_pos = None
+        self.config = None # acl_hierarchic and acl_rights_* ACLs the decisions are based on
+
+    def clear(self):
+        """ Drop all decisions """
+        self._lock.acquire()
+        try:
+            self._clear()
+        finally:
+            self._lock.release()
+
+    def _clear(self):
+        """ Drop all decisions (caller must hold the lock) """
+        self.decisions = {}
+        self.acls = {}
+        self.count = 0
+        self.generation += 1
+
+    def refresh(self, request):
+        """ Drop the decisions that changes in the wiki may have affected """
+        cfg = request.cfg
+        config = (cfg.acl_hierarchic, cfg.cache.acl_rights_before,
+                  cfg.cache.acl_rights_default, cfg.cache.acl_rights_after)
+        from MoinMoin.logfile import editlog
+        self._lock.acquire()
+        try:
+            if (self.config is None or config[0] != self.config[0] or
+                [acl for acl, old_acl in zip(config[1:], self.config[1:]) if acl is not old_acl]):
+                self._clear()
+                self.config = config
+            new_pos, items = editlog.EditLog(request).news(self.log_pos)
+            if items:
+                self._changed(request, set(items))
+            self.log_pos = new_pos
+        finally:
+            self._lock.release()
+
+    def _changed(self, request, pagenames):
+        """ Drop the decisions depending on pagenames (caller must hold the lock) """
+        group_regex = request.cfg.cache.page_group_regexact
+        for pagename in pagenames:
+            if group_regex.search(pagename):
+                self._clear()
+                return
+        for pagename in pagenames:
+            if pagename not in self.acls:
+                continue # no decision depends on the ACL of this page
+            if Page(request, pagename).getACL(request).acl_lines == self.acls[pagename]:
+                continue
+            del self.acls[pagename]
+            dropped = [pagename]
+            if request.cfg.acl_hierarchic:
+                prefix = pagename + '/'
+                dropped.extend([name for name in self.decisions if name.startswith(prefix)])
+            for name in dropped:
+                self.count -= len(self.decisions.pop(name, ()))
+            self.generation += 1
+
+    def _key(self, request, username, right):
+        known = bool(user.getUserId(request, username))
+        trusted = (request.user.name == username and
+                   request.user.auth_method in request.cfg.auth_methods_trusted)
+        return username, known, trusted, right
+
+    def _decide(self, request, pagename, username, right, key):
+        generation = self.generation
+        acls = {}
+        allowed = _evaluate(request, pagename, username, right, acls)
+        self._lock.acquire()
+        try:
+            if generation == self.generation: # nothing was dropped meanwhile
+                if self.count >= MAX_ACL_DECISIONS:
+                    self._clear()
+                self.decisions.setdefault(pagename, {})[key] = allowed
+                self.acls.update(acls)
+                self.count += 1
+        finally:
+            self._lock.release()
+        return allowed
+
+    def check(self, request, pagename, username, right):
+        """ Return the (remembered) decision of _check """
+        self.refresh(request)
+        key = self._key(request, username, right)
+        try:
+            return self.decisions[pagename][key]
+        except KeyError:
+            return self._decide(request, pagename, username, right, key)
+
+    def filter(self, request, pagenames, username, right):
+        """ Return the names in pagenames user <username> has <right> for """
+        self.refresh(request)
+        key = self._key(request, username, right)
+        decisions = self.decisions
+        result = []
+        for pagename in pagenames:
+            try:
+                allowed = decisions[pagename][key]
+            except KeyError:
+                allowed = self._decide(request, pagename, username, right, key)
+                decisions = self.decisions # may have been cleared
+            if allowed:
+                result.append(pagename)
+        return result
+
+
 class Permissions:
     """ Basic interface for user permissions and system policy.
 
@@ -149,6 +309,24 @@ class Permissions:
             raise AttributeError(attr)
         return lambda pagename: _check(self.request, pagename, self.name, attr)
 
+    def filter(self, right, pagenames):
+        """ Return the names in pagenames the user has <right> for
+
+        This is much faster than checking every page on its own.
+
+        @param right: one of ACL rights as defined in acl_rights_valid
+        @param pagenames: list of page names
+        @rtype: list
+        @return: page names the user has <right> for (in the same order)
+        """
+        if hasattr(self.__class__, right):
+            # the security policy has its own check for this right
+            check = getattr(self, right)
+            return [pagename for pagename in pagenames if check(pagename)]
+        if right not in self.request.cfg.acl_rights_valid:
+            raise AttributeError(right)
+        return _filter(self.request, pagenames, self.name, right)
+
 
 # make an alias for the default policy
 Default = Permissions
@@ -391,4 +391,51 @@ class TestPageAcls(object):
             for right in mayNot:
                 yield _not_have_right, u, right, pagename, hierarchic
 
+class TestACLDecisionCache(object):
+    """ security: remembered ACL decisions get dropped when ACLs change """
+    pagename = u'AclCacheTestPage'
+    other_pagename = u'AclCacheTestOtherPage'
+    groupname = u'AclCacheTestGroup'
+
+    class Config(wikiconfig.Config):
+        acl_rights_before = u"WikiAdmin:admin,read,write,delete,revert"
+        acl_rights_default = u"All:read,write"
+
+    def setup_class(self):
+        self.savedUser = self.request.user.name
+        self.request.user = User(self.request, auth_username=u'WikiAdmin')
+        self.request.user.valid = True
+        self.joe = User(self.request, auth_username=u'JoeDoe')
+        self.jane = User(self.request, auth_username=u'JaneDoe')
+
+    def teardown_class(self):
+        self.request.user.name = self.savedUser
+        for pagename in (self.pagename, self.groupname, ):
+            nuke_page(self.request, pagename)
+
+    def testPageACLChange(self):
+        create_page(self.request, self.pagename, u"#acl JoeDoe:read\nFoo!")
+        assert self.joe.may.read(self.pagename)
+        assert not self.joe.may.write(self.pagename)
+        create_page(self.request, self.pagename, u"#acl JoeDoe:read,write\nFoo!")
+        assert self.joe.may.write(self.pagename)
+
+    def testGroupChange(self):
+        create_page(self.request, self.groupname, u" * JaneDoe\n")
+        create_page(self.request, self.pagename, u"#acl %s:read,write All:\nFoo!" % self.groupname)
+        assert self.jane.may.write(self.pagename)
+        assert not self.joe.may.write(self.pagename)
+        create_page(self.request, self.groupname, u" * JoeDoe\n")
+        assert not self.jane.may.write(self.pagename)
+        assert self.joe.may.write(self.pagename)
+
+    def testFilter(self):
+        create_page(self.request, self.pagename, u"#acl JoeDoe: All:read\nFoo!")
+        pagenames = [self.pagename, self.other_pagename]
+        assert self.joe.may.filter('read', pagenames) == [self.other_pagename]
+        assert self.jane.may.filter('read', pagenames) == pagenames
+        assert self.jane.may.filter('write', pagenames) == [self.other_pagename]
+        py.test.raises(AttributeError, self.jane.may.filter, 'nosuchright', pagenames)
+
+
 coverage_modules = ['MoinMoin.security']
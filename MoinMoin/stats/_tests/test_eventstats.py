@@ -0,0 +1,97 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.stats.eventstats Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import array
+
+from MoinMoin import caching
+from MoinMoin.logfile import eventlog
+from MoinMoin.stats import eventstats
+from MoinMoin._tests import nuke_eventlog
+
+DAY = 86400 * 1000000 # usecs
+
+
+def test_count():
+    counts = array.array('i')
+    eventstats._count(counts, 10, 1, 0)
+    eventstats._count(counts, 10, 0, 1)
+    eventstats._count(counts, 12, 1, 0)
+    eventstats._count(counts, 11, 1, 0) # out of order
+    assert counts.tolist() == [10, 1, 1, 11, 1, 0, 12, 1, 0]
+
+def test_user_agent_type():
+    assert eventstats.user_agent_type('Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1)') == 'MSIE 6.0'
+    assert eventstats.user_agent_type('Wget/1.12 (linux-gnu)') == 'Wget/1.12'
+    assert eventstats.user_agent_type(' ') == 'unknown'
+
+
+class TestEventStats:
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageEventStats'
+
+    def setup_method(self, method):
+        nuke_eventlog(self.request)
+        caching.CacheEntry(self.request, 'charts', 'eventstats', scope='wiki').remove()
+
+    def teardown_method(self, method):
+        self.setup_method(method)
+
+    def add(self, eventtype, day, pagename=None):
+        values = {}
+        if pagename:
+            values['pagename'] = pagename
+        eventlog.EventLog(self.request).add(self.request, eventtype, values,
+                                            mtime_usecs=day * DAY + 1000)
+
+    def testDaily(self):
+        self.add('VIEWPAGE', 100, self.pagename)
+        self.add('VIEWPAGE', 100, u'FrontPage')
+        self.add('SAVEPAGE', 100, self.pagename)
+        self.add('VIEWPAGE', 103, self.pagename)
+        self.add('SAVEPAGE', 103) # does not belong to a page
+        stats = eventstats.EventStats(self.request)
+        assert stats.daily() == ([100, 101, 102, 103], [2, 0, 0, 1], [1, 0, 0, 1])
+        assert stats.daily(self.pagename) == ([100, 101, 102, 103], [1, 0, 0, 1], [1, 0, 0, 0])
+        assert stats.daily(u'FrontPage') == ([100], [1], [0])
+        assert stats.daily(u'NoSuchPage') == ([], [], [])
+
+    def testIncremental(self):
+        stats = eventstats.EventStats(self.request)
+        self.add('VIEWPAGE', 100, self.pagename)
+        assert stats.pagehits()[self.pagename] == 1
+        offset = stats.data()['offset']
+        self.add('VIEWPAGE', 101, self.pagename)
+        self.add('LOGIN', 101)
+        assert stats.pagehits()[self.pagename] == 2
+        assert stats.data()['offset'] > offset
+        # a new event-log starts new counters
+        nuke_eventlog(self.request)
+        self.add('VIEWPAGE', 102, u'FrontPage')
+        assert stats.pagehits() == {u'FrontPage': 1}
+
+    def testPagehitsSince(self):
+        self.add('VIEWPAGE', 100, self.pagename)
+        self.add('VIEWPAGE', 105, self.pagename)
+        self.add('VIEWPAGE', 106, self.pagename)
+        hits = eventstats.EventStats(self.request).pagehits(since=105 * 86400 + 3600)
+        assert hits == {self.pagename: 2}
+
+    def testBadLines(self):
+        self.add('VIEWPAGE', 100, self.pagename)
+        eventlog.EventLog(self.request).add(self.request, 'VIEWPAGE', add_http_info=0,
+                                            values={'HTTP_USER_AGENT': ' '},
+                                            mtime_usecs=100 * DAY + 2000)
+        f = file(self.request.rootpage.getPagePath('event-log', isfile=1), 'ab')
+        f.write('%d\tVIEWPAGE\tpagename=%%FF\n' % (100 * DAY + 3000))
+        f.close()
+        self.add('VIEWPAGE', 101, self.pagename)
+        stats = eventstats.EventStats(self.request)
+        assert stats.daily(self.pagename) == ([100, 101], [1, 1], [0, 0])
+        assert stats.data()['agents']['unknown'] == 1
+
+
+coverage_modules = ['MoinMoin.stats.eventstats']
@@ -0,0 +1,260 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - event-log statistics
+
+    Aggregates the page views and saves of the event-log into counters the
+    statistics (hitcounts and useragents charts, Hits and PageHits macros)
+    are served from:
+
+     * views and edits per day for the whole wiki
+     * views and edits per day for each page
+     * views and edits per user agent type
+
+    The per day counters are kept as array.array('i') of (day, views, edits)
+    triples, day being the number of days since the epoch (UTC). Only days
+    with events have an entry.
+
+    We remember the byte offset up to which the event-log was read, so an
+    update only reads (in chunks) the events added since the last update.
+    If the event-log got replaced (e.g. rotated), we start from scratch.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import array
+import time
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching, wikiutil
+from MoinMoin.logfile.eventlog import EventLog
+
+USECS_PER_DAY = 86400 * 1000000
+COUNTED_EVENTS = ('VIEWPAGE', 'SAVEPAGE', )
+CHUNK_SIZE = 1024 * 1024 # bytes read from the event-log at once
+HEAD_SIZE = 256 # bytes at the begin of the event-log used to recognize it
+
+
+def user_agent_type(ua):
+    """ Return the type of user agent ua (e.g. "Mozilla/5.0") """
+    try:
+        pos = ua.index(" (compatible; ")
+        return ua[pos:].split(';')[1].strip()
+    except (ValueError, IndexError):
+        return ua.strip() and ua.split()[0] or 'unknown'
+
+
+def _count(counts, day, views, edits):
+    """ Add views and edits of day to the (day, views, edits) triples in counts """
+    i = len(counts) - 3
+    while i >= 0 and counts[i] > day: # events are usually in order, so this is rare
+        i -= 3
+    if i >= 0 and counts[i] == day:
+        counts[i + 1] += views
+        counts[i + 2] += edits
+    else:
+        counts[i + 3:i + 3] = array.array('i', (day, views, edits))
+
+
+def _empty_data():
+    return {'offset': 0, 'head': '', 'wiki': array.array('i'), 'pages': {}, 'agents': {}, }
+
+
+class EventStats(object):
+    """ Counters of page views and edits, aggregated from the event-log """
+
+    def __init__(self, request):
+        self.request = request
+
+    def _cache(self):
+        return caching.CacheEntry(self.request, 'charts', 'eventstats', scope='wiki',
+                                  use_pickle=True, do_locking=False)
+
+    def _load(self, cache):
+        """ Return the data stored in cache (or None) """
+        try:
+            stored = cache.content()
+        except caching.CacheError:
+            return None
+        data = dict(stored)
+        data['wiki'] = array.array('i', stored['wiki'])
+        data['pages'] = dict([(pagename, array.array('i', counts))
+                              for pagename, counts in stored['pages'].iteritems()])
+        return data
+
+    def _save(self, cache, data):
+        stored = dict(data)
+        stored['wiki'] = data['wiki'].tostring()
+        stored['pages'] = dict([(pagename, counts.tostring())
+                                for pagename, counts in data['pages'].iteritems()])
+        cache.update(stored)
+        self.request.cfg.cache.eventstats = cache.uid(), data
+
+    def _filename(self):
+        return self.request.rootpage.getPagePath('event-log', isfile=1)
+
+    def _log_state(self):
+        """ Return size and head of the event-log (None, None if it is missing) """
+        # count the events this process still has buffered, too
+        EventLog(self.request, filename=self._filename()).flush()
+        try:
+            f = file(self._filename(), 'rb')
+        except IOError:
+            return None, None
+        try:
+            head = f.read(HEAD_SIZE)
+            f.seek(0, 2)
+            return f.tell(), head
+        finally:
+            f.close()
+
+    def _is_current(self, data, size, head):
+        return size is None or (size == data['offset'] and head.startswith(data['head']))
+
+    def data(self):
+        """ Return the current counters (do not modify them!) """
+        cfg = self.request.cfg
+        cache = self._cache()
+        uid = cache.uid()
+        memory = getattr(cfg.cache, 'eventstats', None)
+        if memory is not None and memory[0] == uid and uid is not None:
+            data = memory[1]
+        else:
+            data = self._load(cache)
+            if data is not None:
+                cfg.cache.eventstats = uid, data
+        size, head = self._log_state()
+        if data is None or not self._is_current(data, size, head):
+            data = self.update()
+        return data
+
+    def update(self):
+        """ Fold the events added to the event-log since the last update into
+            the counters.
+
+        @return: the updated counters
+        """
+        cache = self._cache()
+        cache.lock('w')
+        try:
+            data = self._load(cache)
+            size, head = self._log_state()
+            if data is None or (size is not None and not head.startswith(data['head'])):
+                # no counters yet or a new event-log
+                data = _empty_data()
+            if not self._is_current(data, size, head):
+                self._read_log(data)
+                data['head'] = head[:min(data['offset'], HEAD_SIZE)]
+            self._save(cache, data)
+        finally:
+            cache.unlock()
+        return data
+
+    def _read_log(self, data):
+        """ Read the event-log from data['offset'] and count its events """
+        started = time.time()
+        offset = data['offset']
+        f = file(self._filename(), 'rb')
+        try:
+            f.seek(offset)
+            rest = ''
+            events = 0
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split('\n')
+                rest = lines.pop() # incomplete line (or '')
+                for line in lines:
+                    offset += len(line) + 1
+                    try:
+                        usecs, event_type, kvpairs = line.rstrip().split('\t')
+                        day = int(usecs) // USECS_PER_DAY
+                    except ValueError:
+                        continue # badly formatted line, skip it
+                    if event_type not in COUNTED_EVENTS:
+                        continue
+                    try:
+                        self._count_event(data, day, event_type, kvpairs)
+                    except Exception:
+                        # a single bad line must not stop counting forever
+                        logging.exception("eventstats: skipping event-log line %r" % line)
+                        continue
+                    events += 1
+        finally:
+            f.close()
+        data['offset'] = offset
+        logging.debug("eventstats: counted %d events in %.3fs" % (events, time.time() - started))
+
+    def _count_event(self, data, day, event_type, kvpairs):
+        """ Add a VIEWPAGE or SAVEPAGE event of day to the counters in data """
+        views, edits = event_type == 'VIEWPAGE' and (1, 0) or (0, 1)
+        values = wikiutil.parseQueryString(kvpairs)
+        pagename = values.get('pagename')
+        ua = values.get('HTTP_USER_AGENT')
+        if ua:
+            ua = user_agent_type(ua)
+        _count(data['wiki'], day, views, edits)
+        if pagename:
+            pages = data['pages']
+            counts = pages.get(pagename)
+            if counts is None:
+                counts = pages[pagename] = array.array('i')
+            _count(counts, day, views, edits)
+        if ua:
+            agents = data['agents']
+            agents[ua] = agents.get(ua, 0) + 1
+
+    def daily(self, pagename=None):
+        """ Return views and edits per day, including days without events
+            between the first and the last day with events.
+
+        @param pagename: only count events of this page (default: all events)
+        @return: (days, views, edits) lists, days as days since the epoch
+        """
+        data = self.data()
+        if pagename is None:
+            counts = data['wiki']
+        else:
+            counts = data['pages'].get(pagename, array.array('i'))
+        days, views, edits = [], [], []
+        for i in xrange(0, len(counts), 3):
+            day = counts[i]
+            if days:
+                for empty_day in xrange(days[-1] + 1, day):
+                    days.append(empty_day)
+                    views.append(0)
+                    edits.append(0)
+            days.append(day)
+            views.append(counts[i + 1])
+            edits.append(counts[i + 2])
+        return days, views, edits
+
+    def pagehits(self, since=None):
+        """ Return dict pagename -> number of views
+
+        @param since: only count views on or after the day of this time [s]
+        """
+        pages = self.data()['pages']
+        if since is None:
+            return dict([(pagename, sum(counts[1::3])) for pagename, counts in pages.iteritems()])
+        since = int(since) // 86400
+        hits = {}
+        for pagename, counts in pages.iteritems():
+            views = 0
+            for i in xrange(len(counts) - 3, -1, -3):
+                if counts[i] < since:
+                    break
+                views += counts[i + 1]
+            if views:
+                hits[pagename] = views
+        return hits
+
+    def useragents(self):
+        """ Return list of (count, user agent type), most frequent first """
+        agents = [(count, ua) for ua, count in self.data()['agents'].items()]
+        agents.sort()
+        agents.reverse()
+        return agents
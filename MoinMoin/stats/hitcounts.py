@@ -2,7 +2,8 @@
 """
     MoinMoin - Hitcount Statistics
 
-    This macro creates a hitcount chart from the data in "event.log".
+    This macro creates a hitcount chart from the data in "event.log"
+    (aggregated by MoinMoin.stats.eventstats).
 
     TODO: refactor to use a class, this code is ugly.
           A lot of code here is duplicated in stats.useragents.
@@ -17,12 +18,10 @@ _debug = 0
 
 import time
 
-from MoinMoin import caching, wikiutil, logfile
+from MoinMoin import wikiutil
 from MoinMoin.Page import Page
-from MoinMoin.logfile import eventlog
+from MoinMoin.stats import eventstats
 
-# this is a CONSTANT used for on-disk caching, it must NOT be configurable and
-# not depend on request.user!
 DATE_FMT = '%04d-%02d-%02d' # % (y, m, d)
 
 def linkto(pagename, request, params=''):
@@ -52,90 +51,13 @@ def linkto(pagename, request, params=''):
 
 
 def get_data(pagename, request, filterpage=None):
-    cache_days, cache_views, cache_edits = [], [], []
-    cache_date = 0
+    """ Return views and edits per day (of filterpage or of all pages)
 
-    # Get results from cache
-    if filterpage:
-        arena = Page(request, pagename)
-        cache = caching.CacheEntry(request, arena, 'hitcounts', scope='item', use_pickle=True)
-    else:
-        arena = 'charts'
-        cache = caching.CacheEntry(request, arena, 'hitcounts', scope='wiki', use_pickle=True)
-
-    if cache.exists():
-        try:
-            cache_date, cache_days, cache_views, cache_edits = cache.content()
-        except:
-            cache.remove() # cache gone bad
-
-    # Get new results from the log
-    log = eventlog.EventLog(request)
-    try:
-        new_date = log.date()
-    except logfile.LogMissing:
-        new_date = None
-
-    # prepare data
-    days = []
-    views = []
-    edits = []
-    ratchet_day = None
-    ratchet_time = None
-    if new_date is not None:
-        log.set_filter(['VIEWPAGE', 'SAVEPAGE'])
-        latest = None
-        for event in log.reverse():
-            # don't use event_log.date()
-            if latest is None:
-                latest = event[0]
-            event_usecs = event[0]
-            if event_usecs <= cache_date:
-                break
-            eventpage = event[2].get('pagename', '')
-            if filterpage and eventpage != filterpage:
-                continue
-            event_secs = wikiutil.version2timestamp(event_usecs)
-            time_tuple = time.gmtime(event_secs) # must be UTC
-            day = tuple(time_tuple[0:3])
-            if day != ratchet_day:
-                # new day
-                while ratchet_time:
-                    ratchet_time -= 86400 # seconds per day
-                    rday = tuple(time.gmtime(ratchet_time)[0:3]) # must be UTC
-                    if rday <= day:
-                        break
-                    days.append(DATE_FMT % rday)
-                    views.append(0)
-                    edits.append(0)
-                days.append(DATE_FMT % day)
-                views.append(0)
-                edits.append(0)
-                ratchet_day = day
-                ratchet_time = event_secs
-            if event[1] == 'VIEWPAGE':
-                views[-1] += 1
-            elif event[1] == 'SAVEPAGE':
-                edits[-1] += 1
-
-        days.reverse()
-        views.reverse()
-        edits.reverse()
-
-    # merge the day on the end of the cache
-    if cache_days and days and days[0] == cache_days[-1]:
-        cache_edits[-1] += edits[0]
-        cache_views[-1] += views[0]
-        days, views, edits = days[1:], views[1:], edits[1:]
-
-    # Update and save the cache
-    cache_days.extend(days)
-    cache_views.extend(views)
-    cache_edits.extend(edits)
-    if new_date is not None:
-        cache.update((latest, cache_days, cache_views, cache_edits))
-
-    return cache_days, cache_views, cache_edits
+    @return: (days, views, edits) lists, days formatted with DATE_FMT
+    """
+    days, views, edits = eventstats.EventStats(request).daily(filterpage or None)
+    days = [DATE_FMT % time.gmtime(day * 86400)[0:3] for day in days] # must be UTC
+    return days, views, edits
 
 
 def text(pagename, request, params=''):
@@ -0,0 +1,186 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - page subscription index
+
+    Page.getSubscribers used to compile every subscription pattern of every
+    subscriber whenever a page was saved. The SubscriptionIndex built from
+    the 'pagesubscriptions' cache instead has:
+
+     * a dict page name -> subscriber ids for the exact matches
+     * the regular expression subscriptions (without duplicates), combined
+       into few alternations that tell whether any pattern of a chunk
+       matches at all; only for matching chunks the (precompiled) patterns
+       of the chunk are checked to find the subscribers
+
+    The index of a process is kept in cfg.cache.subscriptions together with
+    the uid of the cache file it was built from. User.updatePageSubCache
+    updates it incrementally, other processes rebuild it when they see
+    the cache file changed.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import re
+import threading
+
+MAX_COMBINED = 50 # patterns per combined regular expression
+
+# patterns using no regex syntax only match themselves
+_regex_chars = re.compile(r'[.^$*+?{}\[\]\\|()]')
+# patterns that may change the meaning of other patterns when combined
+# (global flags, back references)
+_uncombinable = re.compile(r'\(\?[iLmsux]|\(\?P=|\\[0-9]')
+
+
+def is_regex(pattern):
+    """ Does pattern match other names than itself? """
+    return _regex_chars.search(pattern) is not None
+
+
+class SubscriptionIndex(object):
+    """ Finds the subscribers of pages """
+
+    def __init__(self, page_sub):
+        """
+        @param page_sub: dict user id -> {'subscribed_pages': patterns, ...}
+                         (content of the pagesubscriptions cache)
+        """
+        self.lock = threading.Lock()
+        self.subscriptions = {} # uid -> patterns
+        self.exact = {} # pattern -> set of uids (every pattern matches itself)
+        self.regexes = {} # regex pattern -> set of uids
+        self.compiled = {} # regex pattern -> compiled regex or None (invalid)
+        self.chunks = None # list of (combined regex or None, regex patterns)
+        for uid, entry in page_sub.items():
+            self._add(uid, entry['subscribed_pages'])
+
+    def _add(self, uid, patterns):
+        self.subscriptions[uid] = list(patterns)
+        for pattern in patterns:
+            self.exact.setdefault(pattern, set()).add(uid)
+            if is_regex(pattern):
+                if pattern not in self.regexes:
+                    self.chunks = None
+                self.regexes.setdefault(pattern, set()).add(uid)
+
+    def _remove(self, uid):
+        for pattern in self.subscriptions.pop(uid, ()):
+            for index in (self.exact, self.regexes):
+                uids = index.get(pattern)
+                if uids is not None:
+                    uids.discard(uid)
+                    if not uids:
+                        del index[pattern]
+                        if index is self.regexes:
+                            self.chunks = None
+
+    def set_user(self, uid, patterns):
+        """ Update the subscriptions of user uid (no patterns: remove the user) """
+        self.lock.acquire()
+        try:
+            self._remove(uid)
+            if patterns:
+                self._add(uid, patterns)
+        finally:
+            self.lock.release()
+
+    def _compile(self, pattern):
+        try:
+            return self.compiled[pattern]
+        except KeyError:
+            try:
+                regex = re.compile(r'^%s$' % pattern, re.M)
+            except re.error:
+                regex = None # ignored, like User.isSubscribedTo does
+            self.compiled[pattern] = regex
+            return regex
+
+    def _make_chunks(self):
+        chunks = []
+        combinable = []
+        for pattern in sorted(self.regexes):
+            if self._compile(pattern) is None:
+                continue
+            if _uncombinable.search(pattern):
+                chunks.append((None, [pattern]))
+            else:
+                combinable.append(pattern)
+        for start in range(0, len(combinable), MAX_COMBINED):
+            patterns = combinable[start:start + MAX_COMBINED]
+            try:
+                combined = re.compile('|'.join([r'(?:^%s$)' % pattern for pattern in patterns]), re.M)
+            except (re.error, AssertionError, OverflowError): # e.g. same group name used twice
+                combined = None
+            chunks.append((combined, patterns))
+        # forget compiled patterns nobody subscribes to any more
+        for pattern in self.compiled.keys():
+            if pattern not in self.regexes:
+                del self.compiled[pattern]
+        return chunks
+
+    def match(self, pages):
+        """ Return the ids of the users subscribed to any of pages
+
+        @param pages: page names (and interwiki page names)
+        @rtype: set
+        """
+        self.lock.acquire()
+        try:
+            result = set()
+            for pagename in pages:
+                result.update(self.exact.get(pagename, ()))
+            if not self.regexes:
+                return result
+            if self.chunks is None:
+                self.chunks = self._make_chunks()
+            text = '\n'.join(pages)
+            for combined, patterns in self.chunks:
+                if combined is not None and not combined.search(text):
+                    continue
+                for pattern in patterns:
+                    uids = self.regexes[pattern]
+                    if not uids.issubset(result) and self.compiled[pattern].search(text):
+                        result.update(uids)
+            return result
+        finally:
+            self.lock.release()
+
+
+def get_index(request, cache):
+    """ Return (page_sub, SubscriptionIndex) for the pagesubscriptions cache
+
+    @param cache: CacheEntry of the pagesubscriptions cache (must exist)
+    """
+    cache_uid = cache.uid()
+    current = request.cfg.cache.subscriptions
+    if current is not None and current[0] == cache_uid:
+        return current[1], current[2]
+    page_sub = cache.content()
+    return set_index(request, cache_uid, page_sub)
+
+
+def set_index(request, cache_uid, page_sub):
+    """ Build the index for page_sub, written to a cache with uid cache_uid """
+    request.clock.start('subscriptionindex')
+    index = SubscriptionIndex(page_sub)
+    request.cfg.cache.subscriptions = cache_uid, page_sub, index
+    request.clock.stop('subscriptionindex')
+    return page_sub, index
+
+
+def user_changed(request, old_uid, new_uid, page_sub, uid):
+    """ Update the index after the subscriptions of user uid changed
+
+    @param old_uid: uid of the cache before the change
+    @param new_uid: uid of the cache after the change
+    @param page_sub: new content of the cache
+    @param uid: user id
+    """
+    current = request.cfg.cache.subscriptions
+    if current is None or current[0] != old_uid:
+        return # not built from the old cache, will be rebuilt when needed
+    index = current[2]
+    entry = page_sub.get(uid)
+    index.set_user(uid, entry and entry['subscribed_pages'])
+    request.cfg.cache.subscriptions = new_uid, page_sub, index
@@ -16,7 +16,8 @@
 
     @copyright: 2000-2004 Juergen Hermann <jh@web.de>,
                 2003-2013 MoinMoin:ThomasWaldmann,
-                2010 Michael Foetsch <foetsch@yahoo.com>
+                2010 Michael Foetsch <foetsch@yahoo.com>,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -34,7 +35,7 @@ except ImportError:
 from MoinMoin import log
 logging = log.getLogger(__name__)
 
-from MoinMoin import config, caching, wikiutil, i18n, events
+from MoinMoin import config, caching, wikiutil, i18n, events, subscriptionindex
 from werkzeug.security import safe_str_cmp as safe_str_equal
 from MoinMoin.util import timefuncs, random_string
 from MoinMoin.wikiutil import url_quote_plus
@@ -43,6 +44,9 @@ from MoinMoin.wikiutil import url_quote_plus
 # the attribute names in here should be uniquely identifying a user.
 CACHED_USER_ATTRS = ['name', 'email', 'jid', 'openids', ]
 
+# how many failed lookups we remember (per process), see _getUserIdByKey
+MAX_LOOKUP_MISSES = 10000
+
 
 def getUserList(request):
     """ Get a list of all (numerical) user IDs.
@@ -101,40 +105,52 @@ def _getUserIdByKey(request, key, search, case=True):
     cfg = request.cfg
     try:
         attr2id = getattr(cfg.cache, cfg_cache_attr)
-        from_disk = False
     except AttributeError:
         # no in-memory cache there - initialize it / load it from disk
         loadLookupCaches(request)
         attr2id = getattr(cfg.cache, cfg_cache_attr)
-        from_disk = True  # we just loaded the stuff from disk
     uid = attr2id.get(search, None)
-    if uid is None and not from_disk:
-        # we do not have the entry we searched for.
-        # we didn't find it in some in-memory cache, try refreshing these from disk
-        loadLookupCaches(request)
-        attr2id = getattr(cfg.cache, cfg_cache_attr)
-        from_disk = True  # we just loaded the stuff from disk
-        uid = attr2id.get(search, None)
     if uid is None:
         # we do not have the entry we searched for.
+        # if some other process has updated the on-disk cache meanwhile,
+        # refresh our in-memory cache from disk
+        diskcache = caching.CacheEntry(request, 'users', 'lookup', scope='userdir', use_pickle=True)
+        disk_uid = diskcache.uid()
+        if disk_uid != cfg.cache.userid_lookup_uid:
+            loadLookupCaches(request)
+            attr2id = getattr(cfg.cache, cfg_cache_attr)
+            uid = attr2id.get(search, None)
+    if uid is None:
         # we don't have it in the on-disk cache, cache MISS.
         # could be because:
         # a) ok: we have no such search value in the profiles
         # b) fault: the cache is incoherent with the profiles
         # c) fault: reading the cache from disk failed, due to an error
         # d) ok: same as c), but just because no ondisk cache has been built yet
-        rebuildLookupCaches(request)  # XXX expensive
-        attr2id = getattr(cfg.cache, cfg_cache_attr)
-        uid = attr2id.get(search, None)
+        # We remember misses, so repeated lookups for the same non-existing
+        # value are cheap, and only rebuild the cache if there is no
+        # on-disk cache or the user profiles have changed behind our back.
+        misses = cfg.cache.userid_lookup_misses
+        if (cfg_cache_attr, search) not in misses:
+            if disk_uid is None or not checkLookupCaches(request):
+                rebuildLookupCaches(request)  # XXX expensive
+                attr2id = getattr(cfg.cache, cfg_cache_attr)
+                uid = attr2id.get(search, None)
+            if uid is None:
+                misses = cfg.cache.userid_lookup_misses
+                if len(misses) >= MAX_LOOKUP_MISSES:
+                    misses.clear()
+                misses.add((cfg_cache_attr, search))
     return uid
 
 
-def setMemoryLookupCaches(request, cache):
+def setMemoryLookupCaches(request, cache, uid=None):
     """set the in-memory cache from the given cache contents
 
     @param request: the request object
     @param cache: either a dict of attrname -> attrcache to set the in-memory cache,
                   or None to delete the in-memory cache.
+    @param uid: uid of the on-disk cache the contents were read from
     """
     for attrname in CACHED_USER_ATTRS:
         if cache is None:
@@ -149,20 +165,90 @@ def setMemoryLookupCaches(request, cache):
         else:
             setattr(request.cfg.cache, attrname + "2id", cache[attrname])
             setattr(request.cfg.cache, attrname + "2id_lower", cache[attrname + "_lower"])
+    request.cfg.cache.userid_lookup_uid = uid
+    request.cfg.cache.userid_lookup_state = cache and cache.get('userdir_state')
+    request.cfg.cache.userid_lookup_misses = set()
 
 
 def loadLookupCaches(request):
     """load lookup cache contents into memory: cfg.cache.XXX2id"""
     scope, arena, cachekey = 'userdir', 'users', 'lookup'
     diskcache = caching.CacheEntry(request, arena, cachekey, scope=scope, use_pickle=True)
+    uid = diskcache.uid()
     try:
         cache = diskcache.content()
     except caching.CacheError:
         cache = {}
         for attrname in CACHED_USER_ATTRS:
             cache[attrname] = {}
+        uid = None
     cache_with_lowercase = addLowerCaseKeys(cache)
-    setMemoryLookupCaches(request, cache_with_lowercase)
+    setMemoryLookupCaches(request, cache_with_lowercase, uid)
+
+
+def _userListChecksum(userlist):
+    """ Return a checksum for a list of user ids.
+
+    It is (count, xor of the hashes of the ids), so it can be updated
+    incrementally when a single profile is created or removed (see
+    _updateUserListChecksum).
+    """
+    checksum = (0, 0)
+    for userid in userlist:
+        checksum = _updateUserListChecksum(checksum, userid, 1)
+    return checksum
+
+
+def _updateUserListChecksum(checksum, userid, count):
+    """ Add (count=1) or remove (count=-1) userid to/from a checksum """
+    hashed = int(hashlib.md5(userid).hexdigest()[:16], 16)
+    return checksum[0] + count, checksum[1] ^ hashed
+
+
+def _userDirMtime(request):
+    try:
+        return os.stat(request.cfg.user_dir).st_mtime
+    except OSError:
+        return None
+
+
+def checkLookupCaches(request):
+    """ Check whether the lookup cache still matches the user profiles on disk.
+
+    As long as the user_dir mtime did not change, this is just a stat call.
+    Otherwise we compare the checksum of the user id list with the one
+    kept in the cache (this does not read any profile) and remember the
+    mtime if they still match.
+
+    @param request: the request object
+    @rtype: bool
+    @return: True if the cache is consistent with the user profiles
+    """
+    state = request.cfg.cache.userid_lookup_state
+    if state is None:
+        return False
+    mtime = _userDirMtime(request)
+    if mtime == state['mtime']:
+        return True
+    if _userListChecksum(getUserList(request)) != state['checksum']:
+        logging.info("user lookup cache is inconsistent with user profiles")
+        return False
+
+    scope, arena, key = 'userdir', 'users', 'lookup'
+    diskcache = caching.CacheEntry(request, arena, key, scope=scope, use_pickle=True, do_locking=False)
+    diskcache.lock('w')
+    try:
+        try:
+            cache = diskcache.content()
+        except caching.CacheError:
+            return False
+        if cache.get('userdir_state') == state:
+            cache['userdir_state'] = {'mtime': mtime, 'checksum': state['checksum']}
+            diskcache.update(cache)
+            setMemoryLookupCaches(request, addLowerCaseKeys(cache), diskcache.uid())
+    finally:
+        diskcache.unlock()
+    return True
 
 
 def rebuildLookupCaches(request):
@@ -177,7 +263,9 @@ def rebuildLookupCaches(request):
     cache = {}
     for attrname in CACHED_USER_ATTRS:
         cache[attrname] = {}
-    for userid in getUserList(request):
+    mtime = _userDirMtime(request)
+    userlist = getUserList(request)
+    for userid in userlist:
         u = User(request, id=userid)
         if u.valid:
             for attrname in CACHED_USER_ATTRS:
@@ -189,10 +277,11 @@ def rebuildLookupCaches(request):
                             attr2id[val] = userid
                     else:
                         attr2id[value] = userid
+    cache['userdir_state'] = {'mtime': mtime, 'checksum': _userListChecksum(userlist)}
 
     cache_with_lowercase = addLowerCaseKeys(cache)
-    setMemoryLookupCaches(request, cache_with_lowercase)
     diskcache.update(cache)
+    setMemoryLookupCaches(request, cache_with_lowercase, diskcache.uid())
     diskcache.unlock()
     return cache
 
@@ -573,6 +662,7 @@ class User:
     def remove(self):
         """ Remove user profile from disk """
         os.remove(self.__filename())
+        self.updateLookupCaches(removed=True)
 
     def load_from_id(self, password=None):
         """ Load user account data from disk.
@@ -778,6 +868,7 @@ class User:
         # !!! should write to a temp file here to avoid race conditions,
         # or even better, use locking
 
+        created = not os.path.exists(self.__filename())
         data = codecs.open(self.__filename(), "w", config.charset)
         data.write("# Data saved '%s' for id '%s'\n" % (
             time.strftime(self._cfg.datetime_fmt, time.localtime(time.time())),
@@ -801,7 +892,7 @@ class User:
         if not self.disabled:
             self.valid = 1
 
-        self.updateLookupCaches()
+        self.updateLookupCaches(created=created)
 
         if not self._stored:
             self._stored = True
@@ -1005,6 +1096,7 @@ class User:
             return  # if no cache file exists, just don't do anything
 
         cache.lock('w')
+        old_uid = cache.uid()
         page_sub = cache.content()
 
         # we only store entries for valid users with some page subscriptions
@@ -1018,10 +1110,15 @@ class User:
             del page_sub[self.id]
 
         cache.update(page_sub)
+        subscriptionindex.user_changed(self._request, old_uid, cache.uid(), page_sub, self.id)
         cache.unlock()
 
-    def updateLookupCaches(self):
-        """ When a user profile is saved, we update the userid lookup caches """
+    def updateLookupCaches(self, created=False, removed=False):
+        """ When a user profile is saved, we update the userid lookup caches
+
+        @param created: the profile was newly created on disk
+        @param removed: the profile was removed from disk
+        """
 
         scope, arena, key = 'userdir', 'users', 'lookup'
 
@@ -1041,7 +1138,7 @@ class User:
                     del attr2id[key]
 
         # then, if user is valid, update with the current attr values:
-        if self.valid:
+        if self.valid and not removed:
             for attrname in CACHED_USER_ATTRS:
                 if hasattr(self, attrname):
                     value = getattr(self, attrname)
@@ -1054,9 +1151,14 @@ class User:
                         else:
                             attr2id[value] = userid
 
+        # keep the checksum of the user id list up to date, see checkLookupCaches
+        state = cache.get('userdir_state')
+        if state is not None and (created or removed):
+            state['checksum'] = _updateUserListChecksum(state['checksum'], userid, created and 1 or -1)
+
         cache_with_lowercase = addLowerCaseKeys(cache)
-        setMemoryLookupCaches(self._request, cache_with_lowercase)
         diskcache.update(cache)
+        setMemoryLookupCaches(self._request, cache_with_lowercase, diskcache.uid())
         diskcache.unlock()
 
     # -----------------------------------------------------------------
@@ -0,0 +1,116 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.util.metrics Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin import caching
+from MoinMoin.util import metrics
+from MoinMoin.util.clock import Clock
+
+
+def make_clock(**timings):
+    clock = Clock()
+    for timer, value in timings.items():
+        clock.timings[timer] = value
+        clock.states[timer] = -1
+    return clock
+
+
+class TestHistogram:
+
+    def testQuantile(self):
+        histogram = metrics.Histogram()
+        assert histogram.quantile(0.5) is None
+        for value in [0.0005] * 90 + [0.3] * 9 + [20.0]:
+            histogram.add(value)
+        assert histogram.count() == 100
+        assert histogram.quantile(0.5) == 0.001
+        assert histogram.quantile(0.99) == 0.5
+        assert histogram.quantile(1.0) == float('inf')
+
+    def testMerge(self):
+        first, second = metrics.Histogram(), metrics.Histogram()
+        first.add(0.002)
+        second.add(0.002)
+        second.add(0.2)
+        first.merge(second)
+        assert first.count() == 3
+        assert abs(first.sum - 0.204) < 1e-9
+
+
+class TestMetrics:
+
+    def setup_method(self, method):
+        for key in caching.get_cache_list(self.request, 'metrics', 'wiki'):
+            caching.CacheEntry(self.request, 'metrics', key, scope='wiki').remove()
+
+    teardown_method = setup_method
+
+    def testRecord(self):
+        m = metrics.Metrics()
+        clock = make_clock(total=0.02, send_page=0.01)
+        clock.timings['send_page|1'] = 0.005 # recursive timer
+        clock.timings['getACL'] = 0.1
+        clock.states['getACL'] = 0 # still running
+        m.record('show', clock)
+        m.record('show', make_clock(total=0.2))
+        assert sorted(m.histograms.keys()) == [('show', 'send_page'), ('show', 'total')]
+        assert m.histograms[('show', 'total')].count() == 2
+
+    def testTooManyActions(self):
+        m = metrics.Metrics()
+        for i in range(metrics.MAX_ACTIONS + 10):
+            m.record('action%d' % i, make_clock(total=0.01))
+        assert len(m.actions) == metrics.MAX_ACTIONS + 1
+        assert m.histograms[(metrics.OTHER_ACTION, 'total')].count() == 10
+
+    def testCollect(self):
+        other = metrics.Metrics()
+        other.process = 'otherhost-1'
+        other.record('show', make_clock(total=0.02))
+        self.request.cfg.metrics_interval, saved_interval = 0, self.request.cfg.metrics_interval
+        try:
+            other.maybe_save(self.request)
+        finally:
+            self.request.cfg.metrics_interval = saved_interval
+        m = metrics.Metrics()
+        m.record('show', make_clock(total=0.2))
+        processes, histograms, caches, unresolved = m.collect(self.request)
+        assert processes == 2
+        assert histograms[('show', 'total')].count() == 2
+        assert 'meta' in caches
+        assert 'interwiki' in caches
+
+    def testCollectRemovesStale(self):
+        dead = metrics.Metrics()
+        dead.process = 'otherhost-2'
+        dead.record('show', make_clock(total=0.02))
+        snapshot = dead.snapshot(self.request.cfg)
+        snapshot['time'] -= metrics.STALE_INTERVALS * self.request.cfg.metrics_interval + 1
+        dead._cache(self.request).update(snapshot)
+        m = metrics.Metrics()
+        m.record('show', make_clock(total=0.2))
+        processes, histograms, caches, unresolved = m.collect(self.request)
+        assert processes == 1
+        assert histograms[('show', 'total')].count() == 1
+        assert not dead._cache(self.request).exists()
+
+    def testReport(self):
+        saved_metrics = self.request.cfg.cache.metrics
+        try:
+            m = self.request.cfg.cache.metrics = metrics.Metrics()
+            m.record(u'show', make_clock(total=0.02))
+            text = metrics.report(self.request)
+        finally:
+            self.request.cfg.cache.metrics = saved_metrics
+        assert 'moin_timer_seconds_bucket{action="show",le="0.025",timer="total"} 1\n' in text
+        assert 'moin_timer_seconds_bucket{action="show",le="+Inf",timer="total"} 1\n' in text
+        assert 'moin_timer_seconds_count{action="show",timer="total"} 1\n' in text
+        assert 'moin_timer_quantile_seconds{action="show",quantile="0.99",timer="total"} 0.025\n' in text
+        assert 'moin_cache_hit_ratio{cache="meta"}' in text
+
+
+coverage_modules = ['MoinMoin.util.metrics']
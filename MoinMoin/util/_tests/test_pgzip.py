@@ -0,0 +1,42 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.util.pgzip Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import gzip
+from StringIO import StringIO
+
+from MoinMoin.util.pgzip import ParallelGzipFile, gzip_member
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO(data)).read()
+
+
+class TestParallelGzip:
+
+    def test_member(self):
+        assert gunzip(gzip_member('some data')) == 'some data'
+
+    def test_parallel(self):
+        data = ''.join([str(i) for i in range(20000)])
+        f = StringIO()
+        gz = ParallelGzipFile(f, threads=3, chunk_size=1000)
+        for i in range(0, len(data), 700):
+            gz.write(data[i:i+700])
+        gz.close()
+        assert gz.members > 3
+        assert gunzip(f.getvalue()) == data
+
+    def test_empty(self):
+        f = StringIO()
+        gz = ParallelGzipFile(f)
+        gz.close()
+        assert f.getvalue()
+        assert gunzip(f.getvalue()) == ''
+
+
+coverage_modules = ['MoinMoin.util.pgzip']
@@ -0,0 +1,258 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - request timing metrics
+
+    The timers of request.clock (send_page, getPageList, loadLanguage, ...)
+    of every request are aggregated per process into histograms with fixed
+    buckets, keyed by (action, timer name). Together with the hit counters
+    of the item caches (cfg.cache.meta, cfg.cache.pagelists, ...) and the
+    counts of unresolved interwiki names (cfg.cache.interwiki) every process
+    stores them from time to time (cfg.metrics_interval) into the cache
+    arena 'metrics', so action=metrics and "moin cli metrics" can report the
+    merged metrics of all processes in the Prometheus text format.
+    Snapshots not updated for STALE_INTERVALS * cfg.metrics_interval are
+    considered to be from processes that are gone (or idle) and get removed.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import bisect
+import os
+import socket
+import threading
+import time
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, ) # upper bounds [s]
+QUANTILES = (0.5, 0.9, 0.99, )
+MAX_ACTIONS = 100 # the action is given by the client, don't let it blow up our histograms
+OTHER_ACTION = 'other'
+STALE_INTERVALS = 10 # snapshots older than that many metrics_intervals are removed
+
+
+class Histogram(object):
+    """ Counts values into BUCKETS (plus one bucket for larger values) """
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """ Return the upper bound of the bucket holding quantile q
+            (None if there are no values, float('inf') for the last bucket)
+        """
+        count = self.count()
+        if not count:
+            return None
+        rank = q * count
+        cumulated = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulated += bucket_count
+            if cumulated >= rank and bucket_count:
+                break
+        if i < len(BUCKETS):
+            return BUCKETS[i]
+        return float('inf')
+
+
+class Metrics(object):
+    """ Timer histograms of this process (for one wiki) """
+
+    def __init__(self):
+        self.histograms = {} # (action, timer) -> Histogram
+        self.actions = set()
+        self.lock = threading.Lock()
+        self.saved = time.time()
+        self.process = '%s-%d' % (socket.gethostname(), os.getpid())
+
+    def record(self, action, clock):
+        """ Add the stopped timers of clock to the histograms of action """
+        self.lock.acquire()
+        try:
+            if action not in self.actions:
+                if len(self.actions) >= MAX_ACTIONS:
+                    action = OTHER_ACTION
+                self.actions.add(action)
+            for timer, value in clock.timings.items():
+                if '|' in timer or clock.states.get(timer) != -1:
+                    continue # recursive or still running timer
+                histogram = self.histograms.get((action, timer))
+                if histogram is None:
+                    histogram = self.histograms[(action, timer)] = Histogram()
+                histogram.add(value)
+        finally:
+            self.lock.release()
+
+    def snapshot(self, cfg):
+        """ Return the metrics of this process as a dict (for storing and merging) """
+        self.lock.acquire()
+        try:
+            histograms = dict([(key, (list(histogram.counts), histogram.sum))
+                               for key, histogram in self.histograms.items()])
+        finally:
+            self.lock.release()
+        return {
+            'time': time.time(),
+            'histograms': histograms,
+            'caches': cache_counters(cfg),
+            'interwiki_unresolved': dict(cfg.cache.interwiki.unresolved),
+        }
+
+    def _cache(self, request):
+        return caching.CacheEntry(request, 'metrics', self.process, scope='wiki',
+                                  use_pickle=True, do_locking=False)
+
+    def maybe_save(self, request):
+        """ Store the metrics of this process if cfg.metrics_interval passed """
+        now = time.time()
+        if now - self.saved < request.cfg.metrics_interval:
+            return
+        self.saved = now
+        try:
+            self._cache(request).update(self.snapshot(request.cfg))
+        except caching.CacheError, err:
+            logging.warning("metrics: could not store metrics of process %s (%s)" % (self.process, err))
+
+    def collect(self, request):
+        """ Return the merged metrics of all processes
+
+        @return: (processes, histograms, caches, unresolved) - histograms
+                 is a dict (action, timer) -> Histogram, caches a dict
+                 cache name -> (hits, requests), unresolved a dict
+                 interwiki name -> count
+        """
+        snapshots = {}
+        stale = time.time() - STALE_INTERVALS * (request.cfg.metrics_interval or 0)
+        for key in caching.get_cache_list(request, 'metrics', 'wiki'):
+            cache = caching.CacheEntry(request, 'metrics', key, scope='wiki',
+                                       use_pickle=True, do_locking=False)
+            try:
+                snapshot = cache.content()
+            except caching.CacheError:
+                continue # vanished or broken, ignore it
+            if snapshot['time'] < stale:
+                logging.debug("metrics: removing stale metrics of process %s" % key)
+                cache.remove()
+                continue
+            snapshots[key] = snapshot
+        if self.histograms: # we served requests, our own metrics are more current
+            snapshots[self.process] = self.snapshot(request.cfg)
+        histograms = {}
+        caches = {}
+        unresolved = {}
+        for snapshot in snapshots.values():
+            for key, (counts, total) in snapshot['histograms'].items():
+                stored = Histogram()
+                if len(counts) != len(stored.counts):
+                    continue # stored with other BUCKETS
+                stored.counts, stored.sum = counts, total
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram()
+                histogram.merge(stored)
+            for name, (hits, requests) in snapshot['caches'].items():
+                sum_hits, sum_requests = caches.get(name, (0, 0))
+                caches[name] = sum_hits + hits, sum_requests + requests
+            for wikiname, count in snapshot.get('interwiki_unresolved', {}).items():
+                unresolved[wikiname] = unresolved.get(wikiname, 0) + count
+        return len(snapshots), histograms, caches, unresolved
+
+
+def cache_counters(cfg):
+    """ Return dict cache name -> (hits, requests) of the item caches of cfg """
+    counters = {}
+    for item_cache in cfg.cache.__dict__.values():
+        if hasattr(item_cache, 'hits') and hasattr(item_cache, 'requests'):
+            counters[item_cache.name] = item_cache.hits, item_cache.requests
+    return counters
+
+
+def _labels(**labels):
+    items = []
+    for name, value in sorted(labels.items()):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        items.append('%s="%s"' % (name, value))
+    return '{%s}' % ','.join(items)
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value)
+
+
+def report(request):
+    """ Return the merged metrics of all processes in the Prometheus text format """
+    processes, histograms, caches, unresolved = request.cfg.cache.metrics.collect(request)
+    lines = [
+        '# HELP moin_metrics_processes Number of processes the metrics are merged from.',
+        '# TYPE moin_metrics_processes gauge',
+        'moin_metrics_processes %d' % processes,
+        '# HELP moin_timer_seconds Duration of the request.clock timers per action.',
+        '# TYPE moin_timer_seconds histogram',
+    ]
+    keys = sorted(histograms.keys())
+    for action, timer in keys:
+        histogram = histograms[(action, timer)]
+        cumulated = 0
+        for bound, count in zip(BUCKETS + (float('inf'), ), histogram.counts):
+            cumulated += count
+            lines.append('moin_timer_seconds_bucket%s %d' % (
+                         _labels(action=action, timer=timer, le=_number(bound)), cumulated))
+        lines.append('moin_timer_seconds_sum%s %s' % (_labels(action=action, timer=timer), _number(histogram.sum)))
+        lines.append('moin_timer_seconds_count%s %d' % (_labels(action=action, timer=timer), cumulated))
+    lines.extend([
+        '# HELP moin_timer_quantile_seconds Upper bucket bound of the timer quantiles per action.',
+        '# TYPE moin_timer_quantile_seconds gauge',
+    ])
+    for action, timer in keys:
+        histogram = histograms[(action, timer)]
+        for q in QUANTILES:
+            lines.append('moin_timer_quantile_seconds%s %s' % (
+                         _labels(action=action, timer=timer, quantile=q), _number(histogram.quantile(q))))
+    lines.extend([
+        '# HELP moin_cache_requests_total Lookups in the item caches.',
+        '# TYPE moin_cache_requests_total counter',
+    ])
+    names = sorted(caches.keys())
+    for name in names:
+        lines.append('moin_cache_requests_total%s %d' % (_labels(cache=name), caches[name][1]))
+    lines.extend([
+        '# HELP moin_cache_hits_total Hits in the item caches.',
+        '# TYPE moin_cache_hits_total counter',
+    ])
+    for name in names:
+        lines.append('moin_cache_hits_total%s %d' % (_labels(cache=name), caches[name][0]))
+    lines.extend([
+        '# HELP moin_cache_hit_ratio Hits per lookup in the item caches.',
+        '# TYPE moin_cache_hit_ratio gauge',
+    ])
+    for name in names:
+        hits, requests = caches[name]
+        lines.append('moin_cache_hit_ratio%s %.4f' % (_labels(cache=name), requests and float(hits) / requests or 0.0))
+    lines.extend([
+        '# HELP moin_interwiki_unresolved_total Links to interwiki names missing in the interwiki map.',
+        '# TYPE moin_interwiki_unresolved_total counter',
+    ])
+    for wikiname in sorted(unresolved.keys()):
+        lines.append('moin_interwiki_unresolved_total%s %d' % (_labels(wiki=wikiname), unresolved[wikiname]))
+    return '\n'.join(lines) + '\n'
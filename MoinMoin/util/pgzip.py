@@ -0,0 +1,117 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - gzip compression using multiple threads
+
+    ParallelGzipFile is a write-only file object: the data written to it is
+    cut into chunks, every chunk gets compressed into a gzip member by one
+    of several threads (zlib releases the GIL while compressing) and the
+    members are written to the underlying file in order. Concatenated gzip
+    members are a valid gzip file (see RFC 1952), readable by gzip, tar and
+    Python's gzip module.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import struct
+import threading
+import zlib
+import Queue
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def gzip_member(data, level=6):
+    """ Return data compressed as a complete gzip member """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    header = '\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff' # no name, no mtime, unknown OS
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffffL, len(data) & 0xffffffffL)
+    return header + body + trailer
+
+
+class _Job(object):
+    def __init__(self, data):
+        self.data = data
+        self.result = None
+        self.done = threading.Event()
+
+
+class ParallelGzipFile(object):
+    """ Write-only gzip file object compressing with multiple threads """
+
+    def __init__(self, fileobj, threads=2, level=6, chunk_size=CHUNK_SIZE):
+        """
+        @param fileobj: file object the compressed data is written to
+        @param threads: number of compressing threads
+        @param level: compression level (1..9)
+        @param chunk_size: uncompressed size of the gzip members
+        """
+        self.fileobj = fileobj
+        self.level = level
+        self.chunk_size = chunk_size
+        self.max_pending = threads * 2 # limits memory usage
+        self.buffer = []
+        self.buffered = 0
+        self.pending = []
+        self.members = 0
+        self.jobs = Queue.Queue()
+        self.threads = []
+        for i in range(threads):
+            thread = threading.Thread(target=self._compress)
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _compress(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                job.result = gzip_member(job.data, self.level)
+            finally:
+                job.done.set()
+
+    def _submit(self):
+        data = ''.join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        job = _Job(data)
+        self.members += 1
+        self.pending.append(job)
+        self.jobs.put(job)
+        while len(self.pending) > self.max_pending:
+            self._write_first()
+
+    def _write_first(self):
+        job = self.pending.pop(0)
+        job.done.wait()
+        if job.result is None:
+            raise IOError("compressing failed")
+        self.fileobj.write(job.result)
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.chunk_size:
+            self._submit()
+
+    def flush(self):
+        pass # we can only write complete members
+
+    def close(self):
+        """ Write everything (does not close the underlying file object) """
+        if self.threads is None:
+            return
+        if self.buffered or not self.members: # an empty gzip file has one (empty) member
+            self._submit()
+        try:
+            while self.pending:
+                self._write_first()
+        finally:
+            for thread in self.threads:
+                self.jobs.put(None)
+            for thread in self.threads:
+                thread.join()
+            self.threads = None
@@ -0,0 +1,119 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.web.download Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import tempfile
+
+from werkzeug import create_environ, Headers
+
+from MoinMoin.web import download
+from MoinMoin.web.request import Request, MoinMoinFinish
+
+CONTENT = ''.join([chr(i % 256) for i in range(1000)])
+
+
+class DownloadRequest(object):
+    """ just what send_file_response needs from a request """
+    def __init__(self, cfg, headers):
+        request = Request(create_environ(headers=headers))
+        self.range = request.range
+        self.if_range = request.if_range
+        self.if_none_match = request.if_none_match
+        self.if_modified_since = request.if_modified_since
+        self.cfg = cfg
+        self.headers = Headers()
+        self.status_code = 200
+        self.body = None
+
+    def send_file(self, fileobj):
+        self.body = ''.join(iter(lambda: fileobj.read(100), ''))
+        fileobj.close()
+        raise MoinMoinFinish('sent file')
+
+
+class TestSendFileResponse(object):
+
+    def setup_method(self, method):
+        fd, self.fpath = tempfile.mkstemp()
+        os.write(fd, CONTENT)
+        os.close(fd)
+        self.etag = download.file_etag(os.stat(self.fpath))
+
+    def teardown_method(self, method):
+        os.remove(self.fpath)
+        self.request.cfg.send_file_header = None
+        self.request.cfg.send_file_path_map = []
+
+    def get(self, **headers):
+        request = DownloadRequest(self.request.cfg, headers)
+        try:
+            download.send_file_response(request, self.fpath, 'application/octet-stream')
+        except MoinMoinFinish:
+            pass
+        return request
+
+    def testComplete(self):
+        request = self.get()
+        assert request.status_code == 200
+        assert request.body == CONTENT
+        assert request.headers['ETag'] == '"%s"' % self.etag
+        assert request.headers['Accept-Ranges'] == 'bytes'
+        assert request.headers['Content-Length'] == '1000'
+
+    def testNotModified(self):
+        request = self.get(If_None_Match='"%s"' % self.etag)
+        assert request.status_code == 304
+        assert request.body is None
+        request = self.get(If_None_Match='"other"')
+        assert request.status_code == 200
+        request = self.get(If_Modified_Since=request.headers['Last-Modified'])
+        assert request.status_code == 304
+
+    def testSingleRange(self):
+        request = self.get(Range='bytes=10-19')
+        assert request.status_code == 206
+        assert request.body == CONTENT[10:20]
+        assert request.headers['Content-Range'] == 'bytes 10-19/1000'
+        request = self.get(Range='bytes=-10')
+        assert request.body == CONTENT[-10:]
+        request = self.get(Range='bytes=990-2000')
+        assert request.body == CONTENT[990:]
+
+    def testMultipleRanges(self):
+        request = self.get(Range='bytes=0-9,100-109')
+        assert request.status_code == 206
+        content_type = request.headers['Content-Type']
+        assert content_type.startswith('multipart/byteranges; boundary=')
+        boundary = content_type.split('=', 1)[1]
+        assert request.body.count('--%s' % boundary) == 3
+        assert CONTENT[0:10] in request.body and CONTENT[100:110] in request.body
+        assert 'Content-Range: bytes 100-109/1000' in request.body
+        assert int(request.headers['Content-Length']) == len(request.body)
+
+    def testUnsatisfiableRange(self):
+        request = self.get(Range='bytes=2000-2010')
+        assert request.status_code == 416
+        assert request.headers['Content-Range'] == 'bytes */1000'
+
+    def testIfRange(self):
+        request = self.get(Range='bytes=10-19', If_Range='"%s"' % self.etag)
+        assert request.status_code == 206
+        request = self.get(Range='bytes=10-19', If_Range='"outdated"')
+        assert request.status_code == 200
+        assert request.body == CONTENT
+
+    def testSendFileHeader(self):
+        self.request.cfg.send_file_header = 'X-Accel-Redirect'
+        self.request.cfg.send_file_path_map = [(os.path.dirname(self.fpath) + os.sep, '/protected/')]
+        request = self.get(Range='bytes=10-19')
+        assert request.status_code == 200
+        assert request.body == ''
+        assert request.headers['X-Accel-Redirect'] == '/protected/' + os.path.basename(self.fpath)
+
+
+coverage_modules = ['MoinMoin.web.download']
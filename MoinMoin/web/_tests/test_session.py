@@ -0,0 +1,97 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.web.session Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os, shutil, tempfile, time
+
+import py
+
+from MoinMoin.web import session
+
+
+class TestSQLiteSessionStore(object):
+
+    def setup_class(self):
+        if session.sqlite3 is None:
+            py.test.skip("sqlite3 is not available")
+
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.store = session.SQLiteSessionStore(os.path.join(self.dir, 'sessions.db'))
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.dir)
+
+    def testSaveGetDelete(self):
+        store = self.store
+        s = store.new()
+        assert s.new
+        s['user.id'] = '123.456'
+        s['expires'] = time.time() + 3600
+        store.save(s)
+        loaded = store.get(s.sid)
+        assert not loaded.new
+        assert loaded['user.id'] == '123.456'
+        assert store.list() == [s.sid]
+        store.delete(loaded)
+        assert store.get(s.sid) == {}
+        assert store.list() == []
+
+    def testInvalidKey(self):
+        assert self.store.get('../../etc/passwd').new
+
+    def testExpire(self):
+        store = self.store
+        now = time.time()
+        for expires in (now - 10, now + 3600, None):
+            s = store.new()
+            if expires is not None:
+                s['expires'] = expires
+            store.save(s)
+            if expires == now + 3600:
+                valid = s.sid
+        assert store.expire(now) == 2 # the session without expiry, too
+        assert store.list() == [valid]
+
+
+class TestSQLiteSessionService(object):
+
+    def setup_class(self):
+        if session.sqlite3 is None:
+            py.test.skip("sqlite3 is not available")
+
+    def setup_method(self, method):
+        self.dir = tempfile.mkdtemp()
+        self.saved_dir = self.request.cfg.session_dir
+        self.request.cfg.session_dir = self.dir
+        self.service = session.SQLiteSessionService()
+
+    def teardown_method(self, method):
+        self.request.cfg.session_dir = self.saved_dir
+        shutil.rmtree(self.dir)
+
+    def testExpiredSessions(self):
+        request = self.request
+        store = self.service._store_get(request)
+        assert isinstance(store, session.SQLiteSessionStore)
+        s = store.new()
+        s['expires'] = time.time() - 10
+        store.save(s)
+        # the first get_session removes the expired sessions
+        assert self.service.get_session(request, s.sid) == {}
+        assert self.service.get_all_session_ids(request) == []
+        s = store.new()
+        s['expires'] = time.time() - 10
+        store.save(s)
+        # no sweep before sweep_interval passed, but get_session does not return it
+        assert self.service.get_session(request, s.sid).new
+        store.save(s)
+        assert self.service.expire_sessions(request) == 1
+        assert self.service.get_all_session_ids(request) == []
+
+
+coverage_modules = ['MoinMoin.web.session']
@@ -0,0 +1,115 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - MoinMoin.web.surge Tests
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+from MoinMoin.web import surge
+
+
+def test_update_record():
+    record = surge.EMPTY_RECORD
+    now = 1000
+    for i in range(5):
+        record, surge_detected = surge.update_record(record, now, 5, 10, 3600)
+        assert not surge_detected
+    record, surge_detected = surge.update_record(record, now, 5, 10, 3600)
+    assert not surge_detected # 5 requests within limits before this one
+    record, surge_detected = surge.update_record(record, now, 5, 10, 3600)
+    assert surge_detected
+    # previous window only counts partially, a fresh one not at all
+    record, surge_detected = surge.update_record(record, now + 19, 5, 10, 3600)
+    assert not surge_detected
+    record, surge_detected = surge.update_record(record, now + 100, 5, 10, 3600)
+    assert not surge_detected
+
+def test_update_record_lockout():
+    record = surge.EMPTY_RECORD
+    now = 1000
+    # keep going while surging -> locked out
+    for i in range(12):
+        record, surge_detected = surge.update_record(record, now, 5, 10, 3600)
+    assert surge_detected
+    record, surge_detected = surge.update_record(record, now + 100, 5, 10, 3600)
+    assert surge_detected
+    record, surge_detected = surge.update_record(record, now + 3700, 5, 10, 3600)
+    assert not surge_detected
+
+def test_update_record_lockout_expires():
+    record = surge.EMPTY_RECORD
+    now = 1000
+    for i in range(12):
+        record, surge_detected = surge.update_record(record, now, 5, 10, 3600)
+    # retrying while locked out does not extend the lockout
+    for t in range(now + 10, now + 3600, 10):
+        record, surge_detected = surge.update_record(record, t, 5, 10, 3600)
+        assert surge_detected
+    record, surge_detected = surge.update_record(record, now + 3600, 5, 10, 3600)
+    assert not surge_detected
+
+def test_update_record_kick():
+    record, surge_detected = surge.update_record(surge.EMPTY_RECORD, 1000, 5, 10, 3600, kick=True)
+    assert surge_detected
+    record, surge_detected = surge.update_record(record, 2000, 5, 10, 3600)
+    assert surge_detected
+
+
+class TestMemorySurgeBackend(object):
+    def make_backend(self):
+        return surge.MemorySurgeBackend()
+
+    def testHit(self):
+        backend = self.make_backend()
+        results = [backend.hit(self.request, u'SurgeTestUser', 'show', 3, 60) for i in range(5)]
+        assert results == [False, False, False, False, True]
+        # other ids and actions have their own counters
+        assert not backend.hit(self.request, u'OtherSurgeTestUser', 'show', 3, 60)
+        assert not backend.hit(self.request, u'SurgeTestUser', 'raw', 3, 60)
+
+    def testKick(self):
+        backend = self.make_backend()
+        assert backend.hit(self.request, u'KickedSurgeTestUser', 'all', 3, 60, kick=True)
+        assert backend.hit(self.request, u'KickedSurgeTestUser', 'all', 3, 60)
+
+
+class TestSharedSurgeBackend(TestMemorySurgeBackend):
+    def make_backend(self):
+        # use a small table to also exercise slot reuse
+        return surge.SharedSurgeBackend(slots=64)
+
+    def teardown_method(self, method):
+        import os
+        from MoinMoin import caching
+        fname = os.path.join(caching.get_arena_dir(self.request, 'surgeprotect', 'wiki'), 'surge-table')
+        if os.path.exists(fname):
+            os.remove(fname)
+
+    def testSharedBetweenBackends(self):
+        backend1, backend2 = self.make_backend(), self.make_backend()
+        assert not backend1.hit(self.request, u'SharedSurgeTestUser', 'show', 1, 60)
+        assert not backend2.hit(self.request, u'SharedSurgeTestUser', 'show', 1, 60)
+        assert backend1.hit(self.request, u'SharedSurgeTestUser', 'show', 1, 60)
+
+    def testCompact(self):
+        backend = self.make_backend()
+        backend.hit(self.request, u'SurgeTestUser', 'show', 3, 60)
+        fname, f, table = backend._table(self.request)
+        backend.compact(table, 2 ** 40)
+        slots_size = backend.slots * backend.slot_struct.size
+        assert table[:slots_size] == '\0' * slots_size
+
+    def testCompactOncePerInterval(self):
+        backend1, backend2 = self.make_backend(), self.make_backend()
+        compacted = []
+        def compact(table, now):
+            compacted.append(now)
+            surge.SharedSurgeBackend.compact(backend1, table, now)
+        backend1.compact = backend2.compact = compact
+        backend1.hit(self.request, u'SurgeTestUser', 'show', 3, 60)
+        backend2.hit(self.request, u'SurgeTestUser', 'show', 3, 60)
+        assert len(compacted) == 1
+
+
+coverage_modules = ['MoinMoin.web.surge']
@@ -0,0 +1,193 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - sending files with conditional GET and byte range support
+
+    send_file_response answers a GET for a file in the file system:
+
+     * 304 Not Modified if If-None-Match matches the (strong) ETag of the
+       file or, without If-None-Match, if If-Modified-Since is not older
+       than the file
+     * 206 Partial Content for satisfiable Range requests (single ranges
+       directly, multiple ranges as multipart/byteranges), unless an
+       If-Range header does not match the file
+     * 416 Requested Range Not Satisfiable if no range is satisfiable
+     * else the complete file
+
+    If cfg.send_file_header is set (e.g. 'X-Sendfile' or 'X-Accel-Redirect'),
+    the front-end web server is asked to send the file (and handle the
+    ranges), we only send the headers.
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import datetime
+import hashlib
+import random
+
+from werkzeug import http_date
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import config
+
+MAX_RANGES = 16 # more ranges in one request are likely abuse, we send the whole file
+
+
+def file_etag(st):
+    """ Return a strong ETag (unquoted) for a file
+
+    @param st: os.stat result of the file
+    """
+    identity = '%d-%d-%d-%d' % (st.st_dev, st.st_ino, st.st_size, int(st.st_mtime * 1000000))
+    return hashlib.md5(identity).hexdigest()
+
+
+def file_last_modified(st):
+    """ Return the modification time of a file as naive UTC datetime (in full seconds) """
+    return datetime.datetime.utcfromtimestamp(int(st.st_mtime))
+
+
+def is_not_modified(request, etag, last_modified):
+    """ Return True if the client has the current version (see module docstring) """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if_modified = request.if_modified_since
+    return bool(if_modified and if_modified >= last_modified)
+
+
+def requested_ranges(request, etag, last_modified, length):
+    """ Return the byte ranges the client requested
+
+    @return: None if the complete file shall be sent, else list of
+             satisfiable (start, stop) ranges (stop is exclusive, the list
+             is empty if no range is satisfiable)
+    """
+    rng = request.range
+    if rng is None or rng.units != 'bytes':
+        return None
+    if_range = request.if_range
+    if if_range.etag is not None and if_range.etag != etag:
+        return None
+    if if_range.date is not None and if_range.date != last_modified:
+        return None
+    if len(rng.ranges) > MAX_RANGES:
+        return None
+    ranges = []
+    for start, stop in rng.ranges:
+        if start < 0: # suffix range: the last -start bytes
+            start, stop = max(length + start, 0), length
+        elif stop is None or stop > length:
+            stop = length
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+
+class RangeFile(object):
+    """ File-like object returning the strings and file ranges in parts """
+
+    def __init__(self, fileobj, parts):
+        """
+        @param fileobj: the file (None if there are no ranges)
+        @param parts: list of strings and (start, stop) ranges of fileobj
+        """
+        self.fileobj = fileobj
+        self.parts = list(parts)
+        self.parts.reverse()
+
+    def read(self, size=8192):
+        while self.parts:
+            part = self.parts[-1]
+            if isinstance(part, str):
+                self.parts.pop()
+                if part:
+                    return part
+                continue
+            start, stop = part
+            self.fileobj.seek(start)
+            data = self.fileobj.read(min(size, stop - start))
+            if not data: # file got shorter, can't help it
+                self.parts.pop()
+                continue
+            start += len(data)
+            if start < stop:
+                self.parts[-1] = start, stop
+            else:
+                self.parts.pop()
+            return data
+        return ''
+
+    def close(self):
+        if self.fileobj is not None:
+            self.fileobj.close()
+
+
+def send_file_response(request, fpath, content_type):
+    """ Send file fpath (finishes the request unless it answers 304 or 416)
+
+    The caller sets the other headers (e.g. Content-Disposition).
+
+    @param request: the request object
+    @param fpath: the file's path
+    @param content_type: the Content-Type header of the file
+    """
+    st = os.stat(fpath)
+    etag = file_etag(st)
+    last_modified = file_last_modified(st)
+    length = st.st_size
+    headers = request.headers
+    headers['ETag'] = '"%s"' % etag
+    headers['Last-Modified'] = http_date(last_modified)
+    headers['Accept-Ranges'] = 'bytes'
+    if is_not_modified(request, etag, last_modified):
+        request.status_code = 304
+        return
+
+    send_file_header = request.cfg.send_file_header
+    if send_file_header:
+        # let the front-end server send the file (and care for the ranges)
+        path = fpath
+        if isinstance(path, unicode):
+            path = path.encode(config.charset)
+        for prefix, replacement in request.cfg.send_file_path_map:
+            if path.startswith(prefix):
+                path = replacement + path[len(prefix):]
+                break
+        headers['Content-Type'] = content_type
+        headers[send_file_header] = path
+        headers['Content-Length'] = '0'
+        request.send_file(RangeFile(None, []))
+
+    ranges = requested_ranges(request, etag, last_modified, length)
+    if ranges is None:
+        headers['Content-Type'] = content_type
+        headers['Content-Length'] = str(length)
+        request.send_file(open(fpath, 'rb'))
+    if not ranges:
+        request.status_code = 416
+        headers['Content-Range'] = 'bytes */%d' % length
+        return
+
+    request.status_code = 206
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Type'] = content_type
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (start, stop - 1, length)
+        headers['Content-Length'] = str(stop - start)
+        parts = ranges
+    else:
+        boundary = '%032x' % random.getrandbits(128)
+        parts = []
+        for start, stop in ranges:
+            parts.append('--%s\r\nContent-Type: %s\r\nContent-Range: bytes %d-%d/%d\r\n\r\n' % (
+                         boundary, content_type, start, stop - 1, length))
+            parts.append((start, stop))
+            parts.append('\r\n')
+        parts.append('--%s--\r\n' % boundary)
+        headers['Content-Type'] = 'multipart/byteranges; boundary=%s' % boundary
+        headers['Content-Length'] = str(sum([isinstance(part, str) and len(part) or part[1] - part[0]
+                                             for part in parts]))
+    request.send_file(RangeFile(open(fpath, 'rb'), parts))
@@ -8,15 +8,20 @@
     to the documentation of `SessionService` in this module.
 
     @copyright: 2008 MoinMoin:FlorianKrupicka,
-                2009 MoinMoin:ThomasWaldmann
+                2009 MoinMoin:ThomasWaldmann,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
-import time
+import os, threading, time
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
 
-from werkzeug.contrib.sessions import Session, FilesystemSessionStore
+from werkzeug.contrib.sessions import Session, SessionStore, FilesystemSessionStore
 
 from MoinMoin import config
-from MoinMoin.util import filesys
+from MoinMoin.util import filesys, pickle, PICKLE_PROTOCOL
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
@@ -60,6 +65,22 @@ class SessionService(object):
         """
         raise NotImplementedError
 
+    def expire_sessions(self, request):
+        """
+        Destroy all expired sessions (and sessions without expiry information)
+        and return their number.
+        """
+        now = time.time()
+        count = 0
+        for sid in self.get_all_session_ids(request):
+            session = self.get_session(request, sid)
+            if session.new: # get_session destroyed it, it was expired
+                count += 1
+            elif session.get('expires', 0) < now:
+                self.destroy_session(request, session)
+                count += 1
+        return count
+
 
 def _get_session_lifetime(request, userobj):
     """ Get session lifetime for the user object userobj
@@ -134,9 +155,17 @@ class FileSessionService(SessionService):
     """
     def __init__(self, cookie_usage='SESSION'):
         self.cookie_usage = cookie_usage
+        self._stores = {} # session_dir -> store
 
     def _store_get(self, request):
         path = request.cfg.session_dir
+        try:
+            return self._stores[path]
+        except KeyError:
+            store = self._stores[path] = self._store_create(path)
+            return store
+
+    def _store_create(self, path):
         try:
             filesys.mkdir(path)
         except OSError:
@@ -223,7 +252,7 @@ class FileSessionService(SessionService):
                 if val != current_val:
                     session[key] = val
 
-        if not session.new:
+        if not session.new or cookie_lifetime and not kill_session:
             # add some info about expiry to the sessions, so we can purge them.
             # also, make sure we notice server-side if a session is expired, do
             # not rely on the client to expire the cookie.
@@ -265,3 +294,114 @@ class FileSessionService(SessionService):
             logging.debug("destroying session: %r" % session)
             self.destroy_session(request, session)
 
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Stores all sessions in one SQLite database file, indexed by session id
+    and by expiry time: loading, saving and deleting a session is one
+    indexed query and removing the expired sessions does not need to look
+    at the other sessions.
+    """
+    def __init__(self, path, session_class=MoinSession):
+        SessionStore.__init__(self, session_class)
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        """ Return the database connection of the current thread and process """
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, 'pid', None) == pid:
+            return local.conn
+        # never reuse a connection inherited from a forked parent
+        local.pid, local.conn = None, None
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.text_factory = str
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            pass # older sqlite, just use the default journal
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                     "(sid TEXT PRIMARY KEY, expires INTEGER NOT NULL, data BLOB)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+        local.pid, local.conn = pid, conn
+        return conn
+
+    def save(self, session):
+        # sessions without expiry are considered expired (see expire)
+        expires = int(session.get('expires', 0))
+        data = sqlite3.Binary(pickle.dumps(dict(session), PICKLE_PROTOCOL))
+        self._connection().execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                                   (session.sid, expires, data))
+
+    def delete(self, session):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (session.sid, ))
+
+    def get(self, sid):
+        if not self.is_valid_key(sid):
+            return self.new()
+        row = self._connection().execute("SELECT data FROM sessions WHERE sid = ?", (sid, )).fetchone()
+        data = {}
+        if row is not None:
+            try:
+                data = pickle.loads(str(row[0]))
+            except (pickle.UnpicklingError, EOFError, ValueError), err:
+                logging.warning("can't load session %r: %s" % (sid, str(err)))
+        return self.session_class(data, sid, False)
+
+    def list(self):
+        return [row[0] for row in self._connection().execute("SELECT sid FROM sessions")]
+
+    def expire(self, now):
+        """ Delete the sessions that expired before now, return their number """
+        return self._connection().execute("DELETE FROM sessions WHERE expires < ?", (int(now), )).rowcount
+
+
+class SQLiteSessionService(FileSessionService):
+    """
+    This session service keeps all sessions of a wiki in a SQLite database
+    (`session_dir`/sessions.db) shared by all processes, see
+    SQLiteSessionStore. Every process removes the expired sessions at most
+    every sweep_interval seconds, so you don't need to run
+    "moin maint cleansessions" regularly.
+
+    If sqlite3 is not available, it behaves like FileSessionService.
+    """
+    sweep_interval = 600 # seconds between removing expired sessions
+
+    def __init__(self, cookie_usage='SESSION', sweep_interval=None):
+        FileSessionService.__init__(self, cookie_usage)
+        if sweep_interval is not None:
+            self.sweep_interval = sweep_interval
+        self._swept = {} # session_dir -> time of last sweep
+
+    def _store_create(self, path):
+        if sqlite3 is None:
+            logging.warning("sqlite3 not available, using session files")
+            return FileSessionService._store_create(self, path)
+        try:
+            filesys.mkdir(path)
+        except OSError:
+            pass
+        return SQLiteSessionStore(os.path.join(path, 'sessions.db'))
+
+    def get_session(self, request, sid=None):
+        store = self._store_get(request)
+        if isinstance(store, SQLiteSessionStore):
+            now = time.time()
+            path = request.cfg.session_dir
+            if now - self._swept.get(path, 0) >= self.sweep_interval:
+                self._swept[path] = now
+                try:
+                    count = store.expire(now)
+                    logging.debug("removed %d expired sessions" % count)
+                except sqlite3.Error, err:
+                    logging.warning("can't remove expired sessions: %s" % str(err))
+        return FileSessionService.get_session(self, request, sid)
+
+    def expire_sessions(self, request):
+        store = self._store_get(request)
+        if isinstance(store, SQLiteSessionStore):
+            return store.expire(time.time())
+        return FileSessionService.expire_sessions(self, request)
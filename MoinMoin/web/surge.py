@@ -0,0 +1,249 @@
+# -*- coding: iso-8859-1 -*-
+"""
+    MoinMoin - surge protection backends
+
+    Surge protection (see `MoinMoin.web.utils.check_surge_protect`) asks a
+    surge backend whether some id (user name or remote address) is doing
+    too many requests of some action. The backend is configured by
+    cfg.surge_backend, see `SurgeBackend` for the API.
+
+    Both backends implemented here keep a sliding window counter per
+    (id, action): the requests in the current and in the previous window
+    of dt seconds, weighted by how much of the previous window is still
+    within the last dt seconds. Requests done while surging count as
+    strikes - after more than maxnum strikes within surge_lockout_time,
+    the id gets locked out for surge_lockout_time (requests done while
+    locked out are rejected, but do not extend the lockout).
+
+    This costs O(1) per request, stale entries are removed by a periodic
+    compaction (for the shared backend, only one process of the wiki does
+    it per compact_interval).
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+
+import os
+import struct
+import threading
+import time
+import hashlib
+import mmap
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # no inter-process locking on this platform
+
+from MoinMoin import log
+logging = log.getLogger(__name__)
+
+from MoinMoin import caching
+
+# window_start, count, prev_count, strikes, strike_until, locked_until, expires
+EMPTY_RECORD = (0, 0, 0, 0, 0, 0, 0)
+
+
+def update_record(record, now, maxnum, dt, lockout_time, kick=False, surge=False):
+    """ Account for one request in a surge record.
+
+    @param record: tuple (see EMPTY_RECORD)
+    @param now: current time [int s]
+    @param maxnum: max. number of requests allowed per dt
+    @param dt: window size [s]
+    @param lockout_time: time [s] someone gets locked out when ignoring the warnings
+    @param kick: lock out immediately
+    @param surge: count this request as a strike even if it is within limits
+    @return: updated record, whether a surge was detected
+    """
+    window_start, count, prev_count, strikes, strike_until, locked_until, expires = record
+    dt = max(dt, 1)
+    if now >= window_start + 2 * dt:
+        window_start, count, prev_count = now, 0, 0
+    elif now >= window_start + dt:
+        window_start, count, prev_count = window_start + dt, 0, count
+    if now >= strike_until:
+        strikes = 0
+    estimate = prev_count * (1.0 - float(now - window_start) / dt) + count
+    if kick:
+        strikes = 2 * maxnum
+    locked = locked_until > now and not kick
+    surge_detected = surge or kick or estimate > maxnum or locked
+    count += 1
+    if surge_detected and not locked:
+        # requests done while locked out neither count as strikes nor
+        # extend the lockout, so it ends even if the client keeps retrying
+        strikes += 1
+        strike_until = now + lockout_time
+        if strikes > maxnum:
+            locked_until = strike_until
+    expires = max(window_start + 2 * dt, strike_until, locked_until)
+    return (window_start, count, prev_count, strikes, strike_until, locked_until, expires), surge_detected
+
+
+class SurgeBackend(object):
+    """ A surge backend counts requests per (id, action).
+
+        Backend objects are shared by all wikis of a farm, use
+        request.cfg to find wiki specific storage.
+    """
+    compact_interval = 60 # seconds between removing stale entries
+
+    def hit(self, request, id, action, maxnum, dt, kick=False, surge=False):
+        """ Account for a request of <id> doing <action>.
+
+        @param request: the request object
+        @param id: user name or remote address
+        @param action: the action name (or 'all')
+        @param maxnum: max. number of requests allowed per dt
+        @param dt: window size [s]
+        @param kick: lock out id immediately
+        @param surge: count this request as a strike even if it is within limits
+        @return: True if a surge was detected
+        """
+        raise NotImplementedError
+
+
+class MemorySurgeBackend(SurgeBackend):
+    """ Keeps the surge records in the memory of the current process.
+
+        Only useful if the wiki runs in a single process (threads are fine).
+    """
+    def __init__(self):
+        self._records = {} # (wiki, id, action) -> record
+        self._lock = threading.Lock()
+        self._compacted = time.time()
+
+    def hit(self, request, id, action, maxnum, dt, kick=False, surge=False):
+        now = int(time.time())
+        key = (request.cfg.siteid, id, action)
+        self._lock.acquire()
+        try:
+            record = self._records.get(key, EMPTY_RECORD)
+            record, surge_detected = update_record(record, now, maxnum, dt,
+                                                   request.cfg.surge_lockout_time, kick, surge)
+            self._records[key] = record
+            if now - self._compacted > self.compact_interval:
+                self.compact(now)
+        finally:
+            self._lock.release()
+        return surge_detected
+
+    def compact(self, now):
+        """ Remove stale records (caller must hold the lock). """
+        self._compacted = now
+        for key, record in self._records.items():
+            if record[-1] <= now:
+                del self._records[key]
+
+
+class SharedSurgeBackend(SurgeBackend):
+    """ Keeps the surge records in a hash table in a mmap'd file in the
+        wiki's cache directory, shared by all processes of the wiki.
+
+        The table has a fixed size, every key may be stored in one of
+        `probes` slots after its hash position. If all of them are in use,
+        the slot expiring first is reused. The slots are followed by a
+        header containing the time of the last compaction.
+    """
+    slot_struct = struct.Struct('<q7q')
+    header_struct = struct.Struct('<q')
+    probes = 16
+
+    def __init__(self, slots=65536):
+        """
+        @param slots: number of entries in the table
+        """
+        self.slots = slots
+        self._tables = {} # table file name -> (pid, file, mmap)
+        self._lock = threading.Lock()
+
+    def _table(self, request):
+        """ Return file and mmap of the table of the current wiki, opened by
+            the current process (we need an own file for locking after forking).
+        """
+        fname = os.path.join(caching.get_arena_dir(request, 'surgeprotect', 'wiki'), 'surge-table')
+        pid = os.getpid()
+        table = self._tables.get(fname)
+        if table is None or table[0] != pid:
+            size = self.slots * self.slot_struct.size + self.header_struct.size
+            dirname = os.path.dirname(fname)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            # never truncate, other processes might use the table already
+            f = os.fdopen(os.open(fname, os.O_RDWR | os.O_CREAT), 'r+b')
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0, 2)
+                if f.tell() < size:
+                    f.truncate(size)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            table = pid, f, mmap.mmap(f.fileno(), size)
+            self._tables[fname] = table
+        return fname, table[1], table[2]
+
+    def _key(self, request, id, action):
+        if isinstance(id, unicode):
+            id = id.encode('utf-8')
+        digest = hashlib.md5('%s\0%s' % (id, action)).digest()
+        key = struct.unpack('<q', digest[:8])[0]
+        return key or 1 # 0 means empty slot
+
+    def hit(self, request, id, action, maxnum, dt, kick=False, surge=False):
+        now = int(time.time())
+        key = self._key(request, id, action)
+        self._lock.acquire()
+        try:
+            fname, f, table = self._table(request)
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                offset = self._find_slot(table, key, now)
+                record = self.slot_struct.unpack_from(table, offset)
+                if record[0] == key:
+                    record = record[1:]
+                else:
+                    record = EMPTY_RECORD
+                record, surge_detected = update_record(record, now, maxnum, dt,
+                                                       request.cfg.surge_lockout_time, kick, surge)
+                self.slot_struct.pack_into(table, offset, key, *record)
+                header_offset = self.slots * self.slot_struct.size
+                compacted = self.header_struct.unpack_from(table, header_offset)[0]
+                if now - compacted > self.compact_interval:
+                    self.compact(table, now)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+        return surge_detected
+
+    def _find_slot(self, table, key, now):
+        """ Return the table offset of the slot for key. """
+        size = self.slot_struct.size
+        start = key % self.slots
+        best_offset, best_expires = None, None
+        for i in range(self.probes):
+            offset = ((start + i) % self.slots) * size
+            slot_key = struct.unpack_from('<q', table, offset)[0]
+            expires = struct.unpack_from('<q', table, offset + size - 8)[0]
+            if slot_key == key:
+                return offset
+            if slot_key == 0 or expires <= now:
+                expires = 0 # free slot, use it unless we find key later
+            if best_offset is None or expires < best_expires:
+                best_offset, best_expires = offset, expires
+        return best_offset
+
+    def compact(self, table, now):
+        """ Clear stale slots (caller must hold the lock). """
+        size = self.slot_struct.size
+        self.header_struct.pack_into(table, self.slots * size, now)
+        empty = '\0' * size
+        for offset in xrange(0, self.slots * size, size):
+            expires = struct.unpack_from('<q', table, offset + size - 8)[0]
+            if expires and expires <= now:
+                table[offset:offset + size] = empty
@@ -6,7 +6,8 @@
                 2004 by Florian Festi,
                 2006 by Mikko Virkkil,
                 2005-2008 MoinMoin:ThomasWaldmann,
-                2007 MoinMoin:ReimarBauer
+                2007 MoinMoin:ReimarBauer,
+                2026 by the MoinMoin project
     @license: GNU GPL, see COPYING for details.
 """
 
@@ -17,6 +18,7 @@ import os
 import re
 import time
 import urllib
+import weakref
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
@@ -462,24 +464,55 @@ def get_max_mtime(file_list, page):
     else:
         return 0 # no files / pages there
 
-def load_wikimap(request):
-    """ load interwiki map (once, and only on demand) """
-    from MoinMoin.Page import Page
+INTERWIKI_FILES_CHECK = 60 # seconds between checking the mtime of the intermap files
+MAX_UNRESOLVED = 1000 # unresolved interwiki names counted per process
 
-    now = int(time.time())
-    if getattr(request.cfg, "shared_intermap_files", None) is None:
-        generate_file_list(request)
+class InterWikiMap(object):
+    """ The interwiki map of a wiki (cfg.cache.interwiki)
 
-    try:
-        _interwiki_list = request.cfg.cache.interwiki_list
-        old_mtime = request.cfg.cache.interwiki_mtime
-        if request.cfg.cache.interwiki_ts + (1*60) < now: # 1 minutes caching time
-            max_mtime = get_max_mtime(request.cfg.shared_intermap_files, Page(request, INTERWIKI_PAGE))
-            if max_mtime > old_mtime:
-                raise AttributeError # refresh cache
-            else:
-                request.cfg.cache.interwiki_ts = now
-    except AttributeError:
+    The map is compiled from the intermap files and the InterWikiMap page
+    and stored in the cache (arena 'interwiki') together with the mtimes of
+    the files and the revision of the page, so a new process does not need
+    to parse them. Processes notice changes of the InterWikiMap page in the
+    edit-log (at most once per request) and changes of the intermap files
+    by their mtime (at most every INTERWIKI_FILES_CHECK seconds).
+
+    Names that could not be resolved are counted (see unresolved), so the
+    wiki admin can see which entries are missing in the map.
+    """
+    name = 'interwiki'
+
+    def __init__(self):
+        self.map = None
+        self.source = None # what the map was compiled from (except the page)
+        self.log_pos = None
+        self.files_checked = 0
+        self.checked = None # weak reference to the request that checked last
+        self.hits = 0
+        self.requests = 0
+        self.unresolved = {} # wiki name -> count
+
+    def _source(self, request):
+        files = [(filename, os.stat(filename).st_mtime) for filename in request.cfg.shared_intermap_files]
+        return request.script_root, request.cfg.interwikiname, files
+
+    def _page_state(self, request):
+        """ Return file, revision and mtime of the InterWikiMap page """
+        from MoinMoin.Page import Page
+        pagefile, rev, exists = Page(request, INTERWIKI_PAGE).get_rev()
+        try:
+            mtime = os.path.getmtime(pagefile)
+        except (OSError, TypeError):
+            mtime = None
+        return pagefile, rev, mtime
+
+    def _cache(self, request):
+        from MoinMoin import caching
+        return caching.CacheEntry(request, 'interwiki', 'map', scope='wiki', use_pickle=True)
+
+    def _compile(self, request):
+        """ Parse the intermap files and the InterWikiMap page """
+        from MoinMoin.Page import Page
         _interwiki_list = {}
         lines = []
 
@@ -508,13 +541,72 @@ def load_wikimap(request):
         _interwiki_list['Self'] = request.script_root + '/'
         if request.cfg.interwikiname:
             _interwiki_list[request.cfg.interwikiname] = request.script_root + '/'
+        return _interwiki_list
+
+    def _load(self, request, source, log_pos):
+        """ Load the compiled map for source and the current InterWikiMap
+            page, compile it if needed
+        """
+        from MoinMoin import caching
+        cache = self._cache(request)
+        page_state = self._page_state(request)
+        try:
+            cached_source, cached_page_state, _interwiki_list = cache.content()
+            if (cached_source, cached_page_state) != (source, page_state):
+                raise caching.CacheError
+        except (caching.CacheError, ValueError, TypeError):
+            _interwiki_list = self._compile(request)
+            try:
+                cache.update((source, page_state, _interwiki_list))
+            except caching.CacheError, err:
+                logging.warning("can't store the compiled interwiki map: %s" % str(err))
+        self.map, self.source, self.log_pos = _interwiki_list, source, log_pos
+
+    def get(self, request):
+        """ Return the up-to-date interwiki map (dict wiki name -> url) """
+        if self.checked is not None and self.checked() is request and self.map is not None:
+            return self.map
+        from MoinMoin.logfile import editlog
+        if request.cfg.shared_intermap_files is None:
+            generate_file_list(request)
+        now = time.time()
+        source = self.source
+        if (source is None or source[:2] != (request.script_root, request.cfg.interwikiname) or
+            now - self.files_checked >= INTERWIKI_FILES_CHECK):
+            source = self._source(request)
+            self.files_checked = now
+        elog = editlog.EditLog(request)
+        log_pos = self.log_pos
+        if self.map is None or source != self.source or log_pos > elog.size():
+            self._load(request, source, elog.size())
+        else:
+            new_pos, items = elog.news(log_pos)
+            if INTERWIKI_PAGE in items:
+                self._load(request, source, new_pos)
+            else:
+                self.log_pos = new_pos
+        try:
+            self.checked = weakref.ref(request)
+        except TypeError: # request does not support weak references
+            self.checked = None
+        return self.map
+
+    def resolve(self, request, wikiname):
+        """ Return the url for wikiname, None if it is not in the map """
+        self.requests += 1
+        url = self.get(request).get(wikiname)
+        if url is None:
+            unresolved = self.unresolved
+            if wikiname in unresolved or len(unresolved) < MAX_UNRESOLVED:
+                unresolved[wikiname] = unresolved.get(wikiname, 0) + 1
+        else:
+            self.hits += 1
+        return url
 
-        # save for later
-        request.cfg.cache.interwiki_list = _interwiki_list
-        request.cfg.cache.interwiki_ts = now
-        request.cfg.cache.interwiki_mtime = get_max_mtime(request.cfg.shared_intermap_files, Page(request, INTERWIKI_PAGE))
 
-    return _interwiki_list
+def load_wikimap(request):
+    """ load interwiki map (once, and only on demand) """
+    return request.cfg.cache.interwiki.get(request)
 
 def split_wiki(wikiurl):
     """
@@ -590,9 +682,9 @@ def resolve_interwiki(request, wikiname, pagename):
     @rtype: tuple
     @return: (wikitag, wikiurl, wikitail, err)
     """
-    _interwiki_list = load_wikimap(request)
-    if wikiname in _interwiki_list:
-        return (wikiname, _interwiki_list[wikiname], pagename, False)
+    wikiurl = request.cfg.cache.interwiki.resolve(request, wikiname)
+    if wikiurl is not None:
+        return (wikiname, wikiurl, pagename, False)
     else:
         return (wikiname, request.script_root, "/InterWiki", True)
 
@@ -1196,13 +1288,96 @@ def searchAndImportPlugin(cfg, type, name, what=None):
 ### Parsers
 #############################################################################
 
+def _parser_registry_key(cfg):
+    """ Return a value that changes when the parsers or their extensions change
+
+    This is the moin and pygments version and name and mtime of all builtin
+    and wiki parser modules.
+    """
+    import pygments
+    from MoinMoin import version
+    packages = ['MoinMoin'] + cfg._plugin_modules
+    modules = []
+    for modname in packages:
+        try:
+            packagepath = os.path.dirname(pysupport.importName(modname, 'parser').__file__)
+        except AttributeError:
+            continue
+        for name in pysupport.getPluginModules(packagepath):
+            try:
+                mtime = os.path.getmtime(os.path.join(packagepath, name + '.py'))
+            except OSError:
+                mtime = None
+            modules.append((packagepath, name, mtime))
+    return version.release, pygments.__version__, modules
+
+
+def _build_parser_registry(cfg):
+    """ Import all parsers and return a list of (parser name, extensions) """
+    registry = []
+    parser_plugins = getPlugins('parser', cfg)
+    # force the 'highlight' parser to be the first entry in the list
+    # this makes it possible to overwrite some mapping entries later, so that
+    # moin will use some "better" parser for some filename extensions
+    parser_plugins.remove('highlight')
+    parser_plugins = ['highlight'] + parser_plugins
+    for pname in parser_plugins:
+        try:
+            Parser = importPlugin(cfg, 'parser', pname, 'Parser')
+        except PluginMissingError:
+            continue
+        if hasattr(Parser, 'extensions'):
+            exts = Parser.extensions
+            if isinstance(exts, list):
+                registry.append((pname, list(exts)))
+            elif str(exts) == '*':
+                registry.append((pname, '*'))
+    return registry
+
+
+def getParserRegistry(cfg):
+    """
+    Returns a list of (parser name, extensions) of all parsers that have
+    an extensions attribute, extensions is a list of filename extensions
+    or '*' (any extension). Later entries take precedence.
+
+    Building the list means importing all parser modules (and the libraries
+    they use), thus it is kept in the wiki's cache directory and only
+    rebuilt if a parser module was changed, added or removed (or moin or
+    pygments were upgraded).
+
+    @param cfg: the Config instance for the wiki in question
+    @rtype: list
+    @returns: list of (parser name, extensions)
+    """
+    from MoinMoin import caching
+    key = _parser_registry_key(cfg)
+    # we have no request here, but a 'dir' scope cache entry does not need one
+    cache = caching.CacheEntry(None, os.path.join(cfg.cache_dir, cfg.siteid, 'plugins'), 'parsers',
+                               scope='dir', use_pickle=True)
+    if cache.exists():
+        try:
+            cached_key, registry = cache.content()
+            if cached_key == key:
+                return registry
+        except (caching.CacheError, ValueError, TypeError):
+            pass
+    registry = _build_parser_registry(cfg)
+    try:
+        cache.update((key, registry))
+    except caching.CacheError:
+        logging.warning("could not write parser registry to the cache")
+    return registry
+
+
 def getParserForExtension(cfg, extension):
     """
     Returns the Parser class of the parser fit to handle a file
     with the given extension. The extension should be in the same
     format as os.path.splitext returns it (i.e. with the dot).
     Returns None if no parser willing to handle is found.
-    The dict of extensions is cached in the config object.
+    The dict of extensions is cached in the config object, only
+    the parser that is returned gets imported (see getParserRegistry).
 
     @param cfg: the Config instance for the wiki in question
     @param extension: the filename extension including the dot
@@ -1211,28 +1386,22 @@ def getParserForExtension(cfg, extension):
     """
     if not hasattr(cfg.cache, 'EXT_TO_PARSER'):
         etp, etd = {}, None
-        parser_plugins = getPlugins('parser', cfg)
-        # force the 'highlight' parser to be the first entry in the list
-        # this makes it possible to overwrite some mapping entries later, so that
-        # moin will use some "better" parser for some filename extensions
-        parser_plugins.remove('highlight')
-        parser_plugins = ['highlight'] + parser_plugins
-        for pname in parser_plugins:
-            try:
-                Parser = importPlugin(cfg, 'parser', pname, 'Parser')
-            except PluginMissingError:
-                continue
-            if hasattr(Parser, 'extensions'):
-                exts = Parser.extensions
-                if isinstance(exts, list):
-                    for ext in exts:
-                        etp[ext] = Parser
-                elif str(exts) == '*':
-                    etd = Parser
+        for pname, exts in getParserRegistry(cfg):
+            if exts == '*':
+                etd = pname
+            else:
+                for ext in exts:
+                    etp[ext] = pname
         cfg.cache.EXT_TO_PARSER = etp
         cfg.cache.EXT_TO_PARSER_DEFAULT = etd
 
-    return cfg.cache.EXT_TO_PARSER.get(extension, cfg.cache.EXT_TO_PARSER_DEFAULT)
+    pname = cfg.cache.EXT_TO_PARSER.get(extension, cfg.cache.EXT_TO_PARSER_DEFAULT)
+    if pname is None:
+        return None
+    try:
+        return importPlugin(cfg, 'parser', pname, 'Parser')
+    except PluginMissingError: # removed after the registry was built
+        return None
 
 
 #############################################################################
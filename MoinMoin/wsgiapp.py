@@ -20,6 +20,7 @@ from MoinMoin.Page import Page
 from MoinMoin import auth, config, i18n, user, wikiutil, xmlrpc, error
 from MoinMoin.action import get_names, get_available_actions
 from MoinMoin.util.abuse import log_attempt
+from MoinMoin.logfile import eventlog
 
 
 def set_umask(new_mask=0777^config.umask):
@@ -263,7 +264,13 @@ class Application(object):
             try:
                 response = run(context)
             finally:
+                i18n.flush_preformatted(context)
+                eventlog.flush_due()
                 context.clock.stop('total')
+                if context.cfg.metrics_interval is not None:
+                    metrics = context.cfg.cache.metrics
+                    metrics.record(context.action, context.clock)
+                    metrics.maybe_save(context)
                 if context.cfg.log_timing:
                     dt = context.clock.timings['total']
                     logging.info("timing: %s %s %s %3.3f %s" % (
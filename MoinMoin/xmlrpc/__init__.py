@@ -26,7 +26,7 @@ from MoinMoin.util import pysupport
 
 modules = pysupport.getPackageModules(__file__)
 
-import os, sys, time, xmlrpclib
+import os, sys, time, calendar, xmlrpclib
 
 from MoinMoin import log
 logging = log.getLogger(__name__)
@@ -352,7 +352,15 @@ class XmlRpcBase:
         return_items = []
 
         edit_log = editlog.EditLog(self.request)
-        for log in edit_log.reverse():
+        try:
+            since = wikiutil.timestamp2version(calendar.timegm(date.timetuple()))
+        except (AttributeError, TypeError, ValueError):
+            since = 0
+        # only read the log entries since "date" (using the edit-log index)
+        edit_log.seek_timestamp(since)
+        logs = list(edit_log)
+        logs.reverse()
+        for log in logs:
             # get last-modified UTC (DateTime) from log
             gmtuple = tuple(time.gmtime(wikiutil.version2timestamp(log.ed_time_usecs)))
             lastModified_date = xmlrpclib.DateTime(gmtuple)
@@ -8,8 +8,11 @@
 
 from xmlrpclib import Fault
 
+from MoinMoin import caching
+from MoinMoin.linkindex import LinkIndex
 from MoinMoin.user import User
-from MoinMoin.xmlrpc import XmlRpcBase
+from MoinMoin.xmlrpc import XmlRpcBase, XmlRpc2
+from MoinMoin._tests import become_trusted, create_page, nuke_page
 
 
 def test_fault_serialization(request):
@@ -35,5 +38,29 @@ def test_getAuthToken(request):
     xmlrpc = XmlRpcBase(request)
     assert xmlrpc.xmlrpc_getAuthToken("Foo", "bar") == ""
 
+
+def test_listLinks_without_index(request):
+    """ listLinks must not collect the links of all pages if there is no link index """
+    pagename = u'AutoCreatedMoinMoinTemporaryTestPageListLinks'
+    become_trusted(request)
+    create_page(request, pagename, u"[[FrontPage]] [[RecentChanges]]\n")
+    for key in caching.get_cache_list(request, 'linkindex', 'wiki'):
+        caching.CacheEntry(request, 'linkindex', key, scope='wiki').remove()
+    request.cfg.cache.linkindex = None
+
+    def collect(self):
+        raise AssertionError("all page links collected")
+    saved_collect = LinkIndex._collect
+    LinkIndex._collect = collect
+    try:
+        xmlrpc = XmlRpc2(request)
+        result = xmlrpc.xmlrpc_listLinks(pagename)
+        assert sorted([link['name'] for link in result]) == ['FrontPage', 'RecentChanges']
+        assert LinkIndex(request).links(pagename) == set([u'FrontPage', u'RecentChanges'])
+    finally:
+        LinkIndex._collect = saved_collect
+        nuke_page(request, pagename)
+
+
 coverage_modules = ['MoinMoin.xmlrpc']
 
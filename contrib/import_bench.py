@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+    MoinMoin - import_bench
+
+    Measures how fast a new worker process is ready: the time needed to
+    import the wsgi application and the time until the first response,
+    every run in a fresh python process. Run it in a directory containing
+    a wikiconfig.py, e.g. the moin source directory:
+
+        python contrib/import_bench.py [pagename] [runs]
+
+    @copyright: 2026 by the MoinMoin project
+    @license: GNU GPL, see COPYING for details.
+"""
+import sys, os, subprocess
+
+RUNS = 10
+PAGE = 'FrontPage'
+
+WORKER = """
+import sys, time
+timing = time.time()
+from MoinMoin.wsgiapp import application
+imported = time.time() - timing
+modules = len(sys.modules)
+from werkzeug.test import Client
+appiter, status, headers = Client(application).get('/%s')
+result = ''.join(appiter)
+print '%%.4f %%.4f %%d %%d' %% (imported, time.time() - timing, modules, len(sys.modules))
+"""
+
+def run_worker(page):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd()] + sys.path))
+    worker = subprocess.Popen([sys.executable, '-c', WORKER % page], env=env,
+                              stdout=subprocess.PIPE, stderr=open(os.devnull, 'w'))
+    output = worker.communicate()[0].split()
+    return [float(value) for value in output[:2]] + [int(value) for value in output[2:]]
+
+def main():
+    page = len(sys.argv) > 1 and sys.argv[1] or PAGE
+    runs = len(sys.argv) > 2 and int(sys.argv[2]) or RUNS
+
+    print '=== Starting %i workers for page "%s" ===' % (runs, page)
+    results = []
+    for run in xrange(runs):
+        results.append(run_worker(page))
+        sys.stdout.write('.')
+        sys.stdout.flush()
+    print
+
+    first = results[0]
+    print 'First worker:'
+    print '  import: %.4f seconds, %i modules' % (first[0], first[2])
+    print '  first response: %.4f seconds, %i modules' % (first[1], first[3])
+    if runs > 1:
+        rest = results[1:]
+        print 'Other workers (average):'
+        print '  import: %.4f seconds' % (sum([r[0] for r in rest]) / len(rest))
+        print '  first response: %.4f seconds' % (sum([r[1] for r in rest]) / len(rest))
+        print '  modules: %i' % (sum([r[3] for r in rest]) / len(rest))
+
+if __name__ == '__main__':
+    main()